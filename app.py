@@ -2,34 +2,129 @@
 Flask API Server for YouTube Shorts Automation
 Provides REST API for web dashboard
 """
-from flask import Flask, request, jsonify, send_from_directory
+from flask import (
+    Blueprint, Flask, Response, redirect, request, jsonify, send_file, send_from_directory,
+    stream_with_context
+)
 from flask_cors import CORS
 from pathlib import Path
-from database import db
+from urllib.parse import quote
+from database import db, IdempotencyConflict, PRIORITIES
 from job_queue import job_queue
+from events import event_bus, JobWatcher
+from scheduler import compute_next_run, format_time
+from config import config
+from artifacts import get_store, touch
+from metrics import StageHistograms, render_gauge
+import tracing
+import base64
+import json
+import threading
+import time
 import os
 
-app = Flask(__name__, static_folder='web', static_url_path='')
-CORS(app)
+# All routes; create_app() mounts them on an application
+routes = Blueprint('routes', __name__)
 
-# Start job queue worker
-job_queue.start()
+# Turns job changes written by worker processes into live events
+job_watcher = JobWatcher(event_bus, db, config.EVENT_POLL_INTERVAL)
+
+# ==================== Conditional GET ====================
+
+def _current_etag(tables):
+    """ETag built from the change counters of the given tables"""
+    versions = db.get_table_versions()
+    return 'v' + '.'.join(str(versions.get(t, 0)) for t in tables)
+
+def _not_modified(etag):
+    """True if the client's If-None-Match already has this version"""
+    return request.if_none_match.contains_weak(etag)
+
+def _not_modified_response(etag):
+    """304 without touching row data"""
+    return _with_etag(Response(status=304), etag)
+
+def _with_etag(response, etag):
+    """Attach a weak ETag and make browsers revalidate on every poll"""
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# ==================== Pagination ====================
+
+def _encode_cursor(row):
+    """Opaque keyset cursor for the (created_at, id) of a row"""
+    raw = json.dumps([row['created_at'], row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    """Inverse of _encode_cursor; raises ValueError on bad input"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return str(created_at), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def _list_response(table, fetch):
+    """
+    Shared handler for list endpoints
+    
+    Query args:
+        status: filter by status
+        limit: page size (default 50, max 500)
+        cursor: value of X-Next-Cursor from the previous page
+        fields: comma-separated columns to return (default all)
+    
+    The body stays a plain JSON array. The cursor for the next page is
+    sent in X-Next-Cursor (absent on the last page) and the total number
+    of matching rows in X-Total-Count.
+    """
+    # Job rows embed their video's title, so both tables matter
+    etag = _current_etag(('jobs', 'videos') if table == 'jobs' else ('videos',))
+    if _not_modified(etag):
+        return _not_modified_response(etag)
+    
+    status = request.args.get('status')
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        cursor = request.args.get('cursor')
+        before = _decode_cursor(cursor) if cursor else None
+        fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+        
+        # Fetch one extra row to learn whether another page exists
+        rows = fetch(status=status, limit=limit + 1, before=before, fields=fields or None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    counts = db.get_status_counts(table)
+    total = counts.get(status, 0) if status else sum(counts.values())
+    
+    response = jsonify(rows)
+    response.headers['X-Total-Count'] = str(total)
+    if has_more:
+        response.headers['X-Next-Cursor'] = _encode_cursor(rows[-1])
+    return _with_etag(response, etag)
 
 # ==================== Frontend Routes ====================
 
-@app.route('/')
+@routes.route('/')
 def index():
     """Serve main dashboard"""
     return send_from_directory('web', 'index.html')
 
-@app.route('/<path:path>')
+@routes.route('/<path:path>')
 def serve_static(path):
     """Serve static files"""
     return send_from_directory('web', path)
 
 # ==================== API Configuration ====================
 
-@app.route('/api/config/status', methods=['GET'])
+@routes.route('/api/config/status', methods=['GET'])
 def get_config_status():
     """Get configuration status"""
     services = db.get_configured_services()
@@ -46,7 +141,7 @@ def get_config_status():
         'optional_services': optional_services
     })
 
-@app.route('/api/config/save', methods=['POST'])
+@routes.route('/api/config/save', methods=['POST'])
 def save_config():
     """Save API configuration"""
     data = request.json
@@ -62,16 +157,12 @@ def save_config():
 
 # ==================== Video Management ====================
 
-@app.route('/api/videos', methods=['GET'])
+@routes.route('/api/videos', methods=['GET'])
 def get_videos():
-    """Get all videos"""
-    status = request.args.get('status')
-    limit = int(request.args.get('limit', 50))
-    
-    videos = db.get_all_videos(status=status, limit=limit)
-    return jsonify(videos)
+    """Get videos (paginated, see _list_response)"""
+    return _list_response('videos', db.get_all_videos)
 
-@app.route('/api/videos/<int:video_id>', methods=['GET'])
+@routes.route('/api/videos/<int:video_id>', methods=['GET'])
 def get_video(video_id):
     """Get specific video"""
     video = db.get_video(video_id)
@@ -79,65 +170,217 @@ def get_video(video_id):
         return jsonify(video)
     return jsonify({'error': 'Video not found'}), 404
 
-@app.route('/api/videos/create', methods=['POST'])
+@routes.route('/api/videos/create', methods=['POST'])
 def create_video():
-    """Create new video and start processing"""
+    """
+    Create new video and start processing
+    
+    Repeating a request with the same Idempotency-Key header returns the
+    video it created instead of starting another. With "dedupe": true (or
+    VIDEO_DEDUPE), a video with the same script, title, description and
+    render settings is returned too. Either only matches a video that is
+    still being made or completed; the response then has duplicate=true.
+    Reusing a key with a different script, title, description or priority
+    is rejected with 422.
+    """
     data = request.json
     
     script = data.get('script')
     if not script:
         return jsonify({'error': 'Script is required'}), 400
     
+    # 'low' for bulk backfills, 'high' for urgent one-offs
+    priority = data.get('priority', 'normal')
+    if not isinstance(priority, str) or priority not in PRIORITIES:
+        return jsonify({'error': f"Priority must be one of: {', '.join(PRIORITIES)}"}), 400
+    
+    idempotency_key = request.headers.get('Idempotency-Key') or None
+    if idempotency_key and len(idempotency_key) > 255:
+        return jsonify({'error': 'Idempotency-Key is limited to 255 characters'}), 400
+    
     try:
-        # Create video record
-        video_id = db.create_video(
-            script=script,
+        video_id, job_id, created = job_queue.submit_video(
+            script,
             title=data.get('title'),
-            description=data.get('description')
+            description=data.get('description'),
+            priority=priority,
+            idempotency_key=idempotency_key,
+            dedupe=bool(data.get('dedupe', config.VIDEO_DEDUPE))
         )
         
-        # Submit job to queue
-        job_id = job_queue.submit_job(video_id)
-        
         return jsonify({
             'success': True,
             'video_id': video_id,
             'job_id': job_id,
-            'message': 'Video creation started'
+            'duplicate': not created,
+            'message': 'Video creation started' if created else 'Matching video already requested'
         })
+    except IdempotencyConflict as e:
+        return jsonify({'error': str(e)}), 422
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/videos/<int:video_id>/download', methods=['GET'])
-def download_video(video_id):
-    """Download video file"""
+# Fields a batch item may set, as in the body of /api/videos/create
+BATCH_ITEM_FIELDS = ('script', 'title', 'description', 'priority', 'dedupe', 'idempotency_key')
+
+def _batch_items():
+    """
+    Decoded items of a batch request body
+    
+    NDJSON (application/x-ndjson) is decoded line by line as it streams
+    in; anything else is read as one JSON array.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        # Split 64KB reads ourselves; iterating the stream by line is
+        # several times slower
+        pending = b''
+        while True:
+            chunk = request.stream.read(64 * 1024)
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop() if chunk else b''
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+            if not chunk:
+                return
+    
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        raise ValueError('Body must be a JSON array or NDJSON')
+    yield from items
+
+@routes.route('/api/videos/batch', methods=['POST'])
+def create_videos_batch():
+    """
+    Create many videos at once, e.g. a whole content calendar
+    
+    Items are script strings or objects with a script and any of title,
+    description, priority, dedupe and idempotency_key (see create_video).
+    The priority and dedupe query parameters set defaults for all items.
+    Every video and job is inserted in one transaction, so either the
+    whole batch is queued or, if any item is invalid, none of it.
+    """
+    default_priority = request.args.get('priority', 'normal')
+    default_dedupe = request.args.get('dedupe', str(config.VIDEO_DEDUPE)).lower() == 'true'
+    
+    items = []
+    errors = []
+    try:
+        for index, raw in enumerate(_batch_items()):
+            if len(items) >= config.VIDEO_BATCH_LIMIT:
+                return jsonify({'error': f"At most {config.VIDEO_BATCH_LIMIT} videos per batch"}), 413
+            
+            raw = {'script': raw} if isinstance(raw, str) else raw
+            item = {field: raw.get(field) for field in BATCH_ITEM_FIELDS} if isinstance(raw, dict) else {}
+            item['priority'] = item.get('priority') or default_priority
+            item['dedupe'] = default_dedupe if item.get('dedupe') is None else bool(item['dedupe'])
+            if item.get('idempotency_key') is not None:
+                item['idempotency_key'] = str(item['idempotency_key'])
+            
+            if not isinstance(item.get('script'), str) or not item['script'].strip():
+                errors.append({'index': index, 'error': 'Script is required'})
+            elif not isinstance(item['priority'], str) or item['priority'] not in PRIORITIES:
+                errors.append({'index': index, 'error': f"Priority must be one of: {', '.join(PRIORITIES)}"})
+            elif len(item.get('idempotency_key') or '') > 255:
+                errors.append({'index': index, 'error': 'idempotency_key is limited to 255 characters'})
+            items.append(item)
+    except ValueError as e:
+        # Also json.JSONDecodeError from a malformed NDJSON line
+        return jsonify({'error': f"Invalid batch: {e}"}), 400
+    
+    if errors:
+        return jsonify({'error': 'Invalid items; nothing was created', 'items': errors}), 400
+    if not items:
+        return jsonify({'error': 'Batch is empty'}), 400
+    
+    try:
+        results = job_queue.submit_videos(items)
+    except IdempotencyConflict as e:
+        return jsonify({'error': f"Item {e.index}: {e}"}), 422
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'success': True,
+        'created': sum(1 for result in results if result[2]),
+        'videos': [
+            {'video_id': video_id, 'job_id': job_id, 'duplicate': not created}
+            for video_id, job_id, created in results
+        ]
+    })
+
+def _send_video(video_id, as_attachment):
+    """
+    Serve a finished video file
+    
+    Supports byte ranges (206), If-Range, strong ETags and Last-Modified
+    via send_file's conditional handling. The body goes out through the
+    WSGI server's file_wrapper, which uses sendfile() under servers such
+    as gunicorn. When ACCEL_REDIRECT_PREFIX is set, the transfer is handed
+    to the front proxy with X-Accel-Redirect instead. Videos kept in an
+    S3 artifact store are redirected to a short-lived presigned URL.
+    """
     video = db.get_video(video_id)
     if not video or not video.get('video_path'):
         return jsonify({'error': 'Video not found or not ready'}), 404
     
-    video_path = Path(video['video_path'])
+    download_name = f"{video['title']}.mp4"
+    disposition = 'attachment' if as_attachment else 'inline'
+    
+    if video['video_path'].startswith('s3://'):
+        return redirect(get_store().presigned_url(
+            video['video_path'],
+            disposition=f"{disposition}; filename*=UTF-8''{quote(download_name)}"
+        ))
+    
+    video_path = Path(video['video_path']).resolve()
     if not video_path.exists():
         return jsonify({'error': 'Video file not found'}), 404
+    touch(video_path)
+    
+    if config.ACCEL_REDIRECT_PREFIX:
+        try:
+            relative = video_path.relative_to(config.OUTPUT_DIR.resolve())
+        except ValueError:
+            relative = None
+        if relative is not None:
+            response = Response(mimetype='video/mp4')
+            response.headers['X-Accel-Redirect'] = (
+                config.ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(relative.as_posix())
+            )
+            response.headers['Content-Disposition'] = (
+                f"{disposition}; filename*=UTF-8''{quote(download_name)}"
+            )
+            return response
     
-    return send_from_directory(
-        video_path.parent,
-        video_path.name,
-        as_attachment=True,
-        download_name=f"{video['title']}.mp4"
+    return send_file(
+        video_path,
+        mimetype='video/mp4',
+        as_attachment=as_attachment,
+        download_name=download_name,
+        conditional=True,
+        etag=True,
+        last_modified=video_path.stat().st_mtime
     )
 
+@routes.route('/api/videos/<int:video_id>/download', methods=['GET'])
+def download_video(video_id):
+    """Download video file"""
+    return _send_video(video_id, as_attachment=True)
+
+@routes.route('/api/videos/<int:video_id>/stream', methods=['GET'])
+def stream_video(video_id):
+    """Stream video inline for in-browser preview and seeking"""
+    return _send_video(video_id, as_attachment=False)
+
 # ==================== Job Management ====================
 
-@app.route('/api/jobs', methods=['GET'])
+@routes.route('/api/jobs', methods=['GET'])
 def get_jobs():
-    """Get all jobs"""
-    status = request.args.get('status')
-    limit = int(request.args.get('limit', 50))
-    
-    jobs = db.get_all_jobs(status=status, limit=limit)
-    return jsonify(jobs)
+    """Get jobs (paginated, see _list_response)"""
+    return _list_response('jobs', db.get_all_jobs)
 
-@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+@routes.route('/api/jobs/<int:job_id>', methods=['GET'])
 def get_job(job_id):
     """Get specific job"""
     job = db.get_job(job_id)
@@ -145,34 +388,90 @@ def get_job(job_id):
         return jsonify(job)
     return jsonify({'error': 'Job not found'}), 404
 
-@app.route('/api/jobs/queue/status', methods=['GET'])
+@routes.route('/api/jobs/<int:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """
+    Cancel a queued or running job
+    
+    A running job is stopped by its worker within about a second
+    (JOB_CANCEL_POLL_INTERVAL); its status is 'cancelling' until then.
+    """
+    status = db.cancel_job(job_id)
+    if status:
+        return jsonify({'success': True, 'job_id': job_id, 'status': status})
+    
+    job = db.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'error': f"Job already {job['status']}"}), 409
+
+@routes.route('/api/jobs/queue/status', methods=['GET'])
 def get_queue_status():
     """Get job queue status"""
     return jsonify(job_queue.get_status())
 
+@routes.route('/api/jobs/<int:job_id>/trace', methods=['GET'])
+def get_job_trace(job_id):
+    """Download a job's span trace (Chrome trace event JSON)"""
+    path = tracing.trace_path(job_id)
+    if not path.is_file():
+        return jsonify({'error': 'No trace for this job (is TRACE_ENABLED set?)'}), 404
+    return send_file(path.resolve(), mimetype='application/json')
+
+# ==================== Live Events ====================
+
+@routes.route('/api/events', methods=['GET'])
+def stream_events():
+    """Server-Sent Events stream of job state, progress and step changes"""
+    job_watcher.start()
+    return Response(
+        stream_with_context(event_bus.stream()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',  # Disable proxy buffering (nginx)
+        }
+    )
+
 # ==================== Schedules ====================
 
-@app.route('/api/schedules', methods=['GET'])
+# Schedule columns editable through the API
+SCHEDULE_FIELDS = ('name', 'frequency', 'time', 'days', 'script_source', 'auto_upload', 'active')
+# Edits that make a schedule's pre-rendered videos wrong for its slots
+SCHEDULE_RENDER_FIELDS = {'frequency', 'time', 'days', 'script_source'}
+
+@routes.route('/api/schedules', methods=['GET'])
 def get_schedules():
     """Get all schedules"""
     active_only = request.args.get('active', 'false').lower() == 'true'
     schedules = db.get_all_schedules(active_only=active_only)
     return jsonify(schedules)
 
-@app.route('/api/schedules/create', methods=['POST'])
+@routes.route('/api/schedules/create', methods=['POST'])
 def create_schedule():
     """Create new schedule"""
     data = request.json
     
+    days = data.get('days')
+    if isinstance(days, list):
+        days = ','.join(str(d) for d in days)
+    
+    try:
+        next_run = compute_next_run(data['frequency'], data.get('time'), days)
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'Invalid schedule: {e}'}), 400
+    
     try:
         schedule_id = db.create_schedule(
             name=data['name'],
             frequency=data['frequency'],
             time=data.get('time'),
-            days=data.get('days'),
+            days=days,
             script_source=data.get('script_source'),
-            auto_upload=data.get('auto_upload', False)
+            auto_upload=data.get('auto_upload', False),
+            next_run=format_time(next_run)
         )
+        job_queue.scheduler.wake()
         
         return jsonify({
             'success': True,
@@ -182,49 +481,182 @@ def create_schedule():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@routes.route('/api/schedules/<int:schedule_id>', methods=['PUT'])
+def update_schedule(schedule_id):
+    """
+    Edit a schedule
+    
+    Pre-renders made for the old timing or script are discarded; a
+    rename or an auto_upload change keeps them (auto_upload is applied
+    when the slot fires).
+    """
+    schedule = db.get_schedule(schedule_id)
+    if not schedule:
+        return jsonify({'error': 'Schedule not found'}), 404
+    
+    data = request.json or {}
+    changes = {key: data[key] for key in SCHEDULE_FIELDS if key in data}
+    if isinstance(changes.get('days'), list):
+        changes['days'] = ','.join(str(d) for d in changes['days'])
+    changed = {key for key, value in changes.items() if value != schedule[key]}
+    schedule.update(changes)
+    
+    try:
+        next_run = compute_next_run(schedule['frequency'], schedule['time'], schedule['days'])
+    except ValueError as e:
+        return jsonify({'error': f'Invalid schedule: {e}'}), 400
+    
+    if changed & {'frequency', 'time', 'days', 'active'}:
+        changes['next_run'] = format_time(next_run)
+    if changes:
+        db.update_schedule(schedule_id, **changes)
+    if changed & SCHEDULE_RENDER_FIELDS:
+        job_queue.scheduler.discard_prerenders(schedule_id)
+    else:
+        # Only stale ones, e.g. after it was deactivated
+        job_queue.scheduler.discard_prerenders()
+    job_queue.scheduler.wake()
+    
+    return jsonify({'success': True, 'message': 'Schedule updated successfully'})
+
+@routes.route('/api/schedules/<int:schedule_id>', methods=['DELETE'])
+def delete_schedule(schedule_id):
+    """Delete a schedule and its unpublished pre-renders"""
+    if not db.get_schedule(schedule_id):
+        return jsonify({'error': 'Schedule not found'}), 404
+    
+    db.delete_schedule(schedule_id)
+    job_queue.scheduler.discard_prerenders()
+    job_queue.scheduler.wake()
+    
+    return jsonify({'success': True, 'message': 'Schedule deleted'})
+
 # ==================== Statistics ====================
 
-@app.route('/api/stats', methods=['GET'])
+# Short-lived cache so several dashboard tabs polling every 10s
+# share one round of count queries
+_stats_cache = {'value': None, 'etag': None, 'expires': 0.0}
+_stats_lock = threading.Lock()
+
+def _compute_stats():
+    """Build dashboard statistics from the maintained status counters"""
+    videos = db.get_status_counts('videos')
+    jobs = db.get_status_counts('jobs')
+    
+    return {
+        'total_videos': sum(videos.values()),
+        'completed_videos': videos.get('completed', 0),
+        'pending_videos': videos.get('pending', 0),
+        'failed_videos': videos.get('failed', 0),
+        'total_jobs': sum(jobs.values()),
+        'completed_jobs': jobs.get('completed', 0),
+        'pending_jobs': jobs.get('pending', 0),
+        'processing_jobs': jobs.get('processing', 0),
+        'failed_jobs': jobs.get('failed', 0),
+    }
+
+@routes.route('/api/stats', methods=['GET'])
 def get_stats():
     """Get dashboard statistics"""
-    all_videos = db.get_all_videos(limit=1000)
-    all_jobs = db.get_all_jobs(limit=1000)
-    
-    stats = {
-        'total_videos': len(all_videos),
-        'completed_videos': len([v for v in all_videos if v['status'] == 'completed']),
-        'pending_videos': len([v for v in all_videos if v['status'] == 'pending']),
-        'failed_videos': len([v for v in all_videos if v['status'] == 'failed']),
-        'total_jobs': len(all_jobs),
-        'completed_jobs': len([j for j in all_jobs if j['status'] == 'completed']),
-        'pending_jobs': len([j for j in all_jobs if j['status'] == 'pending']),
-        'processing_jobs': len([j for j in all_jobs if j['status'] == 'processing']),
-        'failed_jobs': len([j for j in all_jobs if j['status'] == 'failed']),
-    }
+    with _stats_lock:
+        now = time.monotonic()
+        if _stats_cache['value'] is None or now >= _stats_cache['expires']:
+            etag = _current_etag(('jobs', 'videos'))
+            if etag != _stats_cache['etag']:
+                _stats_cache['value'] = _compute_stats()
+                _stats_cache['etag'] = etag
+            _stats_cache['expires'] = now + config.STATS_CACHE_TTL
+        stats, etag = _stats_cache['value'], _stats_cache['etag']
     
-    return jsonify(stats)
+    if _not_modified(etag):
+        return _not_modified_response(etag)
+    return _with_etag(jsonify(stats), etag)
+
+# ==================== Metrics ====================
+
+_stage_histograms = StageHistograms()
+
+@routes.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text-format metrics"""
+    _stage_histograms.refresh(db.get_stage_metrics)
+    
+    jobs = db.get_status_counts('jobs')
+    videos = db.get_status_counts('videos')
+    pending = db.get_pending_by_priority()
+    priorities = sorted(PRIORITIES.items(), key=lambda item: item[1])
+    
+    lines = _stage_histograms.render()
+    lines += render_gauge('shorts_queue_depth', 'Pending jobs by priority', [
+        ({'priority': name}, pending.get(level, (0, None))[0]) for name, level in priorities
+    ])
+    lines += render_gauge('shorts_queue_oldest_pending_seconds', 'Age of the oldest pending job', [
+        ({'priority': name}, round(pending[level][1], 3)) for name, level in priorities if level in pending
+    ])
+    lines += render_gauge('shorts_workers_busy', 'Jobs being processed', [
+        ({}, jobs.get('processing', 0))
+    ])
+    lines += render_gauge('shorts_jobs_reclaimed', 'Times jobs were requeued after losing their worker', [
+        ({}, db.get_reclaim_total())
+    ])
+    cleaned_files, cleaned_bytes = db.get_cleanup_totals()
+    lines += render_gauge('shorts_artifacts_reclaimed_bytes', 'Disk space freed by the artifact janitor', [
+        ({}, cleaned_bytes)
+    ])
+    lines += render_gauge('shorts_artifacts_reclaimed_files', 'Files deleted by the artifact janitor', [
+        ({}, cleaned_files)
+    ])
+    lines += render_gauge('shorts_jobs', 'Jobs by status', [
+        ({'status': status}, count) for status, count in sorted(jobs.items())
+    ])
+    lines += render_gauge('shorts_videos', 'Videos by status', [
+        ({'status': status}, count) for status, count in sorted(videos.items())
+    ])
+    lines += render_gauge('shorts_event_subscribers', 'Connected live-update clients', [
+        ({}, event_bus.subscriber_count())
+    ])
+    
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
 
 # ==================== Health Check ====================
 
-@app.route('/api/health', methods=['GET'])
+@routes.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'queue_running': job_queue.running,
+        'queue_running': bool(job_queue.get_nodes()),
         'database': 'connected'
     })
 
 # ==================== Error Handlers ====================
 
-@app.errorhandler(404)
+@routes.app_errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Not found'}), 404
 
-@app.errorhandler(500)
+@routes.app_errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
+# ==================== App Factory ====================
+
+def create_app():
+    """
+    Build the web application
+    
+    Never starts job workers, so it is safe to run in any number of WSGI
+    server processes (e.g. gunicorn 'app:create_app()'); jobs are run by
+    worker.py processes, which share only the database with the web ones.
+    """
+    app = Flask(__name__, static_folder='web', static_url_path='')
+    CORS(app, expose_headers=['ETag', 'X-Total-Count', 'X-Next-Cursor'])
+    app.config['USE_X_SENDFILE'] = config.USE_X_SENDFILE
+    app.register_blueprint(routes)
+    return app
+
+app = create_app()
+
 # ==================== Main ====================
 
 if __name__ == '__main__':
@@ -236,4 +668,7 @@ if __name__ == '__main__':
     print("[API] API Docs: http://localhost:5000/api/health")
     print("\nPress Ctrl+C to stop\n")
     
+    # Development convenience: process jobs in this process too. In
+    # production run worker.py beside a WSGI server instead
+    job_queue.start()
     app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
@@ -0,0 +1,242 @@
+"""
+Artifact storage
+Stage outputs (voiceover, raw clip, captions, final video) keyed by job and stage
+"""
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from config import config
+
+# File each stage produces
+STAGE_FILES = {
+    'tts': 'audio.mp3',
+    'video': 'video_raw.mp4',
+    'captions': 'captions.srt',
+    'assemble': 'final_video.mp4',
+}
+
+# Store built from the configuration, see get_store()
+_store = None
+_store_lock = threading.Lock()
+
+def artifact_key(owner, stage):
+    """
+    Key of a stage's output
+    
+    Args:
+        owner: What the artifacts belong to, e.g. 'video_12' for a
+               video's render jobs or 'run_<id>' for a main.py run
+        stage: Stage that produces it (see STAGE_FILES)
+    """
+    return f"{owner}/{STAGE_FILES[stage]}"
+
+def video_owner(video_id):
+    """Artifact owner for the render and upload jobs of a video"""
+    return f"video_{video_id}"
+
+def new_owner(prefix='run'):
+    """Unique artifact owner for a one-off run, so concurrent runs never collide"""
+    return f"{prefix}_{uuid.uuid4().hex[:12]}"
+
+def touch(path):
+    """
+    Mark a local artifact as just used
+    
+    The janitor evicts the least recently used files first, and access
+    times are often not kept up to date (relatime/noatime mounts).
+    """
+    try:
+        os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+    except OSError:
+        pass
+
+class LocalStore:
+    """
+    Artifacts as files under one directory (OUTPUT_DIR)
+    
+    Stages write straight into the store, so save() and load() move no
+    data. Worker nodes share artifacts only if they share the directory.
+    """
+    
+    def __init__(self, root):
+        """
+        Initialize store
+        
+        Args:
+            root: Directory holding the artifacts
+        """
+        self.root = Path(root)
+    
+    def path(self, key):
+        """Local file a stage writes the artifact to"""
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+    
+    def save(self, key):
+        """Publish the artifact written to path(key); returns its location"""
+        if not (self.root / key).is_file():
+            raise FileNotFoundError(f"Artifact was not written: {self.root / key}")
+        return self.location(key)
+    
+    def load(self, key):
+        """Local file holding the artifact"""
+        path = self.root / key
+        if not path.is_file():
+            raise FileNotFoundError(f"Artifact not found: {path}")
+        touch(path)
+        return path
+    
+    def location(self, key):
+        """Where the artifact is kept, as stored in videos.video_path"""
+        return str(self.root / key)
+    
+    def fetch(self, location):
+        """Local file for a location returned by save()"""
+        return Path(location)
+    
+    def delete(self, owner):
+        """Remove all artifacts of an owner"""
+        shutil.rmtree(self.root / owner, ignore_errors=True)
+
+class S3Store:
+    """
+    Artifacts in an S3-compatible bucket (AWS S3, MinIO, R2, ...)
+    
+    Stages work on copies in a local cache directory. save() streams
+    the file up and load() streams it down in ARTIFACT_PART_SIZE parts
+    (multipart uploads, ranged GETs), never holding a whole video in
+    memory, so worker nodes on different machines can share artifacts.
+    Needs boto3; credentials come from the usual AWS environment.
+    """
+    
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None,
+                 cache_dir=None, part_size=8 * 1024 * 1024):
+        """
+        Initialize store
+        
+        Args:
+            bucket: Bucket name
+            prefix: Key prefix inside the bucket
+            endpoint_url: S3-compatible endpoint (default AWS)
+            region: Bucket region (optional)
+            cache_dir: Local working copies (default ARTIFACT_CACHE_DIR)
+            part_size: Multipart chunk size in bytes
+        """
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config as BotoConfig
+        except ImportError:
+            raise RuntimeError("ARTIFACT_STORE=s3 needs boto3: pip install boto3")
+        
+        self.bucket = bucket
+        self.prefix = prefix
+        self.cache_dir = Path(cache_dir or config.ARTIFACT_CACHE_DIR)
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            # Only send checksums S3 requires; many S3-compatible
+            # services reject the newer default ones
+            config=BotoConfig(
+                request_checksum_calculation='when_required',
+                response_checksum_validation='when_required',
+                s3={'addressing_style': 'path'} if endpoint_url else None
+            )
+        )
+        self.transfer = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            io_chunksize=min(part_size, 256 * 1024)
+        )
+    
+    def path(self, key):
+        """Local file a stage writes the artifact to"""
+        path = self.cache_dir / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+    
+    def save(self, key):
+        """Upload the artifact written to path(key); returns its location"""
+        self.client.upload_file(str(self.cache_dir / key), self.bucket, self.prefix + key,
+                                Config=self.transfer)
+        return self.location(key)
+    
+    def load(self, key):
+        """Local file holding the artifact, downloaded unless already cached"""
+        path = self.cache_dir / key
+        if not path.is_file():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Download beside it and rename, so a half-written file is
+            # never mistaken for a cached one
+            partial = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}")
+            try:
+                self.client.download_file(self.bucket, self.prefix + key, str(partial),
+                                          Config=self.transfer)
+                partial.replace(path)
+            finally:
+                partial.unlink(missing_ok=True)
+        else:
+            touch(path)
+        return path
+    
+    def location(self, key):
+        """Where the artifact is kept, as stored in videos.video_path"""
+        return f"s3://{self.bucket}/{self.prefix}{key}"
+    
+    def key_of(self, location):
+        """Store key of a location returned by save()"""
+        head = f"s3://{self.bucket}/{self.prefix}"
+        if not location.startswith(head):
+            raise ValueError(f"Not in this store: {location}")
+        return location[len(head):]
+    
+    def fetch(self, location):
+        """Local file for a location returned by save()"""
+        if not location.startswith('s3://'):
+            return Path(location)
+        return self.load(self.key_of(location))
+    
+    def presigned_url(self, location, expires=3600, disposition=None):
+        """Temporary GET URL, e.g. to let browsers stream a final video"""
+        params = {'Bucket': self.bucket, 'Key': self.prefix + self.key_of(location)}
+        if disposition:
+            params['ResponseContentDisposition'] = disposition
+        return self.client.generate_presigned_url('get_object', Params=params, ExpiresIn=expires)
+    
+    def delete(self, owner):
+        """Remove all artifacts of an owner, in the bucket and the cache"""
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}{owner}/"):
+            objects = [{'Key': item['Key']} for item in page.get('Contents', [])]
+            if objects:
+                self.client.delete_objects(Bucket=self.bucket, Delete={'Objects': objects})
+        shutil.rmtree(self.cache_dir / owner, ignore_errors=True)
+
+def create_store():
+    """Build the store selected by ARTIFACT_STORE"""
+    if config.ARTIFACT_STORE == 's3':
+        if not config.ARTIFACT_S3_BUCKET:
+            raise RuntimeError("ARTIFACT_STORE=s3 needs ARTIFACT_S3_BUCKET")
+        return S3Store(
+            config.ARTIFACT_S3_BUCKET,
+            prefix=config.ARTIFACT_S3_PREFIX,
+            endpoint_url=config.ARTIFACT_S3_ENDPOINT,
+            region=config.ARTIFACT_S3_REGION,
+            part_size=config.ARTIFACT_PART_SIZE
+        )
+    if config.ARTIFACT_STORE != 'local':
+        raise ValueError(f"Unknown ARTIFACT_STORE: {config.ARTIFACT_STORE}")
+    return LocalStore(config.OUTPUT_DIR)
+
+def get_store():
+    """The configured store, built on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = create_store()
+        return _store
@@ -0,0 +1,90 @@
+"""
+Benchmark for bulk video creation
+
+Creates N videos (default 500, e.g. a content calendar) against a
+throwaway database through the Flask test client, three ways:
+  - one POST /api/videos/create per video
+  - one POST /api/videos/batch with a JSON array
+  - one POST /api/videos/batch with an NDJSON body
+
+and reports total seconds and videos per second for each. Every run
+starts from an empty database of its own.
+
+Usage:
+    python benchmarks/bench_create.py --videos 500
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bench_list_endpoints import SCRIPT
+
+
+def items(count):
+    """Calendar entries with a few per-item options"""
+    return [
+        {'script': f"{i}. {SCRIPT}", 'title': f"Day {i}", 'priority': 'low' if i % 7 else 'normal'}
+        for i in range(count)
+    ]
+
+
+def per_request(client, entries):
+    for entry in entries:
+        response = client.post('/api/videos/create', json=entry)
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+
+def batch_json(client, entries):
+    response = client.post('/api/videos/batch', json=entries)
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+
+def batch_ndjson(client, entries):
+    body = ''.join(json.dumps(entry) + '\n' for entry in entries)
+    response = client.post('/api/videos/batch', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk video creation benchmark')
+    parser.add_argument('--videos', type=int, default=500, help='Videos created per case')
+    args = parser.parse_args()
+    
+    # The app's global database lives under ./data, so run from a scratch dir
+    os.chdir(tempfile.mkdtemp(prefix='bench-create-'))
+    from database import Database
+    import app as app_module
+    import job_queue
+    
+    entries = items(args.videos)
+    results = []
+    for name, create in (('per-request /api/videos/create', per_request),
+                         ('/api/videos/batch, JSON array', batch_json),
+                         ('/api/videos/batch, NDJSON', batch_ndjson)):
+        db = Database(Path(tempfile.mkdtemp(prefix='db-')) / 'automation.db')
+        app_module.db = job_queue.db = db
+        client = app_module.create_app().test_client()
+        
+        t0 = time.perf_counter()
+        create(client, entries)
+        seconds = time.perf_counter() - t0
+        
+        assert db.get_status_counts('jobs').get('pending') == args.videos
+        results.append((name, seconds))
+    
+    baseline = results[0][1]
+    print(f"\n{'Case':<35} {'seconds':>9} {'videos/s':>10} {'speedup':>8}")
+    print('-' * 65)
+    for name, seconds in results:
+        print(f"{name:<35} {seconds:>9.3f} {args.videos / seconds:>10.0f} {baseline / seconds:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+FFmpeg encode benchmark for VideoAssembler settings
+
+Generates synthetic 9:16 inputs locally (an FFmpeg lavfi test pattern,
+a sine-wave voiceover and an SRT with one caption every couple of
+seconds), then runs VideoAssembler.assemble across every combination of
+preset, CRF, captions on/off and thread count. For each it reports:
+  - encode seconds (median of --repeat runs) and realtime factor
+  - output bytes and average bitrate
+  - SSIM against a lossless encode of the same input (and VMAF when
+    FFmpeg is built with libvmaf)
+
+Results are also written as JSON, with the FFmpeg version, CPU count
+and git commit, so runs on the same machine can be tracked over time.
+Pick the winner with FFMPEG_PRESET / FFMPEG_CRF / FFMPEG_THREADS.
+
+Usage:
+    python benchmarks/bench_encode.py
+    python benchmarks/bench_encode.py --presets veryfast,medium,slow --crf 20,23,26 --threads 0,2,4
+    python benchmarks/bench_encode.py --pattern mandelbrot --duration 30 --json encode.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+CAPTIONS = ["Did you know", "that honey", "never spoils?", "Archaeologists found",
+            "3000-year-old honey", "in Egyptian tombs", "that's still", "perfectly edible!"]
+
+
+def ffmpeg(*args):
+    """Run FFmpeg quietly; returns stderr (where it reports filter results)"""
+    result = subprocess.run(['ffmpeg', '-hide_banner', '-nostats', '-y', *args],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg {' '.join(args)} failed:\n{result.stderr[-2000:]}")
+    return result.stderr
+
+
+def srt_time(seconds):
+    """SRT timestamp"""
+    ms = int(round(seconds * 1000))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+
+def make_inputs(workdir, args):
+    """Synthetic video clip, voiceover and captions"""
+    video = workdir / 'input.mp4'
+    audio = workdir / 'voiceover.wav'
+    captions = workdir / 'captions.srt'
+    
+    # Near-lossless source, like a downloaded AI clip at high bitrate
+    ffmpeg('-f', 'lavfi', '-i', f"{args.pattern}=size={args.width}x{args.height}:rate={args.fps}",
+           '-t', str(args.duration), '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '12',
+           '-pix_fmt', 'yuv420p', str(video))
+    ffmpeg('-f', 'lavfi', '-i', "sine=frequency=220:sample_rate=24000",
+           '-t', str(args.duration), str(audio))
+    
+    step = 2.0
+    entries = []
+    for i in range(int(args.duration / step)):
+        text = CAPTIONS[i % len(CAPTIONS)]
+        entries.append(f"{i + 1}\n{srt_time(i * step)} --> {srt_time((i + 1) * step)}\n{text}\n")
+    captions.write_text('\n'.join(entries), encoding='utf-8')
+    
+    return video, audio, captions
+
+
+def has_filter(name):
+    """Whether FFmpeg was built with a filter"""
+    result = subprocess.run(['ffmpeg', '-hide_banner', '-filters'], capture_output=True, text=True)
+    return re.search(rf'\s{name}\s', result.stdout) is not None
+
+
+def quality(output, reference, vmaf):
+    """SSIM (and VMAF) of an encode against the lossless reference"""
+    scores = {}
+    stderr = ffmpeg('-i', str(output), '-i', str(reference), '-lavfi', '[0:v][1:v]ssim', '-f', 'null', '-')
+    match = re.search(r'All:([\d.]+)', stderr)
+    scores['ssim'] = float(match.group(1)) if match else None
+    
+    if vmaf:
+        stderr = ffmpeg('-i', str(output), '-i', str(reference), '-lavfi', '[0:v][1:v]libvmaf', '-f', 'null', '-')
+        match = re.search(r'VMAF score[:=]\s*([\d.]+)', stderr)
+        scores['vmaf'] = float(match.group(1)) if match else None
+    return scores
+
+
+def assemble(settings, inputs, captioned, output):
+    """One VideoAssembler run; returns wall-clock seconds"""
+    from modules import VideoAssembler
+    
+    video, audio, captions = inputs
+    assembler = VideoAssembler(settings)
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        assembler.assemble(video, audio, captions if captioned else None, output)
+    return time.perf_counter() - started
+
+
+def git_commit():
+    """Current commit, if run from a checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--presets', default='ultrafast,veryfast,fast,medium,slow')
+    parser.add_argument('--crf', default='20,23,26,28')
+    parser.add_argument('--threads', default='0', help="Thread counts to try (0 = FFmpeg's choice)")
+    parser.add_argument('--captions', choices=['on', 'off', 'both'], default='both')
+    parser.add_argument('--duration', type=float, default=10.0, help='Clip length in seconds')
+    parser.add_argument('--pattern', default='testsrc2',
+                        help='lavfi video source, e.g. testsrc2, mandelbrot, life, cellauto')
+    parser.add_argument('--width', type=int, default=1080)
+    parser.add_argument('--height', type=int, default=1920)
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=1, help='Encodes per combination (median is kept)')
+    parser.add_argument('--no-quality', action='store_true', help='Skip SSIM/VMAF scoring')
+    parser.add_argument('--json', default='bench_encode.json', help='Results file')
+    args = parser.parse_args()
+    
+    if shutil.which('ffmpeg') is None:
+        parser.error("ffmpeg not found on PATH")
+    
+    from config import config
+    
+    presets = args.presets.split(',')
+    crfs = [int(c) for c in args.crf.split(',')]
+    threads = [int(t) for t in args.threads.split(',')]
+    captions = {'on': [True], 'off': [False], 'both': [False, True]}[args.captions]
+    vmaf = not args.no_quality and has_filter('libvmaf')
+    
+    workdir = Path(tempfile.mkdtemp(prefix='bench-encode-'))
+    try:
+        print(f"Generating {args.duration:g}s {args.width}x{args.height} '{args.pattern}' inputs...")
+        inputs = make_inputs(workdir, args)
+        
+        # Lossless encodes of the same filter graph to score against
+        references = {}
+        if not args.no_quality:
+            for captioned in captions:
+                references[captioned] = workdir / f"reference_{int(captioned)}.mp4"
+                assemble(config.snapshot(FFMPEG_PRESET='ultrafast', FFMPEG_CRF=0, FFMPEG_THREADS=0),
+                         inputs, captioned, references[captioned])
+        
+        results = []
+        header = f"{'preset':<11}{'crf':>4}{'thr':>4}{'capt':>5}{'encode s':>10}{'x rt':>7}{'MB':>8}{'kbit/s':>8}"
+        if references:
+            header += f"{'ssim':>8}"
+        if vmaf:
+            header += f"{'vmaf':>7}"
+        print(header)
+        
+        for preset, crf, thread_count, captioned in itertools.product(presets, crfs, threads, captions):
+            settings = config.snapshot(FFMPEG_PRESET=preset, FFMPEG_CRF=crf, FFMPEG_THREADS=thread_count)
+            output = workdir / f"{preset}_{crf}_{thread_count}_{int(captioned)}.mp4"
+            seconds = statistics.median(
+                assemble(settings, inputs, captioned, output) for _ in range(args.repeat)
+            )
+            size = output.stat().st_size
+            
+            result = {
+                'preset': preset,
+                'crf': crf,
+                'threads': thread_count,
+                'captions': captioned,
+                'encode_seconds': round(seconds, 3),
+                'realtime_factor': round(args.duration / seconds, 2),
+                'bytes': size,
+                'kbps': round(size * 8 / args.duration / 1000, 1),
+            }
+            if references:
+                result.update(quality(output, references[captioned], vmaf))
+            results.append(result)
+            
+            line = (f"{preset:<11}{crf:>4}{thread_count:>4}{'on' if captioned else 'off':>5}"
+                    f"{result['encode_seconds']:>10.2f}{result['realtime_factor']:>7.2f}"
+                    f"{size / 1e6:>8.2f}{result['kbps']:>8.0f}")
+            if 'ssim' in result:
+                line += f"{result['ssim'] or 0:>8.4f}"
+            if vmaf:
+                line += f"{result.get('vmaf') or 0:>7.2f}"
+            print(line)
+            output.unlink()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    version = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True).stdout.split('\n')[0]
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'commit': git_commit(),
+        'ffmpeg': version,
+        'machine': {'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'input': {
+            'pattern': args.pattern, 'width': args.width, 'height': args.height,
+            'fps': args.fps, 'duration': args.duration
+        },
+        'results': results
+    }
+    Path(args.json).write_text(json.dumps(report, indent=2))
+    print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
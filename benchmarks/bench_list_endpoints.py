@@ -0,0 +1,131 @@
+"""
+Benchmark for the paginated /api/videos and /api/jobs endpoints
+
+Seeds a throwaway database with N videos and jobs (default 100k each,
+with realistic ~1.5KB scripts), then measures response size and latency
+through the Flask test client for:
+  - full rows vs a fields= projection
+  - the first page vs a deep page reached by keyset cursor
+  - OFFSET paging at the same depth, for comparison
+
+Usage:
+    python benchmarks/bench_list_endpoints.py --rows 100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+STATUSES = ['completed'] * 8 + ['failed']
+SCRIPT = ("Did you know that honey never spoils? Archaeologists have found "
+          "3000-year-old honey in Egyptian tombs that's still perfectly edible! ") * 10
+
+
+def seed(db_path, rows):
+    """Bulk insert synthetic videos and jobs"""
+    conn = sqlite3.connect(db_path)
+    start = time.time() - rows  # one row per second of history
+    
+    def ts(i):
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start + i))
+    
+    conn.executemany(
+        'INSERT INTO videos (title, script, status, created_at) VALUES (?, ?, ?, ?)',
+        ((f'Video {i}', SCRIPT, random.choice(STATUSES), ts(i)) for i in range(rows))
+    )
+    conn.executemany(
+        '''INSERT INTO jobs (video_id, status, progress, current_step, created_at)
+           VALUES (?, ?, 100, 'Completed', ?)''',
+        ((i + 1, random.choice(STATUSES), ts(i)) for i in range(rows))
+    )
+    conn.commit()
+    conn.close()
+
+
+def measure(client, url, repeat):
+    """Return (median ms, response bytes, headers) for a GET"""
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - t0) * 1000)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return statistics.median(timings), len(response.get_data()), response.headers
+
+
+def walk_cursor(client, url, pages):
+    """Follow X-Next-Cursor for the given number of pages"""
+    cursor = None
+    for _ in range(pages):
+        response = client.get(url + (f'&cursor={cursor}' if cursor else ''))
+        cursor = response.headers.get('X-Next-Cursor')
+    return cursor
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List endpoint benchmark')
+    parser.add_argument('--rows', type=int, default=100000, help='Rows per table')
+    parser.add_argument('--repeat', type=int, default=20, help='Requests per measurement')
+    parser.add_argument('--depth', type=int, default=1000, help='Page number for deep-page tests')
+    args = parser.parse_args()
+    
+    # The app's global database lives under ./data, so run from a scratch dir
+    os.chdir(tempfile.mkdtemp(prefix='bench-list-'))
+    from database import db
+    
+    print(f"Seeding {args.rows:,} videos and jobs...")
+    seed(db.db_path, args.rows)
+    
+    # Import after seeding so the job worker does not contend for the lock
+    from app import app
+    
+    client = app.test_client()
+    limit = 50
+    results = []
+    
+    for table, fields in (('videos', 'title,status,youtube_url'),
+                          ('jobs', 'title,status,progress,current_step')):
+        base = f'/api/{table}?limit={limit}'
+        
+        ms, size, headers = measure(client, base, args.repeat)
+        results.append((f'{table}: first page, all columns', ms, size))
+        
+        ms, size, _ = measure(client, f'{base}&fields={fields}', args.repeat)
+        results.append((f'{table}: first page, fields=', ms, size))
+        
+        cursor = walk_cursor(client, f'{base}&fields=id', args.depth - 1)
+        ms, size, _ = measure(client, f'{base}&fields={fields}&cursor={cursor}', args.repeat)
+        results.append((f'{table}: page {args.depth} by cursor', ms, size))
+        
+        # Baseline: OFFSET paging at the same depth
+        conn = sqlite3.connect(db.db_path)
+        timings = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            conn.execute(
+                f'SELECT * FROM {table} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?',
+                (limit, limit * (args.depth - 1))
+            ).fetchall()
+            timings.append((time.perf_counter() - t0) * 1000)
+        conn.close()
+        results.append((f'{table}: page {args.depth} by OFFSET (SQL only)',
+                        statistics.median(timings), 0))
+        
+        print(f"{table}: X-Total-Count = {headers['X-Total-Count']}")
+    
+    print(f"\n{'Case':<45} {'median ms':>10} {'bytes':>10}")
+    print('-' * 67)
+    for name, ms, size in results:
+        print(f"{name:<45} {ms:>10.2f} {size or '-':>10}")
+
+
+if __name__ == '__main__':
+    main()
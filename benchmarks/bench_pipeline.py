@@ -0,0 +1,275 @@
+"""
+End-to-end pipeline benchmark against local fake providers
+
+Starts the stand-ins from fake_providers.py, points every module at them
+and, for each concurrency setting, pushes N jobs through a fresh JobQueue
+and database. Reports jobs/hour, p50/p95 latency per stage and provider
+operation (from stage_metrics) and peak Python heap. Optionally times
+full `main.py` CLI runs as subprocesses as well.
+
+Nothing leaves the machine and no API keys are needed. The final FFmpeg
+assembly needs ffmpeg on PATH; --no-encode replaces it with a file copy
+so queue and provider overhead can still be measured without it.
+
+With --cassette, provider calls are served from a cassette recorded from
+the real APIs (CASSETTE_MODE=record, see cassette.py) instead, with the
+recorded response times or none (--replay-latency 0). The services must
+match the recording.
+
+Usage:
+    python benchmarks/bench_pipeline.py --jobs 20 --concurrency 1,2,4
+    python benchmarks/bench_pipeline.py --latency chat=0.8,tts=1.5 --render-time 30
+    python benchmarks/bench_pipeline.py --cli-runs 3
+    python benchmarks/bench_pipeline.py --cassette data/cassette.jsonl --replay-latency 0
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+from fake_providers import FakeOptions, FakeProviders, parse_latency
+
+SCRIPT = ("Did you know that honey never spoils? Archaeologists have found "
+          "3000-year-old honey in Egyptian tombs that's still perfectly edible!")
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    index = max(int(round(fraction * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def copy_assembler():
+    """VideoAssembler stand-in for --no-encode: copies the raw clip"""
+    from modules import VideoAssembler
+    
+    class CopyAssembler(VideoAssembler):
+        def __init__(self, settings=None):
+            self.settings = settings
+        
+        def assemble(self, video_path, audio_path, captions_path=None, output_path=None):
+            shutil.copyfile(video_path, output_path)
+            return str(output_path)
+    
+    return CopyAssembler
+
+
+def replay_settings(path, latency):
+    """Config values that serve every provider call from a cassette"""
+    settings = {
+        'CASSETTE_MODE': 'replay',
+        'CASSETTE_PATH': str(Path(path).resolve()),
+        'CASSETTE_LATENCY': str(latency),
+    }
+    # Recorded poll responses arrive in order, so only the interval
+    # between them is left to shorten
+    if not latency:
+        settings['VIDEO_POLL_INTERVAL'] = '0.01'
+    # The clients insist on a key even though none is sent anywhere
+    for name in ('GEMINI_API_KEY', 'OPENAI_API_KEY', 'OPENAI_GPT_API_KEY', 'ELEVENLABS_API_KEY',
+                 'LUMA_API_KEY', 'RUNWAY_API_KEY'):
+        settings[name] = os.environ.get(name) or 'replay'
+    return settings
+
+
+def run_queue(workdir, jobs, concurrency, timeout):
+    """Push `jobs` videos through a JobQueue with `concurrency` workers"""
+    import job_queue as jq
+    from database import Database
+    
+    run_db = Database(workdir / f"run_{concurrency}.db")
+    jq.db = run_db
+    queue = jq.JobQueue(workers=concurrency)
+    
+    for n in range(jobs):
+        queue.submit_job(run_db.create_video(SCRIPT, title=f"Bench {n}"))
+    
+    tracemalloc.start()
+    started = time.perf_counter()
+    queue.start()
+    
+    deadline = started + timeout
+    while time.perf_counter() < deadline:
+        counts = run_db.get_status_counts('jobs')
+        if counts.get('completed', 0) + counts.get('failed', 0) >= jobs:
+            break
+        time.sleep(0.1)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    queue.stop()
+    
+    durations = {}
+    for row in run_db.get_stage_metrics():
+        key = f"{row['stage']}.{row['detail']}" if row['detail'] else row['stage']
+        durations.setdefault(key, []).append(row['duration'])
+    
+    counts = run_db.get_status_counts('jobs')
+    return {
+        'concurrency': concurrency,
+        'jobs': jobs,
+        'completed': counts.get('completed', 0),
+        'failed': counts.get('failed', 0),
+        'seconds': round(elapsed, 2),
+        'jobs_per_hour': round(counts.get('completed', 0) / elapsed * 3600, 1),
+        'peak_heap_mb': round(peak / 1e6, 1),
+        'stages': {
+            key: {
+                'n': len(values),
+                'p50': round(percentile(values, 0.50), 3),
+                'p95': round(percentile(values, 0.95), 3)
+            }
+            for key, values in sorted(durations.items())
+        }
+    }
+
+
+def run_cli(workdir, runs, env):
+    """Time full main.py runs"""
+    cli_dir = workdir / 'cli'
+    cli_dir.mkdir(exist_ok=True)
+    
+    timings = []
+    failures = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, str(ROOT / 'main.py'), '--script', SCRIPT],
+            cwd=cli_dir, env=env, capture_output=True, text=True
+        )
+        timings.append(time.perf_counter() - started)
+        if result.returncode != 0:
+            failures += 1
+    
+    # ru_maxrss is KB on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    scale = 1e6 if sys.platform == 'darwin' else 1e3
+    return {
+        'runs': runs,
+        'failed': failures,
+        'p50': round(percentile(timings, 0.50), 2),
+        'p95': round(percentile(timings, 0.95), 2),
+        'runs_per_hour': round((runs - failures) / sum(timings) * 3600, 1),
+        'peak_rss_mb': round(maxrss / scale, 1)
+    }
+
+
+def print_run(result):
+    """Print one concurrency setting's results"""
+    print(f"\n=== concurrency {result['concurrency']}: {result['completed']}/{result['jobs']} completed, "
+          f"{result['failed']} failed in {result['seconds']}s -> {result['jobs_per_hour']} jobs/hour, "
+          f"peak heap {result['peak_heap_mb']} MB")
+    print(f"  {'stage':<28}{'n':>6}{'p50 s':>10}{'p95 s':>10}")
+    for key, values in result['stages'].items():
+        print(f"  {key:<28}{values['n']:>6}{values['p50']:>10.3f}{values['p95']:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=10)
+    parser.add_argument('--concurrency', default='1,2,4', help='Worker counts to compare')
+    parser.add_argument('--latency', default='0.05',
+                        help="Seconds per provider call, or 'group=seconds,...' "
+                             "(groups: chat, tts, whisper, video, poll, media)")
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--render-time', type=float, default=2.0,
+                        help='Seconds until a fake video generation completes')
+    parser.add_argument('--audio-seconds', type=float, default=5.0)
+    parser.add_argument('--video-seconds', type=float, default=5.0)
+    parser.add_argument('--video-bytes', type=int, default=256 * 1024)
+    parser.add_argument('--content', choices=['gemini', 'gpt4'], default='gemini')
+    parser.add_argument('--tts', choices=['openai', 'elevenlabs'], default='openai')
+    parser.add_argument('--video', choices=['luma', 'runway'], default='luma')
+    parser.add_argument('--cli-runs', type=int, default=0, help='Also time N main.py runs')
+    parser.add_argument('--no-encode', action='store_true',
+                        help='Copy the raw clip instead of running FFmpeg')
+    parser.add_argument('--timeout', type=float, default=1800, help='Per concurrency setting')
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--cassette', help='Replay this cassette instead of using fake providers')
+    parser.add_argument('--replay-latency', type=float, default=1.0,
+                        help='Multiplier for recorded response times (0 = instant)')
+    args = parser.parse_args()
+    
+    has_ffmpeg = shutil.which('ffmpeg') is not None
+    if not has_ffmpeg and not args.no_encode:
+        parser.error("ffmpeg not found on PATH; install it or pass --no-encode")
+    
+    if args.cassette:
+        fake = None
+        settings = replay_settings(args.cassette, args.replay_latency)
+    else:
+        fake = FakeProviders(FakeOptions(
+            latency=parse_latency(args.latency),
+            failure_rate=args.failure_rate,
+            render_time=args.render_time,
+            audio_seconds=args.audio_seconds,
+            video_seconds=args.video_seconds,
+            video_bytes=args.video_bytes,
+            seed=args.seed
+        )).start()
+        settings = fake.settings(args.video)
+    
+    # Config reads the environment on import, so set it up first; the
+    # database and output/ are created relative to the working directory
+    env = dict(os.environ, **settings)
+    env.update(VIDEO_SERVICE=args.video, CONTENT_AI_SERVICE=args.content, TTS_SERVICE=args.tts)
+    os.environ.update(env)
+    workdir = Path(tempfile.mkdtemp(prefix='bench-pipeline-'))
+    os.chdir(workdir)
+    
+    if fake:
+        print(f"Fake providers on {fake.url}; working in {workdir}")
+    else:
+        print(f"Replaying {args.cassette} (latency x{args.replay_latency}); working in {workdir}")
+    print(f"Pipeline: {args.content} / {args.tts} / {args.video}, "
+          f"{'copy instead of FFmpeg' if args.no_encode else 'FFmpeg encode'}")
+    
+    if args.no_encode:
+        import job_queue
+        job_queue.VideoAssembler = copy_assembler()
+    
+    results = {'queue': [], 'cli': None, 'provider_requests': None}
+    try:
+        for concurrency in [int(c) for c in args.concurrency.split(',')]:
+            result = run_queue(workdir, args.jobs, concurrency, args.timeout)
+            results['queue'].append(result)
+            print_run(result)
+        
+        if args.cli_runs:
+            if not has_ffmpeg:
+                print("\nSkipping CLI runs: main.py needs ffmpeg")
+            else:
+                results['cli'] = run_cli(workdir, args.cli_runs, env)
+                cli = results['cli']
+                print(f"\n=== CLI: {cli['runs'] - cli['failed']}/{cli['runs']} succeeded, "
+                      f"p50 {cli['p50']}s, p95 {cli['p95']}s -> {cli['runs_per_hour']} runs/hour, "
+                      f"peak RSS {cli['peak_rss_mb']} MB")
+        
+        if fake:
+            results['provider_requests'] = dict(fake.requests)
+            print(f"\nProvider requests: {results['provider_requests']}")
+    finally:
+        if fake:
+            fake.stop()
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+    
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""
+Local stand-ins for the paid provider APIs
+
+Serves just enough of Gemini, OpenAI (chat, TTS, Whisper), ElevenLabs,
+Luma and Runway for the pipeline modules to run end to end without
+network access or API spend. Latency, failure rate, render time and
+payload sizes are configurable; audio and video payloads are synthesised
+locally (a sine-wave WAV, and an FFmpeg test pattern when FFmpeg is
+installed).
+
+Point the app at it through the endpoint settings (see settings()), or
+run it on its own:
+    python benchmarks/fake_providers.py --port 8765 --latency chat=0.8,tts=1.5
+"""
+import argparse
+import io
+import json
+import math
+import os
+import random
+import re
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+import wave
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPT_WORDS = ("did you know that honey never spoils archaeologists have found "
+                "three thousand year old honey in egyptian tombs").split()
+
+METADATA = {
+    "title": "Honey Never Spoils",
+    "description": "Archaeologists found edible 3000-year-old honey. Here is why.",
+    "tags": ["honey", "facts", "history", "egypt", "science",
+             "food", "shorts", "didyouknow", "archaeology", "nature"],
+    "hashtags": ["#shorts", "#facts", "#honey", "#history", "#science"]
+}
+
+
+@dataclass
+class FakeOptions:
+    """Behaviour of the stand-in providers"""
+    latency: dict = field(default_factory=lambda: {'default': 0.05})  # route group -> seconds
+    jitter: float = 0.25           # +/- fraction applied to each latency
+    failure_rate: float = 0.0      # chance an API call answers 503
+    render_time: float = 2.0       # seconds until a video generation completes
+    audio_seconds: float = 5.0     # length of synthesised voiceovers
+    video_seconds: float = 5.0     # length of synthesised clips
+    video_bytes: int = 256 * 1024  # clip size when FFmpeg is not available
+    seed: int = None
+
+
+def parse_latency(spec):
+    """Parse '0.2' or 'default=0.1,chat=0.8,tts=1.5' into {group: seconds}"""
+    latency = {'default': 0.05}
+    for part in str(spec).split(','):
+        if '=' in part:
+            group, value = part.split('=', 1)
+            latency[group.strip()] = float(value)
+        elif part.strip():
+            latency['default'] = float(part)
+    return latency
+
+
+def synth_wav(seconds, rate=16000, frequency=440.0):
+    """A mono sine-wave WAV"""
+    frames = int(seconds * rate)
+    samples = b''.join(
+        struct.pack('<h', int(12000 * math.sin(2 * math.pi * frequency * n / rate)))
+        for n in range(frames)
+    )
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(samples)
+    return buffer.getvalue()
+
+
+def synth_mp4(seconds, fallback_bytes):
+    """A small vertical test-pattern clip, or opaque bytes without FFmpeg"""
+    if shutil.which('ffmpeg'):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'clip.mp4')
+            subprocess.run([
+                'ffmpeg', '-y', '-f', 'lavfi', '-i', f'testsrc2=size=270x480:rate=30',
+                '-t', str(seconds), '-pix_fmt', 'yuv420p', path
+            ], capture_output=True, check=True)
+            with open(path, 'rb') as f:
+                return f.read()
+    
+    header = b'\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom'
+    return header + os.urandom(max(fallback_bytes - len(header), 0))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Routes requests to the provider stand-ins"""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    # (method, pattern, route group, handler name)
+    ROUTES = [
+        ('POST', r'/v1beta/models/[^/:]+:generateContent', 'chat', 'gemini'),
+        ('POST', r'/v1/chat/completions', 'chat', 'openai_chat'),
+        ('POST', r'/v1/audio/speech', 'tts', 'openai_speech'),
+        ('POST', r'/v1/audio/transcriptions', 'whisper', 'whisper'),
+        ('POST', r'/v1/text-to-speech/[^/]+', 'tts', 'elevenlabs'),
+        ('POST', r'/luma/generations', 'video', 'video_submit'),
+        ('GET', r'/luma/generations/(?P<task>[^/]+)', 'poll', 'luma_status'),
+        ('POST', r'/runway/video/generate', 'video', 'video_submit'),
+        ('GET', r'/runway/tasks/(?P<task>[^/]+)', 'poll', 'runway_status'),
+        ('GET', r'/media/(?P<task>[^/]+)\.mp4', 'media', 'media'),
+    ]
+    
+    def log_message(self, format, *args):
+        """Keep benchmark output clean"""
+    
+    def do_GET(self):
+        self._dispatch('GET')
+    
+    def do_POST(self):
+        self._dispatch('POST')
+    
+    def _dispatch(self, method):
+        """Match a route, apply latency and failures, then answer"""
+        path = self.path.split('?', 1)[0]
+        body = self._read_body()
+        
+        for route_method, pattern, group, name in self.ROUTES:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                break
+        else:
+            self._send(404, {'error': f'No fake for {method} {path}'})
+            return
+        
+        fake = self.server.fake
+        fake.count(name)
+        time.sleep(fake.delay(group))
+        
+        if group != 'media' and fake.should_fail():
+            fake.count('injected_failures')
+            self._send(503, {'error': {'message': 'Injected failure', 'code': 503}})
+            return
+        
+        getattr(self, f'_{name}')(body, **match.groupdict())
+    
+    def _read_body(self):
+        """Request body (Content-Length or chunked)"""
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip() or b'0', 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b''.join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+    
+    def _send(self, status, payload, content_type='application/json'):
+        """Write a response"""
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    # ---- Content ----
+    
+    def _gemini(self, body):
+        self._send(200, {
+            'candidates': [{
+                'content': {'parts': [{'text': json.dumps(METADATA)}], 'role': 'model'},
+                'finishReason': 'STOP',
+                'index': 0
+            }],
+            'usageMetadata': {'promptTokenCount': 200, 'candidatesTokenCount': 120, 'totalTokenCount': 320}
+        })
+    
+    def _openai_chat(self, body):
+        self._send(200, {
+            'id': f'chatcmpl-{uuid.uuid4().hex[:12]}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': 'gpt-4o',
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': json.dumps(METADATA)},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 200, 'completion_tokens': 120, 'total_tokens': 320}
+        })
+    
+    # ---- Speech ----
+    
+    def _openai_speech(self, body):
+        self._send(200, self.server.fake.audio, content_type='audio/wav')
+    
+    def _elevenlabs(self, body):
+        self._send(200, self.server.fake.audio, content_type='audio/wav')
+    
+    def _whisper(self, body):
+        seconds = self.server.fake.options.audio_seconds
+        step = seconds / len(SCRIPT_WORDS)
+        words = [
+            {'word': word, 'start': round(i * step, 2), 'end': round((i + 1) * step, 2)}
+            for i, word in enumerate(SCRIPT_WORDS)
+        ]
+        self._send(200, {
+            'task': 'transcribe',
+            'language': 'english',
+            'duration': seconds,
+            'text': ' '.join(SCRIPT_WORDS),
+            'words': words,
+            'segments': []
+        })
+    
+    # ---- Video ----
+    
+    def _video_submit(self, body):
+        task = self.server.fake.new_task()
+        self._send(200, {'id': task})
+    
+    def _luma_status(self, body, task):
+        if self.server.fake.task_done(task):
+            self._send(200, {'id': task, 'state': 'completed',
+                             'video': {'url': f'{self.server.fake.url}/media/{task}.mp4'}})
+        else:
+            self._send(200, {'id': task, 'state': 'processing'})
+    
+    def _runway_status(self, body, task):
+        if self.server.fake.task_done(task):
+            self._send(200, {'id': task, 'status': 'SUCCEEDED',
+                             'output': [f'{self.server.fake.url}/media/{task}.mp4']})
+        else:
+            self._send(200, {'id': task, 'status': 'RUNNING'})
+    
+    def _media(self, body, task):
+        self._send(200, self.server.fake.video, content_type='video/mp4')
+
+
+class FakeProviders:
+    """Threaded HTTP server hosting all the stand-ins"""
+    
+    def __init__(self, options=None, host='127.0.0.1', port=0):
+        """
+        Initialize fake providers
+        
+        Args:
+            options: FakeOptions (default: fast and reliable)
+            host, port: Bind address (port 0 = any free port)
+        """
+        self.options = options or FakeOptions()
+        self.random = random.Random(self.options.seed)
+        self.audio = synth_wav(self.options.audio_seconds)
+        self.video = synth_mp4(self.options.video_seconds, self.options.video_bytes)
+        self.requests = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        self.thread = None
+    
+    @property
+    def url(self):
+        """Base URL of the server"""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self):
+        """Serve in a background thread"""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        """Shut the server down"""
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def settings(self, video_service='luma'):
+        """
+        Config values that route every provider call here
+        
+        Returns:
+            {Config attribute: value}, usable as environment variables
+        """
+        return {
+            'GEMINI_API_ENDPOINT': self.url,
+            'OPENAI_BASE_URL': f"{self.url}/v1",
+            'ELEVENLABS_API_ENDPOINT': f"{self.url}/v1",
+            'VIDEO_API_ENDPOINT': f"{self.url}/{video_service}",
+            'VIDEO_SERVICE': video_service,
+            'VIDEO_POLL_INTERVAL': str(max(self.options.render_time / 10, 0.05)),
+            'GEMINI_API_KEY': 'fake-gemini',
+            'OPENAI_API_KEY': 'fake-openai',
+            'OPENAI_GPT_API_KEY': 'fake-openai',
+            'ELEVENLABS_API_KEY': 'fake-elevenlabs',
+            'LUMA_API_KEY': 'fake-luma',
+            'RUNWAY_API_KEY': 'fake-runway',
+        }
+    
+    def count(self, name):
+        """Tally a request"""
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+    
+    def delay(self, group):
+        """Latency for one request in a route group"""
+        base = self.options.latency.get(group, self.options.latency.get('default', 0))
+        jitter = self.options.jitter
+        with self._lock:
+            return max(base * self.random.uniform(1 - jitter, 1 + jitter), 0)
+    
+    def should_fail(self):
+        """Whether to inject a failure"""
+        with self._lock:
+            return self.random.random() < self.options.failure_rate
+    
+    def new_task(self):
+        """Start a fake video generation"""
+        task = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._tasks[task] = time.monotonic() + self.options.render_time
+        return task
+    
+    def task_done(self, task):
+        """Whether a fake generation has finished rendering"""
+        with self._lock:
+            return time.monotonic() >= self._tasks.get(task, 0)
+
+
+def main():
+    """Run the stand-ins until interrupted"""
+    parser = argparse.ArgumentParser(description='Local fake provider APIs')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='0.05', help="Seconds, or 'group=seconds,...' "
+                        "(groups: chat, tts, whisper, video, poll, media)")
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--render-time', type=float, default=2.0)
+    parser.add_argument('--audio-seconds', type=float, default=5.0)
+    parser.add_argument('--video-seconds', type=float, default=5.0)
+    parser.add_argument('--video-bytes', type=int, default=256 * 1024)
+    parser.add_argument('--video-service', choices=['luma', 'runway'], default='luma')
+    args = parser.parse_args()
+    
+    fake = FakeProviders(FakeOptions(
+        latency=parse_latency(args.latency),
+        failure_rate=args.failure_rate,
+        render_time=args.render_time,
+        audio_seconds=args.audio_seconds,
+        video_seconds=args.video_seconds,
+        video_bytes=args.video_bytes
+    ), port=args.port).start()
+    
+    print(f"Fake providers on {fake.url} - add to .env:")
+    for key, value in fake.settings(args.video_service).items():
+        print(f"{key}={value}")
+    
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
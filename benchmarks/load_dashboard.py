@@ -0,0 +1,391 @@
+"""
+Load test: dashboard clients polling while workers write progress
+
+Seeds a large synthetic database, serves app.py from a real threaded HTTP
+server in a subprocess, then runs for --duration seconds with:
+  - N simulated browsers doing what web/js/app.js does on the dashboard:
+    an initial load (stats, 6 recent videos, processing jobs), then either
+    polling (stats every 10s, jobs every 5s) or holding /api/events open
+    (--mode events). Conditional requests use the ETags the server sends,
+    like the browser cache does. --speed compresses the intervals.
+  - M fake workers, each driving one job through update_job() progress
+    writes on the same SQLite file, and starting a new video and job
+    when it reaches 100%.
+
+Reports per-endpoint latency percentiles and error rates, worker write
+latency, and "database is locked" timeouts on both sides (the server's
+are counted from its log).
+
+In --mode events the server turns the workers' writes into job events
+by polling the database (EVENT_POLL_INTERVAL), as it does for worker.py.
+
+Usage:
+    python benchmarks/load_dashboard.py --clients 200 --workers 4 --duration 60
+    python benchmarks/load_dashboard.py --clients 50 --speed 10 --write-interval 0.05
+    python benchmarks/load_dashboard.py --url http://host:5000 --db /srv/shorts/data/automation.db --rows 0
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+from bench_list_endpoints import SCRIPT, seed
+
+# Mirrors web/js/app.js
+VIDEO_LIST_FIELDS = 'title,status,youtube_url,video_path'
+JOB_LIST_FIELDS = 'title,status,progress,current_step'
+STATS_INTERVAL = 10.0
+JOBS_INTERVAL = 5.0
+STATS_COALESCE = 0.5
+
+STEPS = ['Generating content', 'Generating voiceover', 'Generating video',
+         'Generating captions', 'Assembling video']
+
+
+class Recorder:
+    """Thread-safe latency and outcome samples per operation"""
+    
+    def __init__(self):
+        self.samples = {}  # name -> [seconds]
+        self.outcomes = {}  # name -> {outcome: count}
+        self._lock = threading.Lock()
+    
+    def add(self, name, seconds, outcome):
+        with self._lock:
+            self.samples.setdefault(name, []).append(seconds)
+            counts = self.outcomes.setdefault(name, {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+    
+    def summary(self, elapsed):
+        """{name: {count, rate, p50, p95, p99, max, outcomes}}, times in ms"""
+        report = {}
+        with self._lock:
+            for name, values in sorted(self.samples.items()):
+                ordered = sorted(values)
+                
+                def pct(fraction):
+                    return round(ordered[min(int(fraction * len(ordered)), len(ordered) - 1)] * 1000, 2)
+                
+                report[name] = {
+                    'count': len(ordered),
+                    'per_second': round(len(ordered) / elapsed, 1),
+                    'p50_ms': pct(0.50),
+                    'p95_ms': pct(0.95),
+                    'p99_ms': pct(0.99),
+                    'max_ms': round(ordered[-1] * 1000, 2),
+                    'outcomes': dict(self.outcomes[name])
+                }
+        return report
+
+
+class Browser(threading.Thread):
+    """One dashboard tab"""
+    
+    def __init__(self, base_url, recorder, stop, mode, speed, timeout):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.recorder = recorder
+        self.stop = stop
+        self.mode = mode
+        self.speed = speed
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.etags = {}
+    
+    def get(self, name, path):
+        """Timed GET with If-None-Match, as the browser cache would send"""
+        headers = {}
+        if path in self.etags:
+            headers['If-None-Match'] = self.etags[path]
+        
+        started = time.perf_counter()
+        try:
+            response = self.session.get(self.base_url + path, headers=headers, timeout=self.timeout)
+            elapsed = time.perf_counter() - started
+        except requests.Timeout:
+            self.recorder.add(name, time.perf_counter() - started, 'timeout')
+            return
+        except requests.RequestException:
+            self.recorder.add(name, time.perf_counter() - started, 'connection_error')
+            return
+        
+        if response.status_code == 200 and 'ETag' in response.headers:
+            self.etags[path] = response.headers['ETag']
+        outcome = 'ok' if response.status_code in (200, 304) else f'http_{response.status_code}'
+        self.recorder.add(name, elapsed, outcome)
+    
+    def load_stats(self):
+        self.get('stats', '/api/stats')
+    
+    def load_videos(self):
+        self.get('videos', f'/api/videos?limit=6&fields={VIDEO_LIST_FIELDS}')
+    
+    def load_jobs(self):
+        self.get('jobs', f'/api/jobs?status=processing&limit=10&fields={JOB_LIST_FIELDS}')
+    
+    def run(self):
+        # Tabs are opened over the first poll interval, not all at once
+        if self.stop.wait(random.uniform(0, JOBS_INTERVAL / self.speed)):
+            return
+        self.load_stats()
+        self.load_videos()
+        self.load_jobs()
+        
+        if self.mode == 'events':
+            self.listen()
+        else:
+            self.poll()
+    
+    def poll(self):
+        """setInterval loops of startPolling()"""
+        now = time.monotonic()
+        next_stats = now + STATS_INTERVAL / self.speed
+        next_jobs = now + JOBS_INTERVAL / self.speed
+        while True:
+            wait = min(next_stats, next_jobs) - time.monotonic()
+            if self.stop.wait(max(wait, 0)):
+                return
+            now = time.monotonic()
+            if now >= next_jobs:
+                self.load_jobs()
+                next_jobs += JOBS_INTERVAL / self.speed
+            if now >= next_stats:
+                self.load_stats()
+                next_stats += STATS_INTERVAL / self.speed
+    
+    def listen(self):
+        """connectEvents(): hold the stream, refresh on job events"""
+        started = time.perf_counter()
+        try:
+            # The server sends a keepalive comment every 15s
+            response = self.session.get(self.base_url + '/api/events', stream=True,
+                                        timeout=(self.timeout, 60))
+        except requests.RequestException:
+            self.recorder.add('events_connect', time.perf_counter() - started, 'connection_error')
+            return
+        self.recorder.add('events_connect', time.perf_counter() - started,
+                          'ok' if response.status_code == 200 else f'http_{response.status_code}')
+        
+        refresh = None
+        event = None
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if self.stop.is_set():
+                    break
+                if line.startswith('event:'):
+                    event = line.split(':', 1)[1].strip()
+                elif line.startswith('data:') and event == 'job':
+                    job = json.loads(line.split(':', 1)[1])
+                    # scheduleStatsRefresh() coalesces bursts into one request
+                    if refresh is None or not refresh.is_alive():
+                        refresh = threading.Timer(STATS_COALESCE / self.speed, self.load_stats)
+                        refresh.daemon = True
+                        refresh.start()
+                    if job.get('status') in ('completed', 'failed'):
+                        self.load_videos()
+        except requests.RequestException:
+            if not self.stop.is_set():
+                self.recorder.add('events_stream', 0.0, 'dropped')
+        finally:
+            response.close()
+
+
+class Worker(threading.Thread):
+    """A pipeline worker reporting progress on one job at a time"""
+    
+    def __init__(self, db, recorder, stop, interval):
+        super().__init__(daemon=True)
+        self.db = db
+        self.recorder = recorder
+        self.stop = stop
+        self.interval = interval
+    
+    def write(self, name, fn, *args, **kwargs):
+        """Timed database write; returns its result or None on lock timeout"""
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            outcome = 'locked' if 'locked' in str(e) else 'error'
+            self.recorder.add(name, time.perf_counter() - started, outcome)
+            return None
+        self.recorder.add(name, time.perf_counter() - started, 'ok')
+        return result
+    
+    def new_job(self):
+        video_id = self.write('create_job', self.db.create_video, SCRIPT, title='Load test')
+        if video_id is None:
+            return None
+        job_id = self.write('create_job', self.db.create_job, video_id, source='loadtest')
+        if job_id is not None:
+            self.write('update_job', self.db.update_job, job_id, status='processing',
+                       current_step=STEPS[0], progress=0)
+        return job_id
+    
+    def run(self):
+        job_id = None
+        progress = 0
+        while not self.stop.wait(self.interval):
+            if job_id is None:
+                job_id = self.new_job()
+                progress = 0
+                continue
+            
+            progress = min(progress + 5, 100)
+            if progress == 100:
+                self.write('update_job', self.db.update_job, job_id, status='completed',
+                           progress=100, current_step='Completed')
+                job_id = None
+            else:
+                self.write('update_job', self.db.update_job, job_id, progress=progress,
+                           current_step=STEPS[progress * len(STEPS) // 100])
+
+
+def free_port():
+    """An unused local TCP port"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir, port):
+    """app.py behind werkzeug's threaded server, logging to a file"""
+    log = open(workdir / 'server.log', 'w')
+    code = ("from werkzeug.serving import run_simple\n"
+            "from app import app\n"
+            f"run_simple('127.0.0.1', {port}, app, threaded=True)\n")
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=workdir, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited; see {workdir / 'server.log'}")
+        try:
+            requests.get(url + '/api/health', timeout=1)
+            return process, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Server did not start within 60s")
+
+
+def print_table(title, summary):
+    print(f"\n{title}")
+    print(f"  {'operation':<16}{'count':>8}{'/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}  outcomes")
+    for name, row in summary.items():
+        outcomes = ', '.join(f"{k}={v}" for k, v in sorted(row['outcomes'].items()))
+        print(f"  {name:<16}{row['count']:>8}{row['per_second']:>8}{row['p50_ms']:>9}"
+              f"{row['p95_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}  {outcomes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=100, help='Simulated dashboard tabs')
+    parser.add_argument('--workers', type=int, default=4, help='Fake workers writing progress')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds of load')
+    parser.add_argument('--mode', choices=['poll', 'events'], default='poll',
+                        help='Browser refresh: polling, or the SSE stream')
+    parser.add_argument('--speed', type=float, default=1.0, help='Divide the browser intervals by this')
+    parser.add_argument('--write-interval', type=float, default=0.2,
+                        help='Seconds between progress writes per worker')
+    parser.add_argument('--rows', type=int, default=100000, help='Videos and jobs to seed')
+    parser.add_argument('--timeout', type=float, default=10, help='Client request timeout')
+    parser.add_argument('--url', help='Load an already running server instead of starting one')
+    parser.add_argument('--db', help="With --url: the server's database file, for seeding and workers")
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    
+    if args.url and not args.db:
+        parser.error("--url needs --db so the workers write to the server's database")
+    random.seed(args.seed)
+    
+    # The app's global database lives under ./data, so run from a scratch dir
+    workdir = Path(tempfile.mkdtemp(prefix='load-dashboard-'))
+    os.chdir(workdir)
+    db_path = Path(args.db) if args.db else workdir / 'data' / 'automation.db'
+    
+    from database import Database
+    db = Database(db_path)
+    if args.rows:
+        print(f"Seeding {args.rows:,} videos and jobs into {db_path}...")
+        seed(db.db_path, args.rows)
+    
+    server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        server, base_url = start_server(workdir, free_port())
+    print(f"Loading {base_url}: {args.clients} clients ({args.mode}, speed x{args.speed}), "
+          f"{args.workers} workers writing every {args.write_interval}s, for {args.duration:g}s")
+    
+    clients = Recorder()
+    writes = Recorder()
+    stop = threading.Event()
+    threads = [Browser(base_url, clients, stop, args.mode, args.speed, args.timeout)
+               for _ in range(args.clients)]
+    threads += [Worker(db, writes, stop, args.write_interval) for _ in range(args.workers)]
+    
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    try:
+        time.sleep(args.duration)
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=args.timeout + 2)
+    elapsed = time.perf_counter() - started
+    
+    server_locks = None
+    if server:
+        server.terminate()
+        server.wait(timeout=10)
+        server_locks = (workdir / 'server.log').read_text(errors='replace').count('database is locked')
+    
+    results = {
+        'settings': {k: v for k, v in vars(args).items() if k not in ('json',)},
+        'seconds': round(elapsed, 1),
+        'requests': clients.summary(elapsed),
+        'writes': writes.summary(elapsed),
+        'server_lock_timeouts': server_locks
+    }
+    
+    print_table("Dashboard requests", results['requests'])
+    print_table("Worker writes", results['writes'])
+    
+    total = sum(row['count'] for row in results['requests'].values())
+    failed = sum(count for row in results['requests'].values()
+                 for outcome, count in row['outcomes'].items() if outcome != 'ok')
+    locked = sum(row['outcomes'].get('locked', 0) for row in results['writes'].values())
+    write_total = sum(row['count'] for row in results['writes'].values())
+    print(f"\nRequest errors: {failed}/{total} ({failed / max(total, 1):.2%})")
+    print(f"Worker lock timeouts: {locked}/{write_total} ({locked / max(write_total, 1):.2%})")
+    if server_locks is not None:
+        print(f"Server lock timeouts (from its log): {server_locks}")
+    
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"Wrote {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Job cancellation
+Points where a running pipeline stops promptly when its job is cancelled
+"""
+import contextvars
+import subprocess
+import time
+from contextlib import contextmanager
+
+class Cancelled(Exception):
+    """The job being processed was cancelled"""
+
+# Cancel signal (threading.Event) of the job being processed in this
+# context (None = not cancellable, e.g. modules run from main.py)
+_event = contextvars.ContextVar('cancel_event', default=None)
+
+@contextmanager
+def scope(event):
+    """Make `event` the cancel signal for everything run in this context"""
+    token = _event.set(event)
+    try:
+        yield
+    finally:
+        _event.reset(token)
+
+def requested():
+    """Whether the current job has been cancelled"""
+    event = _event.get()
+    return event is not None and event.is_set()
+
+def check():
+    """Raise Cancelled if the current job has been cancelled"""
+    if requested():
+        raise Cancelled('Job cancelled')
+
+def sleep(seconds):
+    """time.sleep that ends early, raising Cancelled, when the job is cancelled"""
+    event = _event.get()
+    if event is None:
+        time.sleep(seconds)
+    elif event.wait(seconds):
+        raise Cancelled('Job cancelled')
+
+def run(cmd, poll_interval=0.2):
+    """
+    Run a command like subprocess.run(cmd, capture_output=True, text=True, check=True)
+    
+    If the job is cancelled meanwhile the process is terminated (killed
+    if it does not exit within a couple of seconds) and Cancelled raised.
+    """
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as process:
+        while True:
+            try:
+                stdout, stderr = process.communicate(timeout=poll_interval)
+                break
+            except subprocess.TimeoutExpired:
+                if requested():
+                    process.terminate()
+                    try:
+                        process.wait(timeout=2)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+                    raise Cancelled('Job cancelled')
+    
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
@@ -0,0 +1,286 @@
+"""
+Provider cassettes
+Record HTTP exchanges with the AI and YouTube APIs, and replay them offline
+"""
+import base64
+import http.client
+import json
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from config import config
+
+# Query parameters stripped from recorded URLs (API keys go in headers,
+# which are never recorded, except for these)
+SECRET_PARAMS = {'key', 'api_key', 'access_token'}
+
+# Response headers not kept; bodies are stored already decoded
+DROP_HEADERS = {
+    'content-encoding', 'content-length', 'transfer-encoding', 'connection',
+    'keep-alive', 'set-cookie', 'date', 'status'
+}
+
+# OAuth token exchanges carry credentials, so they are never recorded
+PRIVATE_HOSTS = {'oauth2.googleapis.com', 'accounts.google.com'}
+
+# Installed cassette and the library functions it replaced
+_cassette = None
+_patched = []
+
+def redact(url):
+    """URL without secret query parameters"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+class Cassette:
+    """
+    A JSON Lines file of HTTP exchanges
+    
+    In record mode every exchange is appended as it completes. In replay
+    mode requests are matched on method and URL (bodies are ignored); a
+    URL requested several times, such as a status poll, gets its recorded
+    responses in order, then starts over. Each thread keeps its own
+    position, so concurrent jobs each see a complete recorded run.
+    """
+    
+    def __init__(self, path, mode, latency=1.0):
+        """
+        Initialize cassette
+        
+        Args:
+            path: Cassette file
+            mode: 'record' or 'replay'
+            latency: Multiplier for recorded response times on replay
+                     (1 = original timing, 0 = respond immediately)
+        """
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.exchanges = {}  # "METHOD url" -> [exchange, ...]
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        
+        if mode == 'replay':
+            self.load()
+    
+    @staticmethod
+    def key(method, url):
+        """Replay lookup key"""
+        return f"{method.upper()} {redact(url)}"
+    
+    def load(self):
+        """Read recorded exchanges"""
+        if not self.path.exists():
+            raise FileNotFoundError(f"Cassette not found: {self.path}")
+        
+        self.exchanges = {}
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    exchange = json.loads(line)
+                    self.exchanges.setdefault(self.key(exchange['method'], exchange['url']), []).append(exchange)
+    
+    def record(self, method, url, status, headers, body, elapsed, request_bytes=0):
+        """Append one exchange to the file"""
+        if urlsplit(url).hostname in PRIVATE_HOSTS:
+            return
+        
+        exchange = {
+            'method': method.upper(),
+            'url': redact(url),
+            'status': status,
+            'headers': {k.lower(): v for k, v in headers.items() if k.lower() not in DROP_HEADERS and not k.startswith('-')},
+            'elapsed': round(elapsed, 6),
+            'request_bytes': request_bytes,
+        }
+        try:
+            exchange['body'] = body.decode('utf-8')
+            exchange['encoding'] = 'utf-8'
+        except UnicodeDecodeError:
+            exchange['body'] = base64.b64encode(body).decode('ascii')
+            exchange['encoding'] = 'base64'
+        
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(exchange) + '\n')
+            self.exchanges.setdefault(self.key(method, url), []).append(exchange)
+    
+    def replay(self, method, url):
+        """
+        Next recorded exchange for a request, after its recorded latency
+        
+        Returns:
+            (status, headers dict, body bytes)
+        """
+        key = self.key(method, url)
+        recorded = self.exchanges.get(key)
+        if not recorded:
+            raise ConnectionError(f"No recorded exchange for {key} in {self.path}")
+        
+        positions = getattr(self._local, 'positions', None)
+        if positions is None:
+            positions = self._local.positions = {}
+        position = positions.get(key, 0)
+        positions[key] = position + 1
+        exchange = recorded[position % len(recorded)]
+        
+        if self.latency:
+            time.sleep(exchange['elapsed'] * self.latency)
+        
+        if exchange['encoding'] == 'base64':
+            body = base64.b64decode(exchange['body'])
+        else:
+            body = exchange['body'].encode('utf-8')
+        return exchange['status'], dict(exchange['headers']), body
+    
+    def rewind(self):
+        """Start the calling thread's replay from the beginning again"""
+        self._local.positions = {}
+
+def install(path=None, mode=None, latency=None):
+    """
+    Route provider HTTP traffic through a cassette
+    
+    Patches the transports of requests (ElevenLabs, Luma, Runway, Gemini
+    over REST), httpx (OpenAI) and httplib2 (YouTube). Defaults come from
+    CASSETTE_MODE, CASSETTE_PATH and CASSETTE_LATENCY; with no mode set
+    this does nothing.
+    
+    Returns:
+        The installed Cassette, or None
+    """
+    global _cassette
+    
+    mode = mode if mode is not None else config.CASSETTE_MODE
+    if not mode:
+        return None
+    if _cassette is not None:
+        uninstall()
+    
+    _cassette = Cassette(
+        path or config.CASSETTE_PATH,
+        mode,
+        config.CASSETTE_LATENCY if latency is None else latency
+    )
+    for patch in (_patch_requests, _patch_httpx, _patch_httplib2):
+        try:
+            _patched.append(patch(_cassette))
+        except ImportError:
+            pass
+    
+    if mode == 'record':
+        print(f"[CASSETTE] Recording provider traffic to {_cassette.path}")
+    else:
+        total = sum(len(recorded) for recorded in _cassette.exchanges.values())
+        print(f"[CASSETTE] Replaying {total} exchanges from {_cassette.path} (latency x{_cassette.latency})")
+    return _cassette
+
+def uninstall():
+    """Restore the original transports"""
+    global _cassette
+    while _patched:
+        owner, name, original = _patched.pop()
+        setattr(owner, name, original)
+    _cassette = None
+
+def active():
+    """Installed cassette mode ('record', 'replay') or None"""
+    return _cassette.mode if _cassette else None
+
+def replaying():
+    """Whether provider calls are served from a cassette"""
+    return active() == 'replay'
+
+def _request_bytes(headers):
+    """Request body size from its Content-Length header"""
+    try:
+        return int(headers.get('content-length') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def _patch_requests(cassette):
+    """Hook requests' HTTPAdapter.send"""
+    from requests.adapters import HTTPAdapter
+    from requests.models import Response
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+    
+    original = HTTPAdapter.send
+    
+    def send(self, request, **kwargs):
+        if cassette.mode == 'replay':
+            status, headers, body = cassette.replay(request.method, request.url)
+            response = Response()
+            response.status_code = status
+            response.reason = http.client.responses.get(status, '')
+            response.headers = CaseInsensitiveDict(headers)
+            response.encoding = get_encoding_from_headers(response.headers)
+            response.url = request.url
+            response.request = request
+            response._content = body
+            response._content_consumed = True  # iter_content() serves _content
+            return response
+        
+        started = time.perf_counter()
+        response = original(self, request, **kwargs)
+        body = response.content
+        cassette.record(request.method, request.url, response.status_code, response.headers, body,
+                        time.perf_counter() - started, _request_bytes(request.headers))
+        return response
+    
+    HTTPAdapter.send = send
+    return HTTPAdapter, 'send', original
+
+def _patch_httpx(cassette):
+    """Hook httpx's HTTPTransport.handle_request"""
+    import httpx
+    
+    original = httpx.HTTPTransport.handle_request
+    
+    def handle_request(self, request):
+        if cassette.mode == 'replay':
+            status, headers, body = cassette.replay(request.method, str(request.url))
+            return httpx.Response(status, headers=headers, content=body, request=request)
+        
+        started = time.perf_counter()
+        response = original(self, request)
+        try:
+            body = response.read()
+        finally:
+            response.close()
+        cassette.record(request.method, str(request.url), response.status_code, response.headers, body,
+                        time.perf_counter() - started, _request_bytes(request.headers))
+        # The body is decoded now, so hand back a copy without the
+        # encoding headers
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in DROP_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+    
+    httpx.HTTPTransport.handle_request = handle_request
+    return httpx.HTTPTransport, 'handle_request', original
+
+def _patch_httplib2(cassette):
+    """Hook httplib2's Http.request"""
+    import httplib2
+    
+    original = httplib2.Http.request
+    
+    def request(self, uri, method='GET', body=None, headers=None, *args, **kwargs):
+        if cassette.mode == 'replay':
+            status, recorded_headers, content = cassette.replay(method, uri)
+            return httplib2.Response(dict(recorded_headers, status=str(status))), content
+        
+        started = time.perf_counter()
+        response, content = original(self, uri, method, body, headers, *args, **kwargs)
+        sent = len(body) if isinstance(body, (bytes, str)) else 0
+        cassette.record(method, uri, response.status, dict(response), content,
+                        time.perf_counter() - started, sent)
+        return response, content
+    
+    httplib2.Http.request = request
+    return httplib2.Http, 'request', original
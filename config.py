@@ -3,6 +3,7 @@ Configuration loader for YouTube Shorts Automation
 Loads API keys and settings from environment variables
 """
 import os
+from dataclasses import dataclass, fields, replace
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -32,6 +33,9 @@ class Config:
     YOUTUBE_CLIENT_ID = os.getenv('YOUTUBE_CLIENT_ID', '')
     YOUTUBE_CLIENT_SECRET = os.getenv('YOUTUBE_CLIENT_SECRET', '')
     
+    # Captions (falls back to OPENAI_API_KEY when empty)
+    WHISPER_API_KEY = os.getenv('WHISPER_API_KEY', '')
+    
     # Optional Services
     MUBERT_API_KEY = os.getenv('MUBERT_API_KEY', '')
     
@@ -44,6 +48,16 @@ class Config:
     CONTENT_AI_SERVICE = os.getenv('CONTENT_AI_SERVICE', 'gemini')  # 'gemini' or 'gpt4'
     MUSIC_SERVICE = os.getenv('MUSIC_SERVICE', 'none')   # 'none' or 'mubert'
     
+    # Custom API endpoints (empty = service default), e.g. a proxy or
+    # the local stand-ins in benchmarks/fake_providers.py
+    VIDEO_API_ENDPOINT = os.getenv('VIDEO_API_ENDPOINT', '')
+    GEMINI_API_ENDPOINT = os.getenv('GEMINI_API_ENDPOINT', '')
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', '')
+    ELEVENLABS_API_ENDPOINT = os.getenv('ELEVENLABS_API_ENDPOINT', '')
+    
+    # Seconds between video generation status checks
+    VIDEO_POLL_INTERVAL = float(os.getenv('VIDEO_POLL_INTERVAL', 10))
+    
     # ===============================
     # VIDEO SETTINGS
     # ===============================
@@ -53,6 +67,21 @@ class Config:
     VIDEO_HEIGHT = int(os.getenv('VIDEO_HEIGHT', 1920))
     VIDEO_FPS = int(os.getenv('VIDEO_FPS', 30))
     
+    # libx264 settings for the final encode; compare them on your own
+    # hardware with benchmarks/bench_encode.py
+    FFMPEG_PRESET = os.getenv('FFMPEG_PRESET', 'medium')
+    FFMPEG_CRF = int(os.getenv('FFMPEG_CRF', 23))
+    FFMPEG_THREADS = int(os.getenv('FFMPEG_THREADS', 0))  # 0 = FFmpeg decides
+    
+    # Answer /api/videos/create with an existing video (still being made,
+    # or completed) that has the same script, title, description and
+    # render settings, instead of rendering it again. Requests can also
+    # opt in with "dedupe": true.
+    VIDEO_DEDUPE = os.getenv('VIDEO_DEDUPE', 'false').lower() == 'true'
+    
+    # Most videos one /api/videos/batch request may create
+    VIDEO_BATCH_LIMIT = int(os.getenv('VIDEO_BATCH_LIMIT', 1000))
+    
     # ===============================
     # DIRECTORIES
     # ===============================
@@ -61,6 +90,35 @@ class Config:
     TEMP_DIR = OUTPUT_DIR / 'temp'
     SCRIPTS_DIR = Path('./scripts')
     
+    # ===============================
+    # ARTIFACT STORAGE
+    # ===============================
+    
+    # Where stage outputs (voiceover, clip, captions, final video) live:
+    # 'local' keeps them under OUTPUT_DIR; 's3' puts them in an
+    # S3-compatible bucket (needs boto3, credentials from the usual
+    # AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY variables)
+    ARTIFACT_STORE = os.getenv('ARTIFACT_STORE', 'local')
+    ARTIFACT_S3_BUCKET = os.getenv('ARTIFACT_S3_BUCKET', '')
+    ARTIFACT_S3_PREFIX = os.getenv('ARTIFACT_S3_PREFIX', '')
+    ARTIFACT_S3_ENDPOINT = os.getenv('ARTIFACT_S3_ENDPOINT', '')  # MinIO, R2, ...; empty = AWS
+    ARTIFACT_S3_REGION = os.getenv('ARTIFACT_S3_REGION', '')
+    
+    # Local working copies of S3 artifacts, and the multipart chunk size
+    # transfers are streamed in
+    ARTIFACT_CACHE_DIR = Path(os.getenv('ARTIFACT_CACHE_DIR', str(TEMP_DIR / 'artifacts')))
+    ARTIFACT_PART_SIZE = int(os.getenv('ARTIFACT_PART_SIZE', 8)) * 1024 * 1024  # MB
+    
+    # Worker processes run a janitor deleting local artifacts: stage
+    # intermediates and temp files some hours after their last use, final
+    # videos some days after upload. With a disk budget, the least
+    # recently used ones beyond it are evicted as well.
+    ARTIFACT_JANITOR_INTERVAL = int(os.getenv('ARTIFACT_JANITOR_INTERVAL', 600))  # seconds, 0 = off
+    ARTIFACT_RETAIN_INTERMEDIATE_HOURS = float(os.getenv('ARTIFACT_RETAIN_INTERMEDIATE_HOURS', 24))
+    ARTIFACT_RETAIN_TEMP_HOURS = float(os.getenv('ARTIFACT_RETAIN_TEMP_HOURS', 24))
+    ARTIFACT_RETAIN_FINAL_DAYS = float(os.getenv('ARTIFACT_RETAIN_FINAL_DAYS', 7))
+    ARTIFACT_DISK_BUDGET_MB = int(os.getenv('ARTIFACT_DISK_BUDGET_MB', 0))  # 0 = unlimited
+    
     # ===============================
     # API SETTINGS
     # ===============================
@@ -69,6 +127,98 @@ class Config:
     RETRY_DELAY = int(os.getenv('RETRY_DELAY', 5))
     DEBUG = os.getenv('DEBUG', 'false').lower() == 'true'
     
+    # ===============================
+    # WEB SERVER
+    # ===============================
+    
+    STATS_CACHE_TTL = float(os.getenv('STATS_CACHE_TTL', 5))  # seconds
+    
+    # How often the web server checks the database for job changes to
+    # push to live dashboards (jobs run in separate worker processes)
+    EVENT_POLL_INTERVAL = float(os.getenv('EVENT_POLL_INTERVAL', 1))  # seconds
+    
+    # Hand video transfers to a front proxy instead of Python:
+    # ACCEL_REDIRECT_PREFIX is an nginx 'internal' location aliased to
+    # OUTPUT_DIR; USE_X_SENDFILE is for Apache/lighttpd mod_xsendfile
+    ACCEL_REDIRECT_PREFIX = os.getenv('ACCEL_REDIRECT_PREFIX', '')
+    USE_X_SENDFILE = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'
+    
+    # ===============================
+    # TRACING
+    # ===============================
+    
+    # Write a span trace per job to TRACE_DIR/job_<id>.json (open it in
+    # chrome://tracing or ui.perfetto.dev, or via /api/jobs/<id>/trace)
+    TRACE_ENABLED = os.getenv('TRACE_ENABLED', 'false').lower() == 'true'
+    TRACE_DIR = Path(os.getenv('TRACE_DIR', './data/traces'))
+    
+    # ===============================
+    # CASSETTES
+    # ===============================
+    
+    # 'record' saves every provider HTTP exchange to CASSETTE_PATH,
+    # 'replay' serves them back with no network (see cassette.py).
+    # CASSETTE_LATENCY scales recorded response times: 1 = original, 0 = none
+    CASSETTE_MODE = os.getenv('CASSETTE_MODE', '')
+    CASSETTE_PATH = Path(os.getenv('CASSETTE_PATH', './data/cassette.jsonl'))
+    CASSETTE_LATENCY = float(os.getenv('CASSETTE_LATENCY', 1))
+    
+    # ===============================
+    # JOB QUEUE
+    # ===============================
+    
+    # Jobs processed in parallel by each worker process (worker.py)
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 1))
+    
+    # Relative share of the workers each job source gets when both have
+    # pending jobs at the same priority, as 'source:weight,...'
+    JOB_SOURCE_WEIGHTS = os.getenv('JOB_SOURCE_WEIGHTS', 'api:1,schedule:1')
+    
+    # Pipeline stages this worker runs: 'all', or a comma list of
+    # content, tts, video, captions, assemble, upload. A job reaching a
+    # stage its worker does not run goes back in the queue for one that
+    # does, e.g. provider-only nodes hand FFmpeg nodes 'assemble'.
+    # Nodes exchange files through the artifact store, so use
+    # ARTIFACT_STORE=s3 or share OUTPUT_DIR between them.
+    WORKER_STAGES = os.getenv('WORKER_STAGES', 'all')
+    
+    # Name this worker's leases carry (default hostname:pid)
+    WORKER_NODE = os.getenv('WORKER_NODE', '')
+    
+    # Workers renew the lease on their running jobs every heartbeat; a
+    # job whose lease runs out (its worker crashed or restarted) is put
+    # back in the queue at the stage it reached, up to JOB_MAX_RECLAIMS
+    # times before it is failed
+    JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 120))
+    JOB_HEARTBEAT_INTERVAL = float(os.getenv('JOB_HEARTBEAT_INTERVAL', 30))  # seconds
+    JOB_MAX_RECLAIMS = int(os.getenv('JOB_MAX_RECLAIMS', 3))
+    
+    # How often workers check whether a running job has been cancelled
+    JOB_CANCEL_POLL_INTERVAL = float(os.getenv('JOB_CANCEL_POLL_INTERVAL', 0.5))  # seconds
+    
+    # ===============================
+    # SCHEDULING
+    # ===============================
+    
+    # Start scheduled renders ahead of their slot so only the upload is
+    # left when it arrives. Lead time = recent pipeline duration * margin,
+    # or the default until enough renders have been timed.
+    PRERENDER_ENABLED = os.getenv('PRERENDER_ENABLED', 'true').lower() == 'true'
+    PRERENDER_MARGIN = float(os.getenv('PRERENDER_MARGIN', 1.5))
+    PRERENDER_DEFAULT_LEAD = int(os.getenv('PRERENDER_DEFAULT_LEAD', 900))  # seconds
+    PRERENDER_MIN_LEAD = int(os.getenv('PRERENDER_MIN_LEAD', 120))  # seconds
+    
+    @classmethod
+    def snapshot(cls, **overrides):
+        """
+        Build an immutable Settings snapshot from this configuration
+        
+        Args:
+            **overrides: Settings fields to replace (e.g. keys saved in the UI)
+        """
+        base = Settings(**{f.name: getattr(cls, f.name) for f in fields(Settings)})
+        return replace(base, **overrides)
+    
     @classmethod
     def validate(cls):
         """Validate that required API keys are present"""
@@ -151,5 +301,48 @@ class Config:
         
         print("\n" + "="*50 + "\n")
 
+@dataclass(frozen=True)
+class Settings:
+    """
+    Immutable per-job settings snapshot
+    
+    Field names match the Config attributes, so modules can take either
+    a Settings instance or the global config.
+    """
+    GEMINI_API_KEY: str
+    OPENAI_GPT_API_KEY: str
+    OPENAI_API_KEY: str
+    ELEVENLABS_API_KEY: str
+    LUMA_API_KEY: str
+    RUNWAY_API_KEY: str
+    YOUTUBE_CLIENT_ID: str
+    YOUTUBE_CLIENT_SECRET: str
+    WHISPER_API_KEY: str
+    MUBERT_API_KEY: str
+    
+    VIDEO_SERVICE: str
+    TTS_SERVICE: str
+    CONTENT_AI_SERVICE: str
+    MUSIC_SERVICE: str
+    VIDEO_API_ENDPOINT: str
+    GEMINI_API_ENDPOINT: str
+    OPENAI_BASE_URL: str
+    ELEVENLABS_API_ENDPOINT: str
+    VIDEO_POLL_INTERVAL: float
+    
+    VIDEO_FORMAT: str
+    VIDEO_WIDTH: int
+    VIDEO_HEIGHT: int
+    VIDEO_FPS: int
+    FFMPEG_PRESET: str
+    FFMPEG_CRF: int
+    FFMPEG_THREADS: int
+    
+    OUTPUT_DIR: Path
+    TEMP_DIR: Path
+    
+    MAX_RETRIES: int
+    RETRY_DELAY: int
+
 # Initialize configuration on import
 config = Config()
@@ -8,6 +8,212 @@ from datetime import datetime
 from pathlib import Path
 from cryptography.fernet import Fernet
 import os
+import threading
+import metrics
+import tracing
+
+# Job priority levels, stored as integers (lower runs first)
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+
+# Videos a duplicate create request is answered with: still being made,
+# or made and its file not evicted
+_REUSABLE_VIDEO = "(status IN ('pending', 'processing') OR (status = 'completed' AND video_path IS NOT NULL))"
+
+# A video whose final is still to be published: a pre-render waiting for
+# its schedule slot, or an auto_upload video not uploaded yet
+_VIDEO_NEEDS_FILE = """(
+    (publish_at IS NOT NULL AND publish_at > COALESCE(
+        (SELECT last_run FROM schedules WHERE schedules.id = videos.schedule_id), ''))
+    OR (COALESCE(auto_upload, 0) = 1 AND youtube_id IS NULL)
+)"""
+
+class IdempotencyConflict(ValueError):
+    """An idempotency key was reused for a different request"""
+    
+    def __init__(self, message, index=0):
+        super().__init__(message)
+        self.index = index  # position of the offending item in a batch
+
+def _status_count_statements(table):
+    """Triggers keeping status_counts in step with a table's status column"""
+    def up(status):
+        return f'''INSERT INTO status_counts (table_name, status, count)
+                VALUES ('{table}', COALESCE({status}, ''), 1)
+                ON CONFLICT (table_name, status) DO UPDATE SET count = count + 1;'''
+    
+    def down(status):
+        return f'''UPDATE status_counts SET count = count - 1
+                WHERE table_name = '{table}' AND status = COALESCE({status}, '');'''
+    
+    return [
+        f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_count_insert AFTER INSERT ON {table}
+            BEGIN {up('NEW.status')} END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_count_update AFTER UPDATE OF status ON {table}
+            WHEN OLD.status IS NOT NEW.status
+            BEGIN {down('OLD.status')} {up('NEW.status')} END''',
+        f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_count_delete AFTER DELETE ON {table}
+            BEGIN {down('OLD.status')} END''',
+        # Backfill from existing rows
+        f'''INSERT OR REPLACE INTO status_counts (table_name, status, count)
+            SELECT '{table}', COALESCE(status, ''), COUNT(*) FROM {table} GROUP BY 2''',
+    ]
+
+def _table_version_statements(table, update_columns=None):
+    """
+    Triggers bumping table_versions whenever a table's rows change
+    
+    Args:
+        table: Table to watch
+        update_columns: Only count updates touching these columns (optional)
+    """
+    bump = f"UPDATE table_versions SET version = version + 1 WHERE name = '{table}';"
+    update = f"UPDATE OF {', '.join(update_columns)}" if update_columns else 'UPDATE'
+    return [
+        f"INSERT OR IGNORE INTO table_versions (name, version) VALUES ('{table}', 0)",
+    ] + [
+        f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{name}
+            AFTER {op} ON {table} BEGIN {bump} END'''
+        for name, op in (('insert', 'INSERT'), ('update', update), ('delete', 'DELETE'))
+    ]
+
+# Versioned schema migrations, applied in order on startup.
+# Each entry is (version, [statements]); the current version is tracked
+# in SQLite's PRAGMA user_version. Never edit a released migration -
+# append a new one instead.
+MIGRATIONS = [
+    (1, [
+        # Worker poll and dashboard filters: WHERE status = ? ORDER BY created_at DESC
+        'CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_videos_status_created ON videos (status, created_at)',
+        # Unfiltered listings: ORDER BY created_at DESC
+        'CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_videos_created ON videos (created_at)',
+    ]),
+    (2, [
+        # Per-status row counts kept current by triggers, so dashboard
+        # statistics never have to scan jobs or videos
+        '''CREATE TABLE IF NOT EXISTS status_counts (
+            table_name TEXT NOT NULL,
+            status TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (table_name, status)
+        )''',
+    ] + _status_count_statements('jobs') + _status_count_statements('videos')),
+    (3, [
+        # Change counters used as cheap ETags for list and stats responses
+        '''CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )''',
+    ] + _table_version_statements('jobs') + _table_version_statements('videos')),
+    (4, _table_version_statements('api_keys')),
+    (5, [
+        # Scheduled videos remember their schedule and upload preference
+        'ALTER TABLE videos ADD COLUMN schedule_id INTEGER REFERENCES schedules (id)',
+        'ALTER TABLE videos ADD COLUMN auto_upload BOOLEAN DEFAULT 0',
+        'CREATE INDEX IF NOT EXISTS idx_schedules_active_next ON schedules (active, next_run)',
+        # The scheduler reloads its timers only when a definition changes,
+        # not on its own next_run/last_run bookkeeping
+    ] + _table_version_statements('schedules', update_columns=(
+        'name', 'frequency', 'time', 'days', 'script_source', 'auto_upload', 'active'
+    ))),
+    (6, [
+        # Per-stage timings, used to size pre-render lead times
+        '''CREATE TABLE IF NOT EXISTS stage_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL,
+            stage TEXT NOT NULL,
+            duration REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (job_id) REFERENCES jobs (id)
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_stage_metrics_stage ON stage_metrics (stage, id)',
+        # Pre-rendered videos are tied to the schedule slot they publish in
+        'ALTER TABLE videos ADD COLUMN publish_at TIMESTAMP',
+        '''CREATE UNIQUE INDEX IF NOT EXISTS idx_videos_schedule_slot
+            ON videos (schedule_id, publish_at) WHERE publish_at IS NOT NULL''',
+        # 'render' runs the pipeline, 'upload' only publishes a finished video
+        "ALTER TABLE jobs ADD COLUMN task TEXT DEFAULT 'render'",
+    ]),
+    (7, [
+        # Priority level (see PRIORITIES) and who submitted the job:
+        # 'api' or 'schedule', used to share the worker fairly
+        'ALTER TABLE jobs ADD COLUMN priority INTEGER DEFAULT 1',
+        "ALTER TABLE jobs ADD COLUMN source TEXT DEFAULT 'api'",
+        """CREATE INDEX IF NOT EXISTS idx_jobs_pending
+            ON jobs (priority, id) WHERE status = 'pending'""",
+    ]),
+    (8, [
+        # Operation timings inside stages (detail = provider or tool) and
+        # per-record counters, see metrics.COUNTERS
+        'ALTER TABLE stage_metrics ADD COLUMN detail TEXT',
+        'ALTER TABLE stage_metrics ADD COLUMN retries INTEGER DEFAULT 0',
+        'ALTER TABLE stage_metrics ADD COLUMN cache_hits INTEGER DEFAULT 0',
+        'ALTER TABLE stage_metrics ADD COLUMN bytes INTEGER DEFAULT 0',
+    ]),
+    (9, [
+        # Jobs move between worker nodes stage by stage: 'stage' is the
+        # next stage to run (NULL = the first of its task), and a claim
+        # holds the job only until lease_expires unless renewed
+        'ALTER TABLE jobs ADD COLUMN stage TEXT',
+        'ALTER TABLE jobs ADD COLUMN lease_owner TEXT',
+        'ALTER TABLE jobs ADD COLUMN lease_expires TIMESTAMP',
+        # When the job last became pending again (NULL = created_at)
+        'ALTER TABLE jobs ADD COLUMN queued_at TIMESTAMP',
+        """CREATE INDEX IF NOT EXISTS idx_jobs_lease
+            ON jobs (lease_expires) WHERE status = 'processing'""",
+    ]),
+    (10, [
+        # Times the job was requeued after its worker died (see reap_jobs)
+        'ALTER TABLE jobs ADD COLUMN reclaim_count INTEGER DEFAULT 0',
+    ]),
+    (11, [
+        # Set by cancel_job() on a running job; its worker stops it
+        'ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER DEFAULT 0',
+    ]),
+    (12, [
+        # Finals are kept ARTIFACT_RETAIN_FINAL_DAYS after this
+        'ALTER TABLE videos ADD COLUMN uploaded_at TIMESTAMP',
+        # Space reclaimed by each janitor pass (see janitor.py)
+        '''CREATE TABLE IF NOT EXISTS artifact_cleanups (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            files INTEGER NOT NULL,
+            bytes INTEGER NOT NULL
+        )''',
+    ]),
+    (13, [
+        # Duplicate /api/videos/create requests (see create_video_job)
+        'ALTER TABLE videos ADD COLUMN idempotency_key TEXT',
+        'ALTER TABLE videos ADD COLUMN content_hash TEXT',
+        '''CREATE UNIQUE INDEX IF NOT EXISTS idx_videos_idempotency_key
+            ON videos (idempotency_key) WHERE idempotency_key IS NOT NULL''',
+        '''CREATE INDEX IF NOT EXISTS idx_videos_content_hash
+            ON videos (content_hash) WHERE content_hash IS NOT NULL''',
+    ]),
+    (14, [
+        # One row per running job queue, renewed every heartbeat, so any
+        # process can tell whether workers are up (see beat_worker)
+        '''CREATE TABLE IF NOT EXISTS workers (
+            node TEXT PRIMARY KEY,
+            workers INTEGER NOT NULL,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            heartbeat_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+    ]),
+    (15, [
+        # Hash of the request alone (content_hash also covers the render
+        # settings); a reused Idempotency-Key must match this one
+        'ALTER TABLE videos ADD COLUMN request_hash TEXT',
+    ]),
+    (16, [
+        # claim_next_job walks pending jobs in priority order, sorting only
+        # within a priority level; the planner never picked the partial
+        # idx_jobs_pending over idx_jobs_status_created
+        'CREATE INDEX IF NOT EXISTS idx_jobs_status_priority ON jobs (status, priority, id)',
+        'DROP INDEX IF EXISTS idx_jobs_pending',
+    ]),
+]
 
 class Database:
     """Database manager with encryption for API keys"""
@@ -21,6 +227,11 @@ class Database:
         self.key = self._get_encryption_key()
         self.cipher = Fernet(self.key)
         
+        # Decrypted API keys, valid while table_versions['api_keys'] matches
+        self._key_cache = None
+        self._key_cache_version = None
+        self._key_lock = threading.Lock()
+        
         self._init_db()
     
     def _get_encryption_key(self):
@@ -107,7 +318,87 @@ class Database:
         ''')
         
         conn.commit()
+        
+        self._migrate(conn)
+        self._load_columns(conn)
+        conn.close()
+    
+    def _migrate(self, conn):
+        """Apply pending schema migrations"""
+        for version, statements in MIGRATIONS:
+            # Take the write lock before checking the version so that two
+            # processes starting at once cannot apply the same migration
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                current = conn.execute('PRAGMA user_version').fetchone()[0]
+                if version > current:
+                    for statement in statements:
+                        conn.execute(statement)
+                    # PRAGMA does not accept bound parameters
+                    conn.execute(f'PRAGMA user_version = {int(version)}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    
+    def get_schema_version(self):
+        """Get current schema version"""
+        conn = sqlite3.connect(self.db_path)
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
         conn.close()
+        
+        return version
+    
+    def _load_columns(self, conn):
+        """Cache the selectable columns for list projections"""
+        def table_columns(table):
+            return [r[1] for r in conn.execute(f'PRAGMA table_info({table})')]
+        
+        self._columns = {
+            'videos': {c: c for c in table_columns('videos')},
+            'jobs': {c: f'j.{c}' for c in table_columns('jobs')},
+        }
+        # Job listings also carry their video's title and script
+        self._columns['jobs'].update({'title': 'v.title', 'script': 'v.script'})
+    
+    def _projection(self, table, fields=None):
+        """Map requested field names to SELECT expressions"""
+        columns = self._columns[table]
+        if not fields:
+            return list(columns.values())
+        
+        unknown = [f for f in fields if f not in columns]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        
+        # Keyset pagination needs the sort key on every row
+        wanted = ['id', 'created_at'] + [f for f in fields if f not in ('id', 'created_at')]
+        return [columns[f] for f in dict.fromkeys(wanted)]
+    
+    def get_status_counts(self, table):
+        """Get {status: count} for 'jobs' or 'videos' (constant time)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            'SELECT status, count FROM status_counts WHERE table_name = ?',
+            (table,)
+        )
+        results = cursor.fetchall()
+        conn.close()
+        
+        return {status: count for status, count in results}
+    
+    def get_table_versions(self):
+        """Get {table: change counter}; bumped on every write to that table"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT name, version FROM table_versions')
+        results = cursor.fetchall()
+        conn.close()
+        
+        return dict(results)
     
     # ==================== API Keys ====================
     
@@ -125,20 +416,43 @@ class Database:
         
         conn.commit()
         conn.close()
+        
+        # Other processes notice through the api_keys version trigger
+        with self._key_lock:
+            self._key_cache = None
     
     def get_api_key(self, service):
         """Get decrypted API key"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        return self.get_api_keys().get(service)
+    
+    def get_api_keys(self):
+        """
+        Get all decrypted API keys as {service: key}
         
-        cursor.execute('SELECT key_value FROM api_keys WHERE service = ?', (service,))
-        result = cursor.fetchone()
-        conn.close()
+        Keys are decrypted once and kept in memory. Each call costs a
+        single version-stamp lookup; the cache is reloaded only after a
+        key is saved, by this or any other process.
+        """
+        version = self.get_table_versions().get('api_keys')
         
-        if result:
-            encrypted = result[0].encode()
-            return self.cipher.decrypt(encrypted).decode()
-        return None
+        with self._key_lock:
+            if self._key_cache is None or version != self._key_cache_version:
+                conn = sqlite3.connect(self.db_path)
+                cursor = conn.cursor()
+                
+                cursor.execute('SELECT service, key_value FROM api_keys')
+                results = cursor.fetchall()
+                conn.close()
+                
+                self._key_cache = {
+                    service: self.cipher.decrypt(value.encode()).decode()
+                    for service, value in results
+                }
+                self._key_cache_version = version
+            else:
+                metrics.count('cache_hits')
+            
+            return dict(self._key_cache)
     
     def get_configured_services(self):
         """Get list of configured services"""
@@ -206,22 +520,39 @@ class Database:
             return video
         return None
     
-    def get_all_videos(self, status=None, limit=50):
-        """Get all videos"""
+    def get_all_videos(self, status=None, limit=50, before=None, fields=None):
+        """
+        Get videos, newest first
+        
+        Args:
+            status: Only return videos with this status (optional)
+            limit: Maximum number of rows
+            before: (created_at, id) keyset cursor - only return rows
+                    strictly older than this position (optional)
+            fields: Column names to return (optional, default all).
+                    'id' and 'created_at' are always included.
+        """
+        columns = self._projection('videos', fields)
+        
+        where = []
+        params = []
+        if status:
+            where.append('status = ?')
+            params.append(status)
+        if before:
+            where.append('(created_at, id) < (?, ?)')
+            params.extend(before)
+        params.append(limit)
+        
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        if status:
-            cursor.execute('''
-                SELECT * FROM videos WHERE status = ?
-                ORDER BY created_at DESC LIMIT ?
-            ''', (status, limit))
-        else:
-            cursor.execute('''
-                SELECT * FROM videos
-                ORDER BY created_at DESC LIMIT ?
-            ''', (limit,))
+        cursor.execute(f'''
+            SELECT {', '.join(columns)} FROM videos
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY created_at DESC, id DESC LIMIT ?
+        ''', params)
         
         results = cursor.fetchall()
         conn.close()
@@ -235,17 +566,185 @@ class Database:
         
         return videos
     
+    def create_video_job(self, script, title=None, description=None, priority=PRIORITIES['normal'],
+                         source='api', idempotency_key=None, content_hash=None, request_hash=None,
+                         dedupe=False):
+        """
+        Create a video and its render job, unless a matching video exists
+        
+        See create_videos_jobs for what matches.
+        
+        Returns:
+            (video_id, job_id, created); for a match, job_id is its latest job
+        
+        Raises:
+            IdempotencyConflict: The key belongs to a video with other content
+        """
+        return self.create_videos_jobs([{
+            'script': script,
+            'title': title,
+            'description': description,
+            'priority': priority,
+            'idempotency_key': idempotency_key,
+            'content_hash': content_hash,
+            'request_hash': request_hash,
+            'dedupe': dedupe,
+        }], source=source)[0]
+    
+    def create_videos_jobs(self, items, source='api'):
+        """
+        Create videos and their render jobs in one transaction
+        
+        An item matches an existing video - or one earlier in `items` - if
+        it has the same idempotency key or, with `dedupe`, the same content
+        hash (request and render settings), and that video is still being made or is completed; it then
+        gets that video instead of a new one. Lookup and inserts share one
+        transaction, so concurrent duplicates (a double-click, a client
+        retry) create a single video. A key reused with a different
+        request_hash is a conflict; a change of render settings is not. A
+        failed or cancelled video hands its key over to the new one. New rows go in with one executemany
+        per table.
+        
+        Args:
+            items: Dicts with script and optionally title, description,
+                   priority, idempotency_key, content_hash, request_hash
+                   and dedupe
+            source: Submitter used for fair sharing
+        
+        Returns:
+            (video_id, job_id, created) per item, in order
+        
+        Raises:
+            IdempotencyConflict: A key belongs to a video with other content
+                                 (its `index` is the item's position)
+        """
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            
+            keys = {item['idempotency_key'] for item in items if item.get('idempotency_key')}
+            keyed = {
+                row[0]: (('video', row[1]), row[2], row[3]) for row in self._select_in(cursor, f'''
+                    SELECT idempotency_key, id, request_hash, {_REUSABLE_VIDEO} FROM videos
+                    WHERE idempotency_key IN ({{}})
+                ''', keys)
+            }
+            hashes = {item['content_hash'] for item in items if item.get('dedupe') and item.get('content_hash')}
+            hashed = {}
+            for digest, video_id in self._select_in(cursor, f'''
+                SELECT content_hash, MAX(id) FROM videos
+                WHERE content_hash IN ({{}}) AND {_REUSABLE_VIDEO} GROUP BY content_hash
+            ''', hashes):
+                hashed[digest] = ('video', video_id)
+            
+            # ('video', id) for an existing video, ('new', n) for the
+            # n-th row inserted below (created by the items in `creators`)
+            targets = []
+            new_items = []
+            creators = set()
+            released = []
+            for index, item in enumerate(items):
+                key, digest = item.get('idempotency_key'), item.get('content_hash')
+                target = None
+                
+                if key in keyed:
+                    owner, key_hash, reusable = keyed[key]
+                    if item.get('request_hash') and key_hash and key_hash != item['request_hash']:
+                        raise IdempotencyConflict(
+                            'Idempotency-Key was already used for a different video', index
+                        )
+                    if reusable:
+                        target = owner
+                    else:
+                        released.append((owner[1],))
+                
+                if target is None and item.get('dedupe') and digest in hashed:
+                    target = hashed[digest]
+                
+                if target is None:
+                    target = ('new', len(new_items))
+                    new_items.append(item)
+                    creators.add(index)
+                    if digest:
+                        hashed.setdefault(digest, target)
+                
+                # Later items with this key get the same video
+                if key:
+                    keyed[key] = (target, item.get('request_hash'), True)
+                targets.append(target)
+            
+            cursor.executemany('UPDATE videos SET idempotency_key = NULL WHERE id = ?', released)
+            
+            video_ids, job_ids = [], []
+            if new_items:
+                cursor.executemany('''
+                    INSERT INTO videos (script, title, description, status, idempotency_key, content_hash,
+                                        request_hash)
+                    VALUES (?, ?, ?, 'pending', ?, ?, ?)
+                ''', [
+                    (item['script'], item.get('title') or 'Untitled Video', item.get('description') or '',
+                     item.get('idempotency_key'), item.get('content_hash'), item.get('request_hash'))
+                    for item in new_items
+                ])
+                video_ids = self._inserted_ids(cursor, 'videos', len(new_items))
+                cursor.executemany('''
+                    INSERT INTO jobs (video_id, status, current_step, priority, source)
+                    VALUES (?, 'pending', 'Queued', ?, ?)
+                ''', [
+                    (video_id, item.get('priority', PRIORITIES['normal']), source)
+                    for video_id, item in zip(video_ids, new_items)
+                ])
+                job_ids = self._inserted_ids(cursor, 'jobs', len(new_items))
+            
+            matched = {target[1] for target in targets if target[0] == 'video'}
+            latest_jobs = dict(self._select_in(cursor, '''
+                SELECT video_id, MAX(id) FROM jobs WHERE video_id IN ({}) GROUP BY video_id
+            ''', matched))
+            
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        
+        return [
+            (video_ids[n], job_ids[n], index in creators) if kind == 'new' else (n, latest_jobs.get(n), False)
+            for index, (kind, n) in enumerate(targets)
+        ]
+    
+    def _select_in(self, cursor, sql, values):
+        """Run `sql` with its {} filled by placeholders for `values`, in chunks under SQLite's limit"""
+        values = list(values)
+        rows = []
+        for start in range(0, len(values), 500):
+            chunk = values[start:start + 500]
+            cursor.execute(sql.format(', '.join('?' * len(chunk))), chunk)
+            rows += cursor.fetchall()
+        return rows
+    
+    def _inserted_ids(self, cursor, table, count):
+        """
+        IDs of the `count` rows just inserted into an AUTOINCREMENT table
+        
+        The caller holds the write lock, so they are the last `count` ids.
+        """
+        last = cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()[0]
+        return list(range(last - count + 1, last + 1))
+    
     # ==================== Jobs ====================
     
-    def create_job(self, video_id):
+    def create_job(self, video_id, priority=PRIORITIES['normal'], source='api'):
         """Create new job"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT INTO jobs (video_id, status, current_step)
-            VALUES (?, 'pending', 'Queued')
-        ''', (video_id,))
+            INSERT INTO jobs (video_id, status, current_step, priority, source)
+            VALUES (?, 'pending', 'Queued', ?, ?)
+        ''', (video_id, priority, source))
         
         job_id = cursor.lastrowid
         conn.commit()
@@ -289,32 +788,399 @@ class Database:
         
         return dict(result) if result else None
     
-    def get_all_jobs(self, status=None, limit=50):
-        """Get all jobs"""
+    def get_all_jobs(self, status=None, limit=50, before=None, fields=None):
+        """
+        Get jobs with their video title and script, newest first
+        
+        Args:
+            status: Only return jobs with this status (optional)
+            limit: Maximum number of rows
+            before: (created_at, id) keyset cursor - only return rows
+                    strictly older than this position (optional)
+            fields: Column names to return (optional, default all).
+                    'id' and 'created_at' are always included.
+        """
+        columns = self._projection('jobs', fields)
+        
+        where = []
+        params = []
+        if status:
+            where.append('j.status = ?')
+            params.append(status)
+        if before:
+            where.append('(j.created_at, j.id) < (?, ?)')
+            params.extend(before)
+        params.append(limit)
+        
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        if status:
-            cursor.execute('''
-                SELECT j.*, v.title, v.script
-                FROM jobs j
-                LEFT JOIN videos v ON j.video_id = v.id
-                WHERE j.status = ?
-                ORDER BY j.created_at DESC LIMIT ?
-            ''', (status, limit))
-        else:
-            cursor.execute('''
-                SELECT j.*, v.title, v.script
+        cursor.execute(f'''
+            SELECT {', '.join(columns)}
+            FROM jobs j
+            LEFT JOIN videos v ON j.video_id = v.id
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY j.created_at DESC, j.id DESC LIMIT ?
+        ''', params)
+        
+        results = cursor.fetchall()
+        conn.close()
+        
+        return [dict(r) for r in results]
+    
+    def get_live_jobs(self, ids=()):
+        """
+        Get pending and processing jobs, plus the given ones whatever their status
+        
+        Used to turn job changes made by any process into live events;
+        `ids` are the jobs that were live last time, so their completion
+        or failure is seen too.
+        """
+        placeholders = ', '.join('?' * len(ids))
+        extra = f' OR j.id IN ({placeholders})' if ids else ''
+        
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            SELECT j.id, j.video_id, v.title, j.status, j.progress, j.current_step, j.error_message
+            FROM jobs j
+            LEFT JOIN videos v ON j.video_id = v.id
+            WHERE j.status IN ('pending', 'processing'){extra}
+            ORDER BY j.id
+        ''', tuple(ids))
+        
+        results = cursor.fetchall()
+        conn.close()
+        
+        return [dict(r) for r in results]
+    
+    def claim_next_job(self, sources=(), stages=None, owner=None, lease=900):
+        """
+        Atomically take the job a worker should run next
+        
+        The highest priority level with pending jobs wins; within it,
+        `sources` gives the preferred order of submitters, and jobs from
+        the same submitter run oldest first. The job is marked processing
+        in the same transaction, so parallel workers never share a job.
+        
+        The claim is a lease: the worker must keep renewing it
+        (renew_lease), or reap_jobs() puts the job back in the queue.
+        
+        Args:
+            sources: Preferred order of job sources
+            stages: Only take jobs whose next stage is one of these
+                    (optional, default any)
+            owner: Lease holder, e.g. 'host:pid/worker-0'
+            lease: Seconds the claim holds unless renewed (renew_lease)
+        
+        Returns:
+            Job dict with 'queue_wait' (seconds pending), or None
+        """
+        rank = ' '.join(f'WHEN ? THEN {i}' for i in range(len(sources)))
+        source_order = f'CASE j.source {rank} ELSE {len(sources)} END, ' if sources else ''
+        
+        stage_filter = ''
+        params = list(sources)
+        if stages is not None:
+            # A job that has not started yet is at the first stage of its task
+            stage_filter = (
+                "AND COALESCE(j.stage, CASE j.task WHEN 'upload' THEN 'upload' ELSE 'content' END) "
+                f"IN ({', '.join('?' * len(stages))})"
+            )
+            params = list(stages) + params
+        
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute(f'''
+                SELECT j.*, v.title, v.script,
+                       (julianday('now') - julianday(COALESCE(j.queued_at, j.created_at))) * 86400 AS queue_wait
                 FROM jobs j
                 LEFT JOIN videos v ON j.video_id = v.id
-                ORDER BY j.created_at DESC LIMIT ?
-            ''', (limit,))
+                WHERE j.status = 'pending' {stage_filter}
+                ORDER BY j.priority, {source_order}j.id
+                LIMIT 1
+            ''', params)
+            result = cursor.fetchone()
+            
+            if result:
+                cursor.execute('''
+                    UPDATE jobs
+                    SET status = 'processing', current_step = 'Initializing',
+                        lease_owner = ?, lease_expires = datetime('now', ?)
+                    WHERE id = ?
+                ''', (owner, f'+{int(lease)} seconds', result['id']))
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
         
+        if not result:
+            return None
+        job = dict(result)
+        job.update(status='processing', current_step='Initializing', lease_owner=owner)
+        return job
+    
+    def renew_lease(self, job_id, owner, lease=900, stage=None):
+        """
+        Extend a claim, optionally recording the stage the job has reached
+        
+        Returns:
+            False if `owner` no longer holds the job (its lease ran out
+            and it was requeued)
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE jobs SET lease_expires = datetime('now', ?), stage = COALESCE(?, stage)
+            WHERE id = ? AND lease_owner = ? AND status = 'processing'
+        ''', (f'+{int(lease)} seconds', stage, job_id, owner))
+        renewed = cursor.rowcount == 1
+        
+        conn.commit()
+        conn.close()
+        
+        return renewed
+    
+    def release_job(self, job_id, owner, stage, current_step):
+        """
+        Put a claimed job back in the queue at `stage`, for another worker
+        
+        Returns:
+            False if `owner` no longer holds the job, or it is being
+            cancelled
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE jobs
+            SET status = 'pending', stage = ?, current_step = ?,
+                lease_owner = NULL, lease_expires = NULL, queued_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND lease_owner = ? AND status = 'processing' AND cancel_requested = 0
+        ''', (stage, current_step, job_id, owner))
+        released = cursor.rowcount == 1
+        
+        conn.commit()
+        conn.close()
+        
+        return released
+    
+    def reap_jobs(self, owner_prefix=None, max_reclaims=3):
+        """
+        Requeue processing jobs whose worker is gone
+        
+        A job is orphaned when its lease has run out (its worker crashed,
+        restarted or hung) or, with `owner_prefix`, when it was leased by a
+        node that is starting up again. It goes back to pending at the
+        stage it had reached, so finished stages are not redone, and its
+        reclaim_count goes up; a job already reclaimed `max_reclaims`
+        times is failed instead, so one that kills workers cannot keep
+        taking them down. Jobs that were being cancelled are cancelled.
+        
+        Returns:
+            (requeued job ids, failed job ids)
+        """
+        where = "lease_expires IS NULL OR lease_expires < datetime('now')"
+        params = ()
+        if owner_prefix:
+            where += ' OR substr(lease_owner, 1, ?) = ?'
+            params = (len(owner_prefix), owner_prefix)
+        
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute(f'''
+                SELECT id, video_id, task, reclaim_count, cancel_requested FROM jobs
+                WHERE status = 'processing' AND ({where})
+            ''', params)
+            orphans = cursor.fetchall()
+            
+            cancelled = [row for row in orphans if row[4]]
+            requeued = [row[0] for row in orphans if not row[4] and row[3] < max_reclaims]
+            failed = [row for row in orphans if not row[4] and row[3] >= max_reclaims]
+            
+            cursor.executemany('''
+                UPDATE jobs
+                SET status = 'pending', current_step = 'Requeued after worker loss',
+                    lease_owner = NULL, lease_expires = NULL, queued_at = CURRENT_TIMESTAMP,
+                    reclaim_count = reclaim_count + 1
+                WHERE id = ?
+            ''', [(job_id,) for job_id in requeued])
+            cursor.executemany('''
+                UPDATE jobs
+                SET status = 'failed', current_step = 'Failed', completed_at = CURRENT_TIMESTAMP,
+                    error_message = ?, lease_owner = NULL, lease_expires = NULL
+                WHERE id = ?
+            ''', [(f"Worker lost {row[3] + 1} times", row[0]) for row in failed])
+            # Its worker died before it could finish cancelling
+            cursor.executemany('''
+                UPDATE jobs
+                SET status = 'cancelled', current_step = 'Cancelled', completed_at = CURRENT_TIMESTAMP,
+                    lease_owner = NULL, lease_expires = NULL
+                WHERE id = ?
+            ''', [(row[0],) for row in cancelled])
+            # A failed or cancelled upload leaves the rendered video intact
+            cursor.executemany(
+                "UPDATE videos SET status = ? WHERE id = ?",
+                [('failed', row[1]) for row in failed if row[2] != 'upload'] +
+                [('cancelled', row[1]) for row in cancelled if row[2] != 'upload']
+            )
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        
+        return requeued, [row[0] for row in failed]
+    
+    def get_reclaim_total(self):
+        """Times any job has been requeued after losing its worker"""
+        conn = sqlite3.connect(self.db_path)
+        total = conn.execute('SELECT COALESCE(SUM(reclaim_count), 0) FROM jobs').fetchone()[0]
+        conn.close()
+        return total
+    
+    def cancel_job(self, job_id):
+        """
+        Cancel a job
+        
+        A pending job is cancelled at once. A processing one is flagged
+        (cancel_requested) and its worker stops it, cleans up and marks it
+        cancelled; a rendering video is marked cancelled with its job.
+        
+        Returns:
+            'cancelled', 'cancelling', or None if the job does not exist
+            or has already finished
+        """
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT status, video_id, task FROM jobs WHERE id = ?', (job_id,))
+            row = cursor.fetchone()
+            
+            result = None
+            if row and row[0] == 'pending':
+                cursor.execute('''
+                    UPDATE jobs
+                    SET status = 'cancelled', current_step = 'Cancelled', completed_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (job_id,))
+                if row[2] != 'upload':
+                    cursor.execute("UPDATE videos SET status = 'cancelled' WHERE id = ?", (row[1],))
+                result = 'cancelled'
+            elif row and row[0] == 'processing':
+                cursor.execute(
+                    "UPDATE jobs SET cancel_requested = 1, current_step = 'Cancelling' WHERE id = ?",
+                    (job_id,)
+                )
+                result = 'cancelling'
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        
+        return result
+    
+    def get_cancel_requests(self, job_ids):
+        """IDs among `job_ids` that have been asked to cancel"""
+        if not job_ids:
+            return set()
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            SELECT id FROM jobs
+            WHERE id IN ({', '.join('?' * len(job_ids))}) AND cancel_requested = 1
+        ''', tuple(job_ids))
         results = cursor.fetchall()
         conn.close()
         
-        return [dict(r) for r in results]
+        return {row[0] for row in results}
+    
+    def get_pending_by_priority(self):
+        """Get {priority: (count, oldest pending age in seconds)}"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT priority, COUNT(*),
+                   (julianday('now') - julianday(MIN(COALESCE(queued_at, created_at)))) * 86400
+            FROM jobs WHERE status = 'pending'
+            GROUP BY priority
+        ''')
+        results = cursor.fetchall()
+        conn.close()
+        
+        return {priority: (count, age) for priority, count, age in results}
+    
+    def get_queue_wait_stats(self):
+        """Get {priority name: (jobs started, total wait, max wait)} from the queue_wait stage metrics"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT detail, COUNT(*), SUM(duration), MAX(duration)
+            FROM stage_metrics WHERE stage = 'queue_wait'
+            GROUP BY detail
+        ''')
+        results = cursor.fetchall()
+        conn.close()
+        
+        return {name: (count, total, longest) for name, count, total, longest in results}
+    
+    # ==================== Workers ====================
+    
+    def beat_worker(self, node, workers):
+        """Record that a node's job queue is alive"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            INSERT INTO workers (node, workers) VALUES (?, ?)
+            ON CONFLICT (node) DO UPDATE SET workers = excluded.workers,
+                heartbeat_at = CURRENT_TIMESTAMP
+        ''', (node, workers))
+        conn.commit()
+        conn.close()
+    
+    def remove_worker(self, node):
+        """Forget a node whose job queue stopped"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('DELETE FROM workers WHERE node = ?', (node,))
+        conn.commit()
+        conn.close()
+    
+    def get_live_workers(self, seconds):
+        """Get nodes whose job queue heartbeated in the last `seconds`"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT node, workers, started_at, heartbeat_at FROM workers
+            WHERE heartbeat_at >= datetime('now', ?)
+            ORDER BY node
+        ''', (f'-{int(seconds)} seconds',))
+        results = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        
+        return results
     
     # ==================== Schedules ====================
     
@@ -324,8 +1190,8 @@ class Database:
         cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT INTO schedules (name, frequency, time, days, script_source, auto_upload, active)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO schedules (name, frequency, time, days, script_source, auto_upload, active, next_run)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
             name,
             frequency,
@@ -333,7 +1199,8 @@ class Database:
             kwargs.get('days'),
             kwargs.get('script_source'),
             kwargs.get('auto_upload', False),
-            kwargs.get('active', True)
+            kwargs.get('active', True),
+            kwargs.get('next_run')
         ))
         
         schedule_id = cursor.lastrowid
@@ -357,6 +1224,449 @@ class Database:
         conn.close()
         
         return [dict(r) for r in results]
+    
+    def get_schedule(self, schedule_id):
+        """Get schedule by ID"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT * FROM schedules WHERE id = ?', (schedule_id,))
+        result = cursor.fetchone()
+        conn.close()
+        
+        return dict(result) if result else None
+    
+    def get_schedule_timers(self):
+        """Get (id, next_run) for every active schedule"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT id, next_run FROM schedules WHERE active = 1')
+        results = cursor.fetchall()
+        conn.close()
+        
+        return results
+    
+    def set_schedule_next_run(self, schedule_id, next_run, expected=None):
+        """
+        Move a schedule's next_run, only if it still equals `expected`
+        
+        Returns:
+            True if the row was updated
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE schedules SET next_run = ?
+            WHERE id = ? AND next_run IS ?
+        ''', (next_run, schedule_id, expected))
+        
+        updated = cursor.rowcount == 1
+        conn.commit()
+        conn.close()
+        
+        return updated
+    
+    def claim_schedule_run(self, schedule_id, due, next_run, script=None, title=None,
+                           prerendered_video_id=None):
+        """
+        Atomically fire one run of a schedule
+        
+        Advances next_run from `due` to `next_run` and, if a script is
+        given, creates the video and its pending job - all in a single
+        transaction. The compare-and-set on next_run means a run is fired
+        at most once even if several schedulers race or one restarts
+        mid-fire.
+        
+        With prerendered_video_id, no new video is created; the schedule's
+        auto_upload is applied to the pre-rendered video instead, queueing
+        its upload now if rendering has already finished.
+        
+        Returns:
+            (video_id, job_id), (None, None) if only advanced, or
+            None if the run was already claimed
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                UPDATE schedules SET next_run = ?, last_run = ?
+                WHERE id = ? AND next_run = ? AND active = 1
+            ''', (next_run, due, schedule_id, due))
+            
+            if cursor.rowcount != 1:
+                conn.rollback()
+                return None
+            
+            video_id = job_id = None
+            if prerendered_video_id:
+                video_id = prerendered_video_id
+                cursor.execute('''
+                    UPDATE videos SET auto_upload = (SELECT auto_upload FROM schedules WHERE id = ?)
+                    WHERE id = ?
+                ''', (schedule_id, video_id))
+                job_id = self._enqueue_upload(cursor, video_id)
+            elif script:
+                cursor.execute('''
+                    INSERT INTO videos (script, title, description, status, schedule_id, auto_upload)
+                    SELECT ?, ?, '', 'pending', id, auto_upload FROM schedules WHERE id = ?
+                ''', (script, title or 'Untitled Video', schedule_id))
+                video_id = cursor.lastrowid
+                
+                cursor.execute('''
+                    INSERT INTO jobs (video_id, status, current_step, source)
+                    VALUES (?, 'pending', 'Queued', 'schedule')
+                ''', (video_id,))
+                job_id = cursor.lastrowid
+            
+            conn.commit()
+            return video_id, job_id
+        finally:
+            conn.close()
+    
+    def update_schedule(self, schedule_id, **kwargs):
+        """Update schedule record"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        fields = []
+        values = []
+        for key, value in kwargs.items():
+            fields.append(f"{key} = ?")
+            values.append(value)
+        
+        values.append(schedule_id)
+        query = f"UPDATE schedules SET {', '.join(fields)} WHERE id = ?"
+        
+        cursor.execute(query, values)
+        conn.commit()
+        conn.close()
+    
+    def delete_schedule(self, schedule_id):
+        """Delete schedule"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM schedules WHERE id = ?', (schedule_id,))
+        
+        conn.commit()
+        conn.close()
+    
+    # ==================== Pre-rendering ====================
+    
+    def claim_prerender(self, schedule_id, publish_at, script, title=None):
+        """
+        Create the pre-render video and job for one schedule slot
+        
+        The unique (schedule_id, publish_at) index makes this idempotent.
+        
+        Returns:
+            (video_id, job_id), or None if the slot is already pre-rendered
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                INSERT INTO videos (script, title, description, status, schedule_id, publish_at, auto_upload)
+                VALUES (?, ?, '', 'pending', ?, ?, 0)
+            ''', (script, title or 'Untitled Video', schedule_id, publish_at))
+            video_id = cursor.lastrowid
+            
+            cursor.execute('''
+                INSERT INTO jobs (video_id, status, current_step, source)
+                VALUES (?, 'pending', 'Queued (pre-render)', 'schedule')
+            ''', (video_id,))
+            job_id = cursor.lastrowid
+            
+            conn.commit()
+            return video_id, job_id
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return None
+        finally:
+            conn.close()
+    
+    def get_prerender(self, schedule_id, publish_at):
+        """Get the pre-rendered video for a schedule slot, if any"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            'SELECT id, status, video_path FROM videos WHERE schedule_id = ? AND publish_at = ?',
+            (schedule_id, publish_at)
+        )
+        result = cursor.fetchone()
+        conn.close()
+        
+        return dict(result) if result else None
+    
+    def get_prerendered_slots(self):
+        """Get {(schedule_id, publish_at)} for every pre-rendered video"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT schedule_id, publish_at FROM videos WHERE publish_at IS NOT NULL')
+        results = cursor.fetchall()
+        conn.close()
+        
+        return set(results)
+    
+    def get_stale_prerenders(self, schedule_id=None):
+        """
+        Get IDs of pre-rendered videos that will never be published
+        
+        Their slot has not fired yet, but the schedule was deleted,
+        disabled or moved to a different next_run. With schedule_id, every
+        unpublished pre-render of that schedule is returned (e.g. after
+        its script was edited).
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        if schedule_id is not None:
+            stale = 'v.schedule_id = ?'
+            params = (schedule_id,)
+        else:
+            stale = 's.id IS NULL OR s.active = 0 OR v.publish_at IS NOT s.next_run'
+            params = ()
+        
+        cursor.execute(f'''
+            SELECT v.id FROM videos v
+            LEFT JOIN schedules s ON s.id = v.schedule_id
+            WHERE v.publish_at IS NOT NULL
+              AND v.publish_at > COALESCE(s.last_run, '')
+              AND ({stale})
+        ''', params)
+        results = cursor.fetchall()
+        conn.close()
+        
+        return [r[0] for r in results]
+    
+    def discard_prerender(self, video_id):
+        """
+        Remove a stale pre-render
+        
+        Returns:
+            True if the video and its jobs were deleted, False if a job is
+            still rendering it - the video is then kept as an ordinary
+            library video instead
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                "SELECT COUNT(*) FROM jobs WHERE video_id = ? AND status = 'processing'",
+                (video_id,)
+            )
+            if cursor.fetchone()[0]:
+                cursor.execute(
+                    'UPDATE videos SET publish_at = NULL, schedule_id = NULL WHERE id = ?',
+                    (video_id,)
+                )
+                conn.commit()
+                return False
+            
+            cursor.execute('DELETE FROM jobs WHERE video_id = ?', (video_id,))
+            cursor.execute('DELETE FROM videos WHERE id = ?', (video_id,))
+            conn.commit()
+            return True
+        finally:
+            conn.close()
+    
+    def complete_video(self, video_id, **kwargs):
+        """
+        Mark a video completed and queue its upload if one is requested
+        
+        Runs in one transaction with the auto_upload check, so a schedule
+        firing concurrently (claim_schedule_run) and the render finishing
+        can never both miss - or both queue - the upload.
+        
+        Returns:
+            ID of the queued upload job, or None
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        fields = ["status = 'completed'"]
+        values = []
+        for key, value in kwargs.items():
+            fields.append(f"{key} = ?")
+            values.append(value)
+        values.append(video_id)
+        
+        cursor.execute(f"UPDATE videos SET {', '.join(fields)} WHERE id = ?", values)
+        job_id = self._enqueue_upload(cursor, video_id)
+        
+        conn.commit()
+        conn.close()
+        
+        return job_id
+    
+    def _enqueue_upload(self, cursor, video_id):
+        """Insert an upload job if the video is rendered, wants upload and has none yet"""
+        # The publish slot has already arrived, so uploads jump the queue
+        cursor.execute(f'''
+            INSERT INTO jobs (video_id, status, current_step, task, priority, source)
+            SELECT id, 'pending', 'Queued for upload', 'upload', {PRIORITIES['high']}, 'schedule'
+            FROM videos
+            WHERE id = ? AND status = 'completed' AND auto_upload = 1 AND youtube_id IS NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM jobs
+                  WHERE video_id = ? AND task = 'upload' AND status IN ('pending', 'processing')
+              )
+        ''', (video_id, video_id))
+        return cursor.lastrowid if cursor.rowcount == 1 else None
+    
+    # ==================== Artifact Cleanup ====================
+    
+    def get_active_video_ids(self):
+        """
+        IDs of videos whose artifacts are in use
+        
+        Those with a pending or running job, and completed videos still
+        to be published (see _VIDEO_NEEDS_FILE).
+        """
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(f'''
+            SELECT video_id FROM jobs WHERE status IN ('pending', 'processing')
+            UNION
+            SELECT id FROM videos WHERE status = 'completed' AND video_path IS NOT NULL AND {_VIDEO_NEEDS_FILE}
+        ''').fetchall()
+        conn.close()
+        return {row[0] for row in rows}
+    
+    def get_video_files(self, video_ids):
+        """Get {video id: (video_path, uploaded_at)} for the given videos"""
+        video_ids = list(video_ids)
+        conn = sqlite3.connect(self.db_path)
+        results = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(video_ids), 500):
+            chunk = video_ids[start:start + 500]
+            rows = conn.execute(f'''
+                SELECT id, video_path, uploaded_at FROM videos
+                WHERE id IN ({', '.join('?' * len(chunk))})
+            ''', chunk).fetchall()
+            results.update((row[0], (row[1], row[2])) for row in rows)
+        conn.close()
+        return results
+    
+    def evict_video_file(self, video_id, video_path):
+        """
+        Forget a video's final file before it is deleted
+        
+        Only if video_path still points at it, no job of the video is
+        pending or running (e.g. an upload queued since the janitor looked)
+        and nothing is still to publish it (see _VIDEO_NEEDS_FILE).
+        
+        Returns:
+            True if the file may be deleted
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            UPDATE videos SET video_path = NULL
+            WHERE id = ? AND video_path = ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM jobs WHERE video_id = ? AND status IN ('pending', 'processing')
+              )
+              AND NOT {_VIDEO_NEEDS_FILE}
+        ''', (video_id, video_path, video_id))
+        evicted = cursor.rowcount == 1
+        
+        conn.commit()
+        conn.close()
+        
+        return evicted
+    
+    def record_cleanup(self, files, size):
+        """Record a janitor pass that deleted `files` files totalling `size` bytes"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('INSERT INTO artifact_cleanups (files, bytes) VALUES (?, ?)', (files, size))
+        conn.commit()
+        conn.close()
+    
+    def get_cleanup_totals(self):
+        """Files and bytes deleted by all janitor passes"""
+        conn = sqlite3.connect(self.db_path)
+        files, size = conn.execute(
+            'SELECT COALESCE(SUM(files), 0), COALESCE(SUM(bytes), 0) FROM artifact_cleanups'
+        ).fetchone()
+        conn.close()
+        return files, size
+    
+    # ==================== Stage Metrics ====================
+    
+    def record_stage(self, job_id, stage, duration, detail=None):
+        """Record how long a pipeline stage took"""
+        self.record_stages(job_id, [{'stage': stage, 'detail': detail, 'duration': duration}])
+    
+    def record_stages(self, job_id, records):
+        """Record a job's stage and operation timings (see metrics.timed)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO stage_metrics (job_id, stage, detail, duration, retries, cache_hits, bytes)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (job_id, r['stage'], r.get('detail'), r['duration'],
+             r.get('retries', 0), r.get('cache_hits', 0), r.get('bytes', 0))
+            for r in records
+        ])
+        
+        conn.commit()
+        conn.close()
+    
+    def get_stage_metrics(self, after_id=0):
+        """Get stage_metrics rows added after `after_id`, oldest first"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, stage, detail, duration, retries, cache_hits, bytes
+            FROM stage_metrics WHERE id > ? ORDER BY id
+        ''', (after_id,))
+        results = cursor.fetchall()
+        conn.close()
+        
+        return [dict(r) for r in results]
+    
+    def get_stage_estimates(self, stages, window=20):
+        """
+        Get {stage: mean duration in seconds} over each stage's last `window` runs
+        
+        One indexed (stage, id) lookup per stage, so the cost does not
+        grow with the size of stage_metrics. Stages never timed are left out.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        estimates = {}
+        for stage in stages:
+            cursor.execute('''
+                SELECT AVG(duration) FROM (
+                    SELECT duration FROM stage_metrics
+                    WHERE stage = ? ORDER BY id DESC LIMIT ?
+                )
+            ''', (stage, window))
+            mean = cursor.fetchone()[0]
+            if mean is not None:
+                estimates[stage] = mean
+        conn.close()
+        
+        return estimates
+
+# Every query made while a job is traced appears as a db.* span
+tracing.instrument(Database, 'db')
 
 # Initialize global database instance
 db = Database()
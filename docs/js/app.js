@@ -6,6 +6,19 @@
 let currentPage = 'dashboard';
 let statsInterval = null;
 let jobsInterval = null;
+let eventSource = null;
+let eventsConnectedBefore = false;
+let statsRefreshTimer = null;
+const activeJobs = new Map();
+let libraryStatus = null;
+let libraryCursor = null;
+// Idempotency key of the video being created; kept until the form
+// succeeds or is edited, so resubmitting it never renders twice
+let createVideoKey = null;
+
+// Columns needed by list views (skips heavy fields like script)
+const VIDEO_LIST_FIELDS = 'title,status,youtube_url,video_path';
+const JOB_LIST_FIELDS = 'title,status,progress,current_step';
 
 // Initialize app
 document.addEventListener('DOMContentLoaded', () => {
@@ -85,6 +98,7 @@ function initForms() {
     const createForm = document.getElementById('create-video-form');
     if (createForm) {
         createForm.addEventListener('submit', handleCreateVideo);
+        createForm.addEventListener('input', () => { createVideoKey = null; });
     }
 
     // API config form
@@ -220,27 +234,47 @@ function updateStats(stats) {
 // Videos
 async function loadVideos() {
     try {
-        const videos = await api.getVideos(null, 6);
+        const videos = await api.getVideos(null, 6, VIDEO_LIST_FIELDS);
         renderVideos(videos, 'recent-videos-list');
     } catch (error) {
         console.error('Failed to load videos:', error);
     }
 }
 
-async function loadLibrary(status = null) {
+async function loadLibrary(status = null, append = false) {
+    if (!append) {
+        libraryStatus = status;
+        libraryCursor = null;
+    }
+
     try {
-        const videos = await api.getVideos(status, 50);
-        renderVideos(videos, 'library-videos-grid');
+        const page = await api.getVideosPage(libraryStatus, 50, VIDEO_LIST_FIELDS, libraryCursor);
+        libraryCursor = page.nextCursor;
+        renderVideos(page.items, 'library-videos-grid', append);
+        renderLoadMore('library-videos-grid', page.nextCursor !== null);
     } catch (error) {
         console.error('Failed to load library:', error);
         showToast('Failed to load videos', 'error');
     }
 }
 
-function renderVideos(videos, containerId) {
+function renderLoadMore(containerId, hasMore) {
+    const container = document.getElementById(containerId);
+    const existing = document.getElementById(`${containerId}-more`);
+    if (existing) existing.remove();
+    if (!hasMore) return;
+
+    container.insertAdjacentHTML('afterend', `
+        <div id="${containerId}-more" class="empty-state">
+            <button class="btn btn-secondary" onclick="loadLibrary(null, true)">Load more</button>
+        </div>
+    `);
+}
+
+function renderVideos(videos, containerId, append = false) {
     const container = document.getElementById(containerId);
 
-    if (videos.length === 0) {
+    if (videos.length === 0 && !append) {
         container.innerHTML = `
             <div class="empty-state">
                 <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
@@ -253,7 +287,7 @@ function renderVideos(videos, containerId) {
         return;
     }
 
-    container.innerHTML = videos.map(video => `
+    const html = videos.map(video => `
         <div class="video-card">
             <div class="video-thumbnail">
                 <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" style="width: 48px; height: 48px;">
@@ -268,6 +302,13 @@ function renderVideos(videos, containerId) {
                 </div>
                 <div class="video-actions">
                     ${video.status === 'completed' ? `
+                        ${video.video_path ? `
+                        <a href="/api/videos/${video.id}/stream" class="btn btn-secondary btn-sm" target="_blank">
+                            <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
+                                <polygon points="5 3 19 12 5 21 5 3"></polygon>
+                            </svg>
+                            Preview
+                        </a>
                         <a href="/api/videos/${video.id}/download" class="btn btn-primary btn-sm" download>
                             <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
                                 <path d="M21 15v4a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2v-4"></path>
@@ -276,6 +317,7 @@ function renderVideos(videos, containerId) {
                             </svg>
                             Download
                         </a>
+                        ` : `<span class="video-evicted">File removed</span>`}
                         <button class="btn btn-secondary btn-sm" onclick="openEditor(${video.id})">
                             <svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
                                 <path d="M11 4H4a2 2 0 0 0-2 2v14a2 2 0 0 0 2 2h14a2 2 0 0 0 2-2v-7"></path>
@@ -313,12 +355,20 @@ function renderVideos(videos, containerId) {
             </div>
         </div>
     `).join('');
+
+    if (append) {
+        container.insertAdjacentHTML('beforeend', html);
+    } else {
+        container.innerHTML = html;
+    }
 }
 
 // Jobs
 async function loadJobs() {
     try {
-        const jobs = await api.getJobs('processing', 10);
+        const jobs = await api.getJobs('processing', 10, JOB_LIST_FIELDS);
+        activeJobs.clear();
+        jobs.forEach(job => activeJobs.set(job.id, job));
         renderJobs(jobs);
     } catch (error) {
         console.error('Failed to load jobs:', error);
@@ -344,7 +394,10 @@ function renderJobs(jobs) {
                     <h4>${escapeHtml(job.title || 'Processing...')}</h4>
                     <small>${job.current_step}</small>
                 </div>
-                <span class="video-status ${job.status}">${job.status}</span>
+                <div class="job-actions">
+                    <span class="video-status ${job.status}">${job.status}</span>
+                    <button class="btn btn-danger btn-sm" onclick="handleCancelJob(${job.id})">Cancel</button>
+                </div>
             </div>
             <div class="job-progress">
                 <div class="job-progress-bar" style="width: ${job.progress}%"></div>
@@ -354,6 +407,14 @@ function renderJobs(jobs) {
 }
 
 // Create Video
+function newIdempotencyKey() {
+    // randomUUID needs a secure context (HTTPS or localhost)
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
 async function handleCreateVideo(e) {
     e.preventDefault();
 
@@ -371,16 +432,21 @@ async function handleCreateVideo(e) {
     btn.innerHTML = '<div class="loading"></div> Creating...';
     btn.disabled = true;
 
+    createVideoKey = createVideoKey || newIdempotencyKey();
+
     try {
         const result = await api.createVideo({
             script: script.trim(),
             title: title || null,
             description: description || null
-        });
+        }, createVideoKey);
 
-        showToast('✅ Video creation started! Check dashboard for progress.');
+        showToast(result.duplicate
+            ? 'This video was already requested. Check dashboard for progress.'
+            : '✅ Video creation started! Check dashboard for progress.');
 
         // Clear form
+        createVideoKey = null;
         document.getElementById('create-video-form').reset();
         document.getElementById('script-word-count').textContent = '0 words';
 
@@ -458,6 +524,77 @@ async function handleSaveConfig(e) {
 
 // Auto-refresh
 function startAutoRefresh() {
+    // Prefer the live event stream; poll only while it is unavailable
+    if (window.EventSource) {
+        connectEvents();
+    } else {
+        startPolling();
+    }
+}
+
+function connectEvents() {
+    eventSource = api.subscribeEvents();
+
+    eventSource.addEventListener('open', () => {
+        stopPolling();
+        // Catch up on anything missed while disconnected
+        if (eventsConnectedBefore && currentPage === 'dashboard') {
+            loadDashboard();
+        }
+        eventsConnectedBefore = true;
+    });
+
+    eventSource.addEventListener('job', (e) => {
+        handleJobEvent(JSON.parse(e.data));
+    });
+
+    eventSource.addEventListener('error', () => {
+        startPolling();
+        // The browser retries on its own unless the stream was closed for good
+        if (eventSource.readyState === EventSource.CLOSED) {
+            eventSource = null;
+            setTimeout(connectEvents, 10000);
+        }
+    });
+}
+
+function handleJobEvent(job) {
+    const previous = activeJobs.get(job.id);
+
+    if (job.status === 'processing') {
+        activeJobs.set(job.id, { ...previous, ...job });
+    } else {
+        activeJobs.delete(job.id);
+    }
+
+    if (currentPage !== 'dashboard') return;
+
+    renderJobs([...activeJobs.values()]);
+
+    if (!previous || previous.status !== job.status) {
+        scheduleStatsRefresh();
+    }
+    if (['completed', 'failed', 'cancelled'].includes(job.status)) {
+        loadVideos();
+    }
+}
+
+function scheduleStatsRefresh() {
+    // Coalesce bursts of status changes into one request
+    if (statsRefreshTimer) return;
+    statsRefreshTimer = setTimeout(async () => {
+        statsRefreshTimer = null;
+        try {
+            updateStats(await api.getStats());
+        } catch (error) {
+            console.error('Failed to refresh stats:', error);
+        }
+    }, 500);
+}
+
+function startPolling() {
+    if (statsInterval) return;
+
     // Refresh stats every 10 seconds
     statsInterval = setInterval(async () => {
         if (currentPage === 'dashboard') {
@@ -482,6 +619,13 @@ function startAutoRefresh() {
     }, 5000);
 }
 
+function stopPolling() {
+    clearInterval(statsInterval);
+    clearInterval(jobsInterval);
+    statsInterval = null;
+    jobsInterval = null;
+}
+
 // Utilities
 function showToast(message, type = 'success') {
     const toast = document.getElementById('toast');
@@ -552,6 +696,24 @@ window.handleUploadVideo = async function (videoId) {
     }
 }
 
+window.handleCancelJob = async function (jobId) {
+    if (!confirm('Cancel this job? Work done so far will be discarded.')) {
+        return;
+    }
+
+    try {
+        const result = await api.cancelJob(jobId);
+        showToast(result.status === 'cancelled' ? '✅ Job cancelled' : 'Cancelling job...');
+
+        // Live events update the list; refresh in case they are off
+        if (!eventSource) {
+            loadJobs();
+        }
+    } catch (error) {
+        showToast(`Failed to cancel job: ${error.message}`, 'error');
+    }
+}
+
 window.handleDeleteVideo = async function (videoId) {
     if (!confirm('Are you sure you want to delete this video? This action cannot be undone.')) {
         return;
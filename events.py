@@ -0,0 +1,158 @@
+"""
+In-process event bus for live dashboard updates
+Fans out job events to Server-Sent Events subscribers
+"""
+import json
+import queue
+import threading
+import time
+
+# Job columns included in live 'job' events
+JOB_EVENT_FIELDS = ('id', 'video_id', 'title', 'status', 'progress', 'current_step', 'error_message')
+
+# Job states shown as active on the dashboard
+LIVE_STATUSES = ('pending', 'processing')
+
+class EventBus:
+    """Publish/subscribe hub with one bounded queue per subscriber"""
+    
+    # Sent to a subscriber that fell too far behind; it must reconnect
+    OVERFLOW = object()
+    
+    def __init__(self, max_pending=256):
+        """Initialize event bus"""
+        self.max_pending = max_pending
+        self._subscribers = set()
+        self._lock = threading.Lock()
+    
+    def subscribe(self):
+        """Register a subscriber and return its queue"""
+        q = queue.Queue(maxsize=self.max_pending)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+    
+    def unsubscribe(self, q):
+        """Remove a subscriber"""
+        with self._lock:
+            self._subscribers.discard(q)
+    
+    def subscriber_count(self):
+        """Number of connected subscribers"""
+        with self._lock:
+            return len(self._subscribers)
+    
+    def publish(self, event, data):
+        """
+        Send an event to every subscriber
+        
+        The SSE frame is serialized once and shared by all subscribers.
+        A subscriber whose queue is full is dropped rather than allowed
+        to block the publisher; its stream ends and the browser reconnects.
+        """
+        frame = f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        
+        with self._lock:
+            subscribers = list(self._subscribers)
+        
+        for q in subscribers:
+            try:
+                q.put_nowait(frame)
+            except queue.Full:
+                self.unsubscribe(q)
+                # Make room for the overflow marker
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+                q.put_nowait(self.OVERFLOW)
+    
+    def stream(self, keepalive=15):
+        """Generator of SSE frames for one HTTP response"""
+        q = self.subscribe()
+        try:
+            # Ask browsers to reconnect quickly after a drop
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    frame = q.get(timeout=keepalive)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                if frame is self.OVERFLOW:
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(q)
+
+class JobWatcher:
+    """
+    Publishes job changes made by any process
+    
+    Workers run in their own processes and only write to the database.
+    While anyone is subscribed, this polls the jobs version stamp and,
+    when it moves, re-reads the live jobs (plus those live last time, to
+    see them finish) and publishes a 'job' event for each one that changed.
+    """
+    
+    def __init__(self, bus, db, interval=1.0):
+        """
+        Initialize watcher
+        
+        Args:
+            bus: EventBus to publish to
+            db: Database to watch
+            interval: Seconds between version checks
+        """
+        self.bus = bus
+        self.db = db
+        self.interval = interval
+        self.thread = None
+        self._version = None
+        self._jobs = None  # job id -> last published state, None = no baseline
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """Start the watcher thread (idempotent)"""
+        with self._lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='job-watcher', daemon=True)
+                self.thread.start()
+    
+    def poll(self):
+        """Publish changes since the last poll; returns the number published"""
+        if not self.bus.subscriber_count():
+            # Nobody to tell; take a fresh baseline once someone connects
+            self._jobs = None
+            return 0
+        
+        version = self.db.get_table_versions().get('jobs')
+        if version == self._version and self._jobs is not None:
+            return 0
+        self._version = version
+        
+        previous = self._jobs
+        jobs = self.db.get_live_jobs(list(previous or ()))
+        self._jobs = {job['id']: job for job in jobs if job['status'] in LIVE_STATUSES}
+        if previous is None:
+            return 0  # clients load the current state when they connect
+        
+        published = 0
+        for job in jobs:
+            if previous.get(job['id']) != job:
+                self.bus.publish('job', {k: job[k] for k in JOB_EVENT_FIELDS})
+                published += 1
+        return published
+    
+    def _run(self):
+        """Watcher loop"""
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"[EVENTS] Job watcher error: {e}")
+            time.sleep(self.interval)
+
+# Global event bus instance
+event_bus = EventBus()
@@ -0,0 +1,219 @@
+"""
+Artifact janitor
+Deletes old stage outputs and temp files, keeping local disk use within a budget
+"""
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from artifacts import STAGE_FILES
+from config import config
+from database import db
+from scheduler import parse_time
+
+FINAL_FILE = STAGE_FILES['assemble']
+INTERMEDIATE_FILES = {name for stage, name in STAGE_FILES.items() if stage != 'assemble'}
+
+# Owner directories of queue renders (see artifacts.video_owner)
+_VIDEO_OWNER = re.compile(r'video_(\d+)$')
+
+def _format_bytes(size):
+    """Human readable size"""
+    if size < 1024:
+        return f"{size} B"
+    for unit in ('KB', 'MB', 'GB'):
+        size /= 1024
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}"
+
+class Janitor:
+    """
+    Deletes local artifacts by class, then by least recent use
+    
+    Files under OUTPUT_DIR fall in three classes:
+      - intermediate: voiceover, raw clip and captions, kept
+        ARTIFACT_RETAIN_INTERMEDIATE_HOURS after their last use
+      - final: final videos, kept ARTIFACT_RETAIN_FINAL_DAYS after they
+        were uploaded (never-uploaded finals are only evicted for space)
+      - temp: TEMP_DIR and the S3 working copies in ARTIFACT_CACHE_DIR,
+        kept ARTIFACT_RETAIN_TEMP_HOURS after their last use
+    
+    If what is left exceeds ARTIFACT_DISK_BUDGET_MB, the least recently
+    used files are evicted until it fits. A deleted final clears its
+    video's video_path. Artifacts of videos with a pending or running job,
+    or whose final is still to be published (a pre-render waiting for its
+    slot, an auto_upload video not uploaded yet), are never touched. Objects in an S3 bucket are left to the bucket's
+    lifecycle rules.
+    """
+    
+    def __init__(self, interval=None):
+        """
+        Initialize janitor
+        
+        Args:
+            interval: Seconds between passes (default ARTIFACT_JANITOR_INTERVAL, 0 = off)
+        """
+        self.interval = config.ARTIFACT_JANITOR_INTERVAL if interval is None else interval
+        self.thread = None
+        self._stopped = threading.Event()
+    
+    def start(self):
+        """Start the janitor thread (one pass now, then every interval)"""
+        if self.interval <= 0 or (self.thread and self.thread.is_alive()):
+            return
+        
+        self._stopped.clear()
+        self.thread = threading.Thread(target=self._run, name="janitor", daemon=True)
+        self.thread.start()
+        print(f"[OK] Artifact janitor started (every {self.interval}s)")
+    
+    def stop(self):
+        """Stop the janitor thread"""
+        self._stopped.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+    
+    def _run(self):
+        """Thread body"""
+        while not self._stopped.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[JANITOR] Pass failed: {e}")
+            self._stopped.wait(self.interval)
+    
+    def _roots(self):
+        """(artifact root, temp roots); temp roots may lie inside the artifact root"""
+        roots = {Path(root).resolve() for root in (config.TEMP_DIR, config.ARTIFACT_CACHE_DIR)}
+        temp_roots = [root for root in roots if not any(other in root.parents for other in roots)]
+        return Path(config.OUTPUT_DIR).resolve(), temp_roots
+    
+    def _scan(self):
+        """Every managed file as a dict (path, kind, video_id, size, used)"""
+        output_root, temp_roots = self._roots()
+        found = []
+        
+        def walk(root, kind):
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirpath = Path(dirpath)
+                if kind is None:
+                    # Temp roots are walked on their own
+                    dirnames[:] = [d for d in dirnames if dirpath / d not in temp_roots]
+                
+                owner = _VIDEO_OWNER.match(dirpath.name)
+                for name in filenames:
+                    if kind is not None:
+                        file_kind = kind
+                    elif name == FINAL_FILE:
+                        file_kind = 'final'
+                    elif name in INTERMEDIATE_FILES:
+                        file_kind = 'intermediate'
+                    else:
+                        continue  # not ours
+                    
+                    path = dirpath / name
+                    try:
+                        stat = path.stat()
+                    except FileNotFoundError:
+                        continue
+                    found.append({
+                        'path': path,
+                        'kind': file_kind,
+                        'video_id': int(owner.group(1)) if owner else None,
+                        'size': stat.st_size,
+                        'used': max(stat.st_atime, stat.st_mtime),
+                    })
+        
+        if output_root.is_dir():
+            walk(output_root, None)
+        for root in temp_roots:
+            if root.is_dir():
+                walk(root, 'temp')
+        return found
+    
+    def _expired(self, item, now):
+        """Whether an artifact is past its class's retention"""
+        if item['kind'] == 'intermediate':
+            return now - item['used'] > config.ARTIFACT_RETAIN_INTERMEDIATE_HOURS * 3600
+        if item['kind'] == 'temp':
+            return now - item['used'] > config.ARTIFACT_RETAIN_TEMP_HOURS * 3600
+        
+        uploaded_at = parse_time(item['video'][1]) if item.get('video') else None
+        if uploaded_at is None:
+            return False
+        return now - uploaded_at.timestamp() > config.ARTIFACT_RETAIN_FINAL_DAYS * 86400
+    
+    def _delete(self, item, roots):
+        """Delete one artifact; returns False if it must be kept after all"""
+        if item.get('video'):
+            # Clear video_path first, so the dashboard never offers a
+            # missing file; refused if the video became busy meanwhile
+            if not db.evict_video_file(item['video_id'], item['video'][0]):
+                return False
+        try:
+            item['path'].unlink()
+        except FileNotFoundError:
+            pass
+        if item['path'].parent not in roots:
+            try:
+                item['path'].parent.rmdir()
+            except OSError:
+                pass  # not empty
+        return True
+    
+    def run_once(self, now=None):
+        """
+        Run one pass
+        
+        Returns:
+            dict with files and bytes reclaimed (also per class), the
+            video ids whose final was evicted and the bytes still in use
+        """
+        now = now or time.time()
+        output_root, temp_roots = self._roots()
+        roots = {output_root, *temp_roots}
+        scanned = self._scan()
+        in_use = sum(item['size'] for item in scanned)
+        active = db.get_active_video_ids()
+        items = [item for item in scanned if item['video_id'] not in active]
+        
+        # Finals the videos table points at
+        finals = [item for item in items if item['kind'] == 'final' and item['video_id'] is not None]
+        videos = db.get_video_files(item['video_id'] for item in finals)
+        for item in finals:
+            video = videos.get(item['video_id'])
+            if video and video[0] and Path(video[0]).resolve() == item['path']:
+                item['video'] = video
+        
+        deleted = [item for item in items if self._expired(item, now) and self._delete(item, roots)]
+        in_use -= sum(item['size'] for item in deleted)
+        
+        # Then least recently used first until the rest fits the budget
+        budget = config.ARTIFACT_DISK_BUDGET_MB * 1024 * 1024
+        if budget:
+            gone = {item['path'] for item in deleted}
+            remaining = sorted((item for item in items if item['path'] not in gone), key=lambda item: item['used'])
+            for item in remaining:
+                if in_use <= budget:
+                    break
+                if self._delete(item, roots):
+                    deleted.append(item)
+                    in_use -= item['size']
+        
+        report = {
+            'files': len(deleted),
+            'bytes': sum(item['size'] for item in deleted),
+            'classes': {},
+            'evicted': sorted(item['video_id'] for item in deleted if item.get('video')),
+            'in_use': in_use,
+        }
+        for item in deleted:
+            report['classes'][item['kind']] = report['classes'].get(item['kind'], 0) + item['size']
+        
+        if deleted:
+            db.record_cleanup(report['files'], report['bytes'])
+            classes = ', '.join(f"{kind} {_format_bytes(size)}" for kind, size in sorted(report['classes'].items()))
+            print(f"[JANITOR] Reclaimed {_format_bytes(report['bytes'])} in {report['files']} file(s) "
+                  f"({classes}); {_format_bytes(in_use)} in use")
+        return report
@@ -2,10 +2,22 @@
 Background job queue processor
 Handles async video creation tasks
 """
+import hashlib
+import json
+import os
+import socket
 import threading
 import time
+from contextlib import contextmanager
 from datetime import datetime
-from database import db
+import artifacts
+import cancellation
+import metrics
+import tracing
+from config import config
+from database import db, PRIORITIES
+from scheduler import Scheduler, RENDER_STAGES
+from janitor import Janitor
 from modules import (
     ContentGenerator,
     TTSGenerator,
@@ -14,16 +26,147 @@ from modules import (
     VideoAssembler,
     YouTubeUploader
 )
-from pathlib import Path
+
+# Services saved from the web UI -> Settings fields they populate
+SETTINGS_FROM_DB = {
+    'gemini': ('GEMINI_API_KEY',),
+    'openai': ('OPENAI_API_KEY',),
+    'whisper': ('WHISPER_API_KEY',),
+    'elevenlabs': ('ELEVENLABS_API_KEY',),
+    'luma': ('LUMA_API_KEY',),
+    'runway': ('RUNWAY_API_KEY',),
+    'youtube_client_id': ('YOUTUBE_CLIENT_ID',),
+    'youtube_client_secret': ('YOUTUBE_CLIENT_SECRET',),
+    'content_ai_service': ('CONTENT_AI_SERVICE',),
+    'tts_service': ('TTS_SERVICE',),
+    'video_service': ('VIDEO_SERVICE',),
+    'video_endpoint': ('VIDEO_API_ENDPOINT',),
+}
+
+# Settings field that receives the UI's generic 'video_api' key
+VIDEO_KEY_FIELDS = {
+    'luma': 'LUMA_API_KEY',
+    'runway': 'RUNWAY_API_KEY',
+}
+
+PRIORITY_NAMES = {level: name for name, level in PRIORITIES.items()}
+
+# Settings that change what a render produces, hashed with the script
+# to spot duplicate requests (keys, endpoints and paths do not)
+CONTENT_SETTINGS = (
+    'CONTENT_AI_SERVICE', 'TTS_SERVICE', 'VIDEO_SERVICE', 'MUSIC_SERVICE',
+    'VIDEO_FORMAT', 'VIDEO_WIDTH', 'VIDEO_HEIGHT', 'VIDEO_FPS', 'FFMPEG_PRESET', 'FFMPEG_CRF',
+)
+
+# Stages each task runs, in order
+PIPELINES = {
+    'render': RENDER_STAGES,
+    'upload': ('upload',),
+}
+STAGES = RENDER_STAGES + ('upload',)
+
+# Dashboard step and progress shown while a stage runs
+STAGE_STEPS = {
+    'content': ('Generating content metadata', 10),
+    'tts': ('Generating voiceover', 25),
+    'video': ('Generating video (2-5 min)', 40),
+    'captions': ('Generating captions', 70),
+    'assemble': ('Assembling final video', 85),
+    'upload': ('Uploading to YouTube', 50),
+}
+
+def _digest(payload):
+    """SHA-256 of a JSON-serialisable payload"""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+def request_hash(script, title=None, description=None, priority='normal'):
+    """SHA-256 of a video request as sent, checked when its Idempotency-Key is reused"""
+    return _digest({
+        'script': script.strip(),
+        'title': title or None,
+        'description': description or None,
+        'priority': priority,
+    })
+
+class LeaseLost(Exception):
+    """The job's lease ran out and it was put back in the queue"""
+
+def parse_stages(spec):
+    """Parse 'all' or 'assemble,upload' into a tuple of stage names"""
+    names = [part.strip() for part in spec.split(',') if part.strip()]
+    if not names or names == ['all']:
+        return STAGES
+    unknown = set(names) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+    return tuple(stage for stage in STAGES if stage in names)
+
+def parse_weights(spec):
+    """Parse 'api:3,schedule:1' into {'api': 3, 'schedule': 1}"""
+    weights = {}
+    for part in spec.split(','):
+        source, _, weight = part.partition(':')
+        if source.strip():
+            weights[source.strip()] = max(int(weight or 1), 1)
+    return weights
+
+class FairShare:
+    """
+    Smooth weighted round-robin over job sources
+    
+    Each pick credits every source with its weight and prefers the one
+    with the most credit; the source actually served is then charged the
+    total weight. Credit is capped so a source that sat idle cannot
+    monopolise the worker when it comes back.
+    """
+    
+    def __init__(self, weights):
+        """
+        Initialize rotation
+        
+        Args:
+            weights: {source: weight}
+        """
+        self.weights = dict(weights)
+        self.total = sum(self.weights.values())
+        self.credit = {source: 0 for source in self.weights}
+    
+    def order(self):
+        """Sources in order of preference for the next job"""
+        for source, weight in self.weights.items():
+            self.credit[source] = min(self.credit[source] + weight, self.total)
+        return sorted(self.credit, key=lambda source: -self.credit[source])
+    
+    def charge(self, source):
+        """Record that a job from `source` was taken"""
+        if source in self.credit:
+            self.credit[source] = max(self.credit[source] - self.total, -self.total)
 
 class JobQueue:
     """Background job processor for video creation"""
     
-    def __init__(self):
-        """Initialize job queue"""
+    def __init__(self, workers=None, stages=None, node=None):
+        """
+        Initialize job queue
+        
+        Args:
+            workers: Jobs processed in parallel (default JOB_WORKERS)
+            stages: Stages this node runs, as for WORKER_STAGES
+            node: Name on this node's job leases (default WORKER_NODE)
+        """
         self.running = False
-        self.worker_thread = None
-        self.current_job = None
+        self.workers = workers or config.JOB_WORKERS
+        self.stages = parse_stages(stages or config.WORKER_STAGES)
+        self.node = node or config.WORKER_NODE or f"{socket.gethostname()}:{os.getpid()}"
+        self.worker_threads = []
+        self.current_jobs = {}  # worker thread name -> job being processed
+        self._cancel_events = {}  # job id -> Event set when it is cancelled
+        self.scheduler = Scheduler()
+        self.janitor = Janitor()
+        self.fair_share = FairShare(parse_weights(config.JOB_SOURCE_WEIGHTS))
+        self._claim_lock = threading.Lock()
+        self._heartbeat_thread = None
+        self._stopped = threading.Event()
     
     def start(self):
         """Start the job queue worker"""
@@ -31,128 +174,321 @@ class JobQueue:
             print("⚠️  Job queue already running")
             return
         
+        # Jobs this node held when it last went down cannot still be running
+        self.reap(own=True)
+        
         self.running = True
-        self.worker_thread = threading.Thread(target=self._worker, daemon=True)
-        self.worker_thread.start()
-        print("[OK] Job queue worker started")
+        self._stopped.clear()
+        self.worker_threads = [
+            threading.Thread(target=self._worker, name=f"worker-{n}", daemon=True)
+            for n in range(self.workers)
+        ]
+        for thread in self.worker_threads:
+            thread.start()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+        db.beat_worker(self.node, self.workers)
+        print(f"[OK] Job queue started with {self.workers} worker(s) on {self.node}")
+        if self.stages != STAGES:
+            print(f"[OK] Running stages: {', '.join(self.stages)}")
+        
+        self.scheduler.start()
+        self.janitor.start()
     
     def stop(self):
         """Stop the job queue worker"""
         self.running = False
-        if self.worker_thread:
-            self.worker_thread.join(timeout=5)
+        self._stopped.set()
+        self.scheduler.stop()
+        self.janitor.stop()
+        for thread in self.worker_threads:
+            thread.join(timeout=5)
+        if self._heartbeat_thread:
+            self._heartbeat_thread.join(timeout=5)
+        db.remove_worker(self.node)
         print("[STOP] Job queue worker stopped")
     
-    def submit_job(self, video_id):
-        """Submit a new job to the queue"""
-        job_id = db.create_job(video_id)
+    def submit_job(self, video_id, priority='normal', source='api'):
+        """
+        Submit a new job to the queue
+        
+        Args:
+            video_id: Video to render
+            priority: 'high', 'normal' or 'low'
+            source: Submitter used for fair sharing ('api' or 'schedule')
+        """
+        job_id = db.create_job(video_id, priority=PRIORITIES[priority], source=source)
         print(f"[NEW] Job {job_id} created for video {video_id}")
         return job_id
     
+    def submit_video(self, script, title=None, description=None, priority='normal', source='api',
+                     idempotency_key=None, dedupe=False):
+        """
+        Create a video and queue its render, unless a matching one exists
+        
+        Args:
+            script: Video script
+            title, description: Optional metadata (generated if empty)
+            priority: 'high', 'normal' or 'low'
+            source: Submitter used for fair sharing
+            idempotency_key: Client key; a repeated request gets the same video
+            dedupe: Also reuse a video with the same script and render settings
+        
+        Returns:
+            (video_id, job_id, created), see Database.create_video_job
+        """
+        video_id, job_id, created = db.create_video_job(
+            script,
+            title=title,
+            description=description,
+            priority=PRIORITIES[priority],
+            source=source,
+            idempotency_key=idempotency_key,
+            content_hash=self.content_hash(script, title, description),
+            request_hash=request_hash(script, title, description, priority),
+            dedupe=dedupe
+        )
+        if created:
+            print(f"[NEW] Job {job_id} created for video {video_id}")
+        else:
+            print(f"[DEDUP] Video {video_id} already requested; nothing queued")
+        return video_id, job_id, created
+    
+    def submit_videos(self, items, source='api'):
+        """
+        Create many videos and queue their renders in one transaction
+        
+        Args:
+            items: Dicts with script and optionally title, description,
+                   priority ('high', 'normal' or 'low'), idempotency_key
+                   and dedupe, as for submit_video
+            source: Submitter used for fair sharing
+        
+        Returns:
+            (video_id, job_id, created) per item, see Database.create_videos_jobs
+        """
+        settings = self._load_settings()
+        results = db.create_videos_jobs([
+            {
+                **item,
+                'priority': PRIORITIES[item.get('priority') or 'normal'],
+                'content_hash': self.content_hash(
+                    item['script'], item.get('title'), item.get('description'), settings=settings
+                ),
+                'request_hash': request_hash(
+                    item['script'], item.get('title'), item.get('description'), item.get('priority') or 'normal'
+                ),
+            }
+            for item in items
+        ], source=source)
+        created = sum(1 for result in results if result[2])
+        print(f"[NEW] {created} job(s) created from a batch of {len(items)}")
+        return results
+    
+    def content_hash(self, script, title=None, description=None, settings=None):
+        """SHA-256 of a video request and the settings it would be rendered with"""
+        settings = settings or self._load_settings()
+        return _digest({
+            'script': script.strip(),
+            'title': title or None,
+            'description': description or None,
+            'settings': {name: getattr(settings, name) for name in CONTENT_SETTINGS},
+        })
+    
+    def _update_job(self, job, **changes):
+        """Persist job changes (web processes turn them into live events)"""
+        db.update_job(job['id'], **changes)
+        job.update(changes)
+    
     def _worker(self):
         """Background worker that processes jobs"""
         print("[WORKER] Job queue worker running...")
         
+        name = threading.current_thread().name
+        
         while self.running:
-            # Get next pending job
-            jobs = db.get_all_jobs(status='pending', limit=1)
+            try:
+                job = self._claim_next()
+            except Exception as e:
+                print(f"[ERROR] Claiming a job failed: {e}")
+                job = None
             
-            if jobs:
-                job = jobs[0]
-                self.current_job = job
-                self._process_job(job)
-                self.current_job = None
-            else:
+            if not job:
                 # No jobs, sleep for a bit
                 time.sleep(2)
+                continue
+            
+            self.current_jobs[name] = job
+            self._cancel_events[job['id']] = threading.Event()
+            try:
+                try:
+                    db.record_stage(job['id'], 'queue_wait', job.pop('queue_wait'),
+                                    detail=PRIORITY_NAMES.get(job['priority']))
+                except Exception as e:
+                    print(f"[WARN] Recording the queue wait of job {job['id']} failed: {e}")
+                with tracing.trace(job['id']), cancellation.scope(self._cancel_events[job['id']]):
+                    self._process_job(job)
+            except Exception as e:
+                # Its lease is no longer renewed, so the reaper requeues it
+                print(f"[ERROR] Worker {name} gave up job {job['id']}: {e}")
+            finally:
+                self._cancel_events.pop(job['id'], None)
+                self.current_jobs.pop(name, None)
+    
+    def _heartbeat(self):
+        """
+        Pass cancellations on to running jobs, and every heartbeat renew
+        their leases and requeue orphaned jobs
+        """
+        next_beat = time.monotonic() + config.JOB_HEARTBEAT_INTERVAL
+        while not self._stopped.wait(config.JOB_CANCEL_POLL_INTERVAL):
+            try:
+                for job_id in db.get_cancel_requests(list(self._cancel_events)):
+                    event = self._cancel_events.get(job_id)
+                    if event and not event.is_set():
+                        print(f"[CANCEL] Stopping job {job_id}")
+                        event.set()
+            except Exception as e:
+                print(f"[ERROR] Checking for cancelled jobs failed: {e}")
+            
+            if time.monotonic() < next_beat:
+                continue
+            next_beat = time.monotonic() + config.JOB_HEARTBEAT_INTERVAL
+            
+            try:
+                db.beat_worker(self.node, self.workers)
+            except Exception as e:
+                print(f"[ERROR] Recording the worker heartbeat failed: {e}")
+            for job in list(self.current_jobs.values()):
+                if job.get('status') != 'processing':
+                    continue
+                try:
+                    if not db.renew_lease(job['id'], job['lease_owner'], config.JOB_LEASE_SECONDS):
+                        print(f"[WARN] Lost the lease on job {job['id']}")
+                except Exception as e:
+                    print(f"[ERROR] Renewing the lease on job {job['id']} failed: {e}")
+            try:
+                self.reap()
+            except Exception as e:
+                print(f"[ERROR] Reaping orphaned jobs failed: {e}")
+    
+    def reap(self, own=False):
+        """
+        Requeue jobs whose worker stopped heartbeating
+        
+        Args:
+            own: Also take back every job leased by this node's name,
+                 whatever its lease says (used when the node starts)
+        
+        Returns:
+            Number of jobs requeued or failed
+        """
+        requeued, failed = db.reap_jobs(
+            owner_prefix=f"{self.node}/" if own else None,
+            max_reclaims=config.JOB_MAX_RECLAIMS
+        )
+        for job_id in requeued:
+            print(f"[REAPER] Job {job_id} requeued after losing its worker")
+        for job_id in failed:
+            print(f"[REAPER] Job {job_id} failed: worker lost {config.JOB_MAX_RECLAIMS + 1} times")
+        return len(requeued) + len(failed)
+    
+    def _owner(self):
+        """Lease holder name for the calling worker thread"""
+        return f"{self.node}/{threading.current_thread().name}"
+    
+    def _claim_next(self):
+        """Take the next job: highest priority, sources taking turns, FIFO within each"""
+        with self._claim_lock:
+            job = db.claim_next_job(
+                self.fair_share.order(),
+                stages=self.stages,
+                owner=self._owner(),
+                lease=config.JOB_LEASE_SECONDS
+            )
+            if job:
+                self.fair_share.charge(job['source'])
+            return job
+    
+    def get_queue_waits(self):
+        """
+        Queue wait per priority class, over every node's claims
+        
+        Returns:
+            {priority name: {'started', 'avg_wait', 'max_wait', 'pending',
+            'oldest_pending'}}, times in seconds
+        """
+        pending = db.get_pending_by_priority()
+        started = db.get_queue_wait_stats()
+        
+        result = {}
+        for level, name in PRIORITY_NAMES.items():
+            count, total, longest = started.get(name, (0, 0.0, 0.0))
+            waiting, oldest = pending.get(level, (0, None))
+            result[name] = {
+                'started': count,
+                'avg_wait': round(total / count, 1) if count else None,
+                'max_wait': round(longest, 1) if count else None,
+                'pending': waiting,
+                'oldest_pending': round(oldest, 1) if oldest is not None else None
+            }
+        return result
+    
+    @contextmanager
+    def _measure(self, job, stage):
+        """Time a stage and store it with the operations timed inside it"""
+        with metrics.collect() as records:
+            with metrics.timed(stage):
+                yield
+        db.record_stages(job['id'], records)
+    
+    @contextmanager
+    def _stage(self, job, stage):
+        """Announce a pipeline stage and record how long it took"""
+        step, progress = STAGE_STEPS[stage]
+        self._update_job(job, current_step=step, progress=progress)
+        with self._measure(job, stage):
+            yield
+    
+    def _renew(self, job, stage=None):
+        """Extend the job's lease; raises LeaseLost if it is no longer ours"""
+        if not db.renew_lease(job['id'], job['lease_owner'], config.JOB_LEASE_SECONDS, stage=stage):
+            raise LeaseLost(f"Job {job['id']} was requeued after its lease ran out")
+        if stage:
+            job['stage'] = stage
     
     def _process_job(self, job):
         """Process a single job"""
         job_id = job['id']
         video_id = job['video_id']
+        task = job.get('task') or 'render'
         
         print(f"\n{'='*60}")
-        print(f"  PROCESSING JOB {job_id} (Video {video_id})")
+        print(f"  PROCESSING JOB {job_id} (Video {video_id}, {task}"
+              f"{', from ' + job['stage'] if job.get('stage') else ''})")
         print(f"{'='*60}\n")
         
         try:
-            # Mark job as processing
-            db.update_job(job_id, 
-                status='processing',
-                started_at=datetime.now(),
-                current_step='Initializing',
-                progress=0
-            )
-            
-            # Get video details
-            video = db.get_video(video_id)
-            script = video['script']
-            
-            # Get API keys from database
-            api_keys = self._load_api_keys()
+            # Mark job as processing; a job resumed from another node
+            # keeps its start time and progress
+            changes = {'status': 'processing', 'current_step': 'Initializing'}
+            if not job.get('stage'):
+                changes.update(started_at=datetime.now(), progress=0)
+            self._update_job(job, **changes)
             
-            # Initialize modules with API keys
-            content_gen = ContentGenerator()
-            tts_gen = TTSGenerator()
-            video_gen = VideoGenerator()
-            caption_gen = CaptionGenerator()
-            video_assembler = VideoAssembler()
+            # Snapshot keys, service choices and video settings for this job
+            with self._measure(job, 'settings'):
+                settings = self._load_settings()
             
-            # Create output directory
-            output_dir = Path(f"output/video_{video_id}")
-            output_dir.mkdir(parents=True, exist_ok=True)
+            if not self._run_stages(job, task, settings):
+                print(f"\n[HANDOFF] Job {job_id} queued for a worker running '{job['stage']}'")
+                return
             
-            # Step 1: Generate content metadata
-            db.update_job(job_id, current_step='Generating content metadata', progress=10)
-            metadata = content_gen.generate(script)
-            
-            # Update video with metadata
-            db.update_video(video_id,
-                title=metadata['title'],
-                description=metadata['description'],
-                tags=metadata['tags']
-            )
-            
-            # Step 2: Generate voiceover
-            db.update_job(job_id, current_step='Generating voiceover', progress=25)
-            audio_path = tts_gen.generate(
-                script,
-                output_path=output_dir / "audio.mp3"
-            )
-            
-            # Step 3: Generate video
-            db.update_job(job_id, current_step='Generating video (2-5 min)', progress=40)
-            video_prompt = f"High quality cinematic video: {script[:100]}"
-            video_path = video_gen.generate(
-                video_prompt,
-                output_path=output_dir / "video_raw.mp4"
-            )
-            
-            # Step 4: Generate captions
-            db.update_job(job_id, current_step='Generating captions', progress=70)
-            captions_path = caption_gen.generate(
-                audio_path,
-                output_path=output_dir / "captions.srt"
-            )
-            
-            # Step 5: Assemble final video
-            db.update_job(job_id, current_step='Assembling final video', progress=85)
-            final_video_path = video_assembler.assemble(
-                video_path,
-                audio_path,
-                captions_path,
-                output_path=output_dir / "final_video.mp4"
-            )
-            
-            # Update video record
-            db.update_video(video_id,
-                video_path=str(final_video_path),
-                status='completed',
-                completed_at=datetime.now()
-            )
+            # Only the lease holder may finish the job
+            self._renew(job)
             
             # Mark job as completed
-            db.update_job(job_id,
+            self._update_job(job,
                 status='completed',
                 current_step='Completed',
                 progress=100,
@@ -161,49 +497,229 @@ class JobQueue:
             
             print(f"\n[SUCCESS] Job {job_id} completed successfully!")
             
+        except LeaseLost as e:
+            print(f"\n[WARN] {e}; dropping it")
+            
+        except cancellation.Cancelled:
+            print(f"\n[CANCEL] Job {job_id} cancelled")
+            
+            try:
+                # Partial stage outputs are useless; an upload leaves the
+                # rendered video alone
+                if task != 'upload':
+                    artifacts.get_store().delete(artifacts.video_owner(video_id))
+                    db.update_video(video_id, status='cancelled')
+                
+                self._update_job(job,
+                    status='cancelled',
+                    current_step='Cancelled',
+                    completed_at=datetime.now()
+                )
+            except Exception as write_error:
+                # The reaper finishes the cancellation once the lease expires
+                print(f"[ERROR] Could not mark job {job_id} cancelled: {write_error}")
+            
         except Exception as e:
             print(f"\n[ERROR] Job {job_id} failed: {e}")
             import traceback
             traceback.print_exc()
             
-            # Mark job as failed
-            db.update_job(job_id,
-                status='failed',
-                current_step='Failed',
-                error_message=str(e),
-                completed_at=datetime.now()
-            )
+            try:
+                self._renew(job)
+                
+                # Mark job as failed
+                self._update_job(job,
+                    status='failed',
+                    current_step='Failed',
+                    error_message=str(e),
+                    completed_at=datetime.now()
+                )
+                
+                # A failed upload leaves the rendered video intact
+                if task != 'upload':
+                    db.update_video(video_id, status='failed')
+            except LeaseLost as lost:
+                print(f"[WARN] {lost}; not marking it failed")
+            except Exception as write_error:
+                # Left processing; its lease expires and the reaper requeues it
+                print(f"[ERROR] Could not mark job {job_id} failed: {write_error}")
+    
+    def _run_stages(self, job, task, settings):
+        """
+        Run the job's remaining stages, starting from job['stage']
+        
+        Returns:
+            False if the job reached a stage this node does not run and
+            was put back in the queue for one that does
+        """
+        stages = PIPELINES[task]
+        start = stages.index(job['stage']) if job.get('stage') else 0
+        
+        for stage in stages[start:]:
+            cancellation.check()
+            if stage not in self.stages:
+                step = f"Queued for {stage}"
+                if not db.release_job(job['id'], job['lease_owner'], stage, step):
+                    if db.get_cancel_requests([job['id']]):
+                        raise cancellation.Cancelled('Job cancelled')
+                    raise LeaseLost(f"Job {job['id']} was requeued after its lease ran out")
+                job.update(status='pending', stage=stage, current_step=step)
+                return False
             
-            db.update_video(video_id, status='failed')
-    
-    def _load_api_keys(self):
-        """Load API keys from database and set in environment"""
-        import os
-        
-        keys_mapping = {
-            'gemini': 'GEMINI_API_KEY',
-            'openai': 'OPENAI_API_KEY',
-            'luma': 'LUMA_API_KEY',
-            'youtube_client_id': 'YOUTUBE_CLIENT_ID',
-            'youtube_client_secret': 'YOUTUBE_CLIENT_SECRET',
-        }
+            self._renew(job, stage)
+            with self._stage(job, stage):
+                getattr(self, f'_run_{stage}')(job, settings)
+        return True
+    
+    def _run_content(self, job, settings):
+        """Stage 1: generate title, description and tags"""
+        video_id = job['video_id']
+        video = db.get_video(video_id)
         
-        api_keys = {}
-        for service, env_var in keys_mapping.items():
-            key = db.get_api_key(service)
-            if key:
-                os.environ[env_var] = key
-                api_keys[service] = key
+        metadata = ContentGenerator(settings).generate(video['script'])
         
-        return api_keys
+        # Update video with metadata
+        db.update_video(video_id,
+            title=metadata['title'],
+            description=metadata['description'],
+            tags=metadata['tags']
+        )
+        job['title'] = metadata['title']
+    
+    # Stages 2-5 read their inputs from and save their output to the
+    # artifact store, so a job can continue on another node
+    
+    def _run_tts(self, job, settings):
+        """Stage 2: generate the voiceover"""
+        store = artifacts.get_store()
+        owner = artifacts.video_owner(job['video_id'])
+        video = db.get_video(job['video_id'])
+        
+        TTSGenerator(settings).generate(
+            video['script'],
+            output_path=store.path(artifacts.artifact_key(owner, 'tts'))
+        )
+        store.save(artifacts.artifact_key(owner, 'tts'))
+    
+    def _run_video(self, job, settings):
+        """Stage 3: generate the video clip"""
+        store = artifacts.get_store()
+        owner = artifacts.video_owner(job['video_id'])
+        video = db.get_video(job['video_id'])
+        
+        video_prompt = f"High quality cinematic video: {video['script'][:100]}"
+        VideoGenerator(settings).generate(
+            video_prompt,
+            output_path=store.path(artifacts.artifact_key(owner, 'video'))
+        )
+        store.save(artifacts.artifact_key(owner, 'video'))
+    
+    def _run_captions(self, job, settings):
+        """Stage 4: caption the voiceover"""
+        store = artifacts.get_store()
+        owner = artifacts.video_owner(job['video_id'])
+        
+        CaptionGenerator(settings).generate(
+            store.load(artifacts.artifact_key(owner, 'tts')),
+            output_path=store.path(artifacts.artifact_key(owner, 'captions'))
+        )
+        store.save(artifacts.artifact_key(owner, 'captions'))
+    
+    def _run_assemble(self, job, settings):
+        """Stage 5: assemble the final video"""
+        video_id = job['video_id']
+        store = artifacts.get_store()
+        owner = artifacts.video_owner(video_id)
+        
+        VideoAssembler(settings).assemble(
+            str(store.load(artifacts.artifact_key(owner, 'video'))),
+            str(store.load(artifacts.artifact_key(owner, 'tts'))),
+            str(store.load(artifacts.artifact_key(owner, 'captions'))),
+            output_path=store.path(artifacts.artifact_key(owner, 'assemble'))
+        )
+        final_video = store.save(artifacts.artifact_key(owner, 'assemble'))
+        
+        # Update video record; queues the upload if one was requested
+        db.complete_video(video_id,
+            video_path=final_video,
+            completed_at=datetime.now()
+        )
+    
+    def _run_upload(self, job, settings):
+        """Upload an already rendered video to YouTube"""
+        video_id = job['video_id']
+        video = db.get_video(video_id)
+        
+        youtube_id = YouTubeUploader(settings).upload(
+            str(artifacts.get_store().fetch(video['video_path'])),
+            title=video['title'],
+            description=video['description'] or '',
+            tags=video.get('tags') or []
+        )
+        
+        db.update_video(video_id,
+            youtube_id=youtube_id,
+            youtube_url=f"https://www.youtube.com/watch?v={youtube_id}",
+            uploaded_at=datetime.now()
+        )
+    
+    def _load_settings(self):
+        """
+        Build an immutable settings snapshot for one job
+        
+        Values saved from the web UI override the .env configuration.
+        Nothing global is modified, so concurrent jobs cannot interfere.
+        """
+        stored = db.get_api_keys()
+        
+        overrides = {}
+        for service, fields in SETTINGS_FROM_DB.items():
+            value = stored.get(service)
+            if value:
+                for field in fields:
+                    overrides[field] = value
+        
+        # Script generation uses the UI's OpenAI key only if the operator
+        # has not set OPENAI_GPT_API_KEY separately
+        if stored.get('openai') and not config.OPENAI_GPT_API_KEY:
+            overrides['OPENAI_GPT_API_KEY'] = stored['openai']
+        
+        # The UI has one key field for whichever video service is selected
+        video_service = overrides.get('VIDEO_SERVICE', config.VIDEO_SERVICE)
+        if stored.get('video_api') and video_service in VIDEO_KEY_FIELDS:
+            overrides[VIDEO_KEY_FIELDS[video_service]] = stored['video_api']
+        
+        return config.snapshot(**overrides)
+    
+    def get_nodes(self):
+        """
+        Nodes whose job queue is running
+        
+        A node counts as alive until its heartbeat is JOB_LEASE_SECONDS
+        old, when its jobs would be reaped as well.
+        """
+        return db.get_live_workers(config.JOB_LEASE_SECONDS)
     
     def get_status(self):
-        """Get current worker status"""
+        """
+        Get worker status
+        
+        Everything comes from the database, so a web process also sees
+        separate worker processes: 'running' is whether any node's queue
+        is alive and 'workers' their worker threads in total.
+        """
+        counts = db.get_status_counts('jobs')
+        current = db.get_all_jobs(status='processing', limit=100)
+        nodes = self.get_nodes()
         return {
-            'running': self.running,
-            'current_job': self.current_job,
-            'pending_jobs': len(db.get_all_jobs(status='pending')),
-            'processing_jobs': len(db.get_all_jobs(status='processing'))
+            'running': bool(nodes),
+            'workers': sum(node['workers'] for node in nodes),
+            'nodes': nodes,
+            'current_job': next(iter(current), None),
+            'current_jobs': current,
+            'pending_jobs': counts.get('pending', 0),
+            'processing_jobs': counts.get('processing', 0),
+            'queue_wait': self.get_queue_waits()
         }
 
 # Global job queue instance
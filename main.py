@@ -4,6 +4,7 @@ Main orchestrator for YouTube Shorts automation
 import sys
 from pathlib import Path
 from datetime import datetime
+import artifacts
 from config import config
 from modules import (
     ContentGenerator,
@@ -41,7 +42,8 @@ class YouTubeShortsAutomation:
             self.video_gen = VideoGenerator()
             self.caption_gen = CaptionGenerator()
             self.video_assembler = VideoAssembler()
-            self.youtube_uploader = YouTubeUploader()
+            # Authenticated on first upload, so renders need no YouTube login
+            self.youtube_uploader = None
             print("✅ All modules initialized\n")
         except Exception as e:
             print(f"❌ Initialization failed: {e}")
@@ -67,6 +69,11 @@ class YouTubeShortsAutomation:
         print("="*60)
         print(f"\n📝 Script:\n{script}\n")
         
+        # Each run gets its own artifact owner, so concurrent runs never
+        # overwrite each other's files
+        store = artifacts.get_store()
+        owner = artifacts.new_owner(f"run_{timestamp}")
+        
         result = {
             'timestamp': timestamp,
             'script': script,
@@ -83,8 +90,9 @@ class YouTubeShortsAutomation:
             print("\n[STEP 2/6] Generating voiceover...")
             audio_path = self.tts_gen.generate(
                 script,
-                output_path=config.TEMP_DIR / f"audio_{timestamp}.mp3"
+                output_path=store.path(artifacts.artifact_key(owner, 'tts'))
             )
+            store.save(artifacts.artifact_key(owner, 'tts'))
             result['audio'] = audio_path
             
             # Step 3: Generate video
@@ -94,16 +102,18 @@ class YouTubeShortsAutomation:
             
             video_path = self.video_gen.generate(
                 video_prompt,
-                output_path=config.TEMP_DIR / f"video_{timestamp}.mp4"
+                output_path=store.path(artifacts.artifact_key(owner, 'video'))
             )
+            store.save(artifacts.artifact_key(owner, 'video'))
             result['video_raw'] = video_path
             
             # Step 4: Generate captions
             print("\n[STEP 4/6] Generating captions...")
             captions_path = self.caption_gen.generate(
                 audio_path,
-                output_path=config.TEMP_DIR / f"captions_{timestamp}.srt"
+                output_path=store.path(artifacts.artifact_key(owner, 'captions'))
             )
+            store.save(artifacts.artifact_key(owner, 'captions'))
             result['captions'] = captions_path
             
             # Step 5: Assemble final video
@@ -112,13 +122,16 @@ class YouTubeShortsAutomation:
                 video_path,
                 audio_path,
                 captions_path,
-                output_path=config.OUTPUT_DIR / f"youtube_short_{timestamp}.mp4"
+                output_path=store.path(artifacts.artifact_key(owner, 'assemble'))
             )
             result['final_video'] = final_video_path
+            result['location'] = store.save(artifacts.artifact_key(owner, 'assemble'))
             
             # Step 6: Upload to YouTube (if requested)
             if auto_upload:
                 print("\n[STEP 6/6] Uploading to YouTube...")
+                if self.youtube_uploader is None:
+                    self.youtube_uploader = YouTubeUploader()
                 video_id = self.youtube_uploader.upload(
                     final_video_path,
                     title=metadata['title'],
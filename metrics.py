@@ -0,0 +1,172 @@
+"""
+Pipeline metrics
+Per-job stage timings and counters, and Prometheus text exposition
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+import tracing
+
+# Histogram buckets in seconds, from cached lookups up to slow renders
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+# Per-record counters, stored alongside each stage_metrics row,
+# and the Prometheus counter each one is exposed as
+COUNTERS = {
+    'retries': ('shorts_retries_total', 'Retried provider calls'),
+    'cache_hits': ('shorts_cache_hits_total', 'Lookups served from a cache'),
+    'bytes': ('shorts_transfer_bytes_total', 'Bytes downloaded from or uploaded to providers'),
+}
+
+# Finished records of the job being processed in this context
+_records = contextvars.ContextVar('metrics_records', default=None)
+
+# Innermost record being timed; count() adds to it
+_active = contextvars.ContextVar('metrics_active', default=None)
+
+@contextmanager
+def collect():
+    """Collect the records timed in this context; yields the list"""
+    records = []
+    token = _records.set(records)
+    try:
+        yield records
+    finally:
+        _records.reset(token)
+
+@contextmanager
+def timed(stage, detail=None):
+    """
+    Time a pipeline stage or an operation inside one
+    
+    Counters incremented with count() while it runs attach to this
+    record. Outside collect() nothing is kept, so modules can be used
+    standalone (e.g. from main.py) at no cost. The block is also traced
+    as a span named stage or stage.detail.
+    
+    Args:
+        stage: Stage or operation name, e.g. 'tts' or 'poll_wait'
+        detail: Provider or tool, e.g. 'luma' or 'ffmpeg'
+    """
+    record = {'stage': stage, 'detail': detail, 'duration': 0.0}
+    record.update((name, 0) for name in COUNTERS)
+    
+    token = _active.set(record)
+    started = time.perf_counter()
+    try:
+        with tracing.span(f"{stage}.{detail}" if detail else stage):
+            yield record
+    finally:
+        record['duration'] = time.perf_counter() - started
+        _active.reset(token)
+        records = _records.get()
+        if records is not None:
+            records.append(record)
+
+def observe(stage, duration, detail=None):
+    """Record an operation timed by the caller (e.g. a polling loop)"""
+    records = _records.get()
+    if records is not None:
+        record = {'stage': stage, 'detail': detail, 'duration': duration}
+        record.update((name, 0) for name in COUNTERS)
+        records.append(record)
+
+def count(name, value=1):
+    """Add to a counter ('retries', 'cache_hits', 'bytes') of the current record"""
+    record = _active.get()
+    if record is not None:
+        record[name] += value
+
+def _escape(value):
+    """Escape a label value"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    """Format a Prometheus label set"""
+    pairs = ','.join(
+        f'{key}="{_escape(value)}"' for key, value in labels.items() if value is not None
+    )
+    return f'{{{pairs}}}' if pairs else ''
+
+def render_gauge(name, help_text, samples):
+    """
+    Format one gauge family
+    
+    Args:
+        samples: Iterable of (labels dict, value)
+    """
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+    for labels, value in samples:
+        lines.append(f'{name}{_labels(**labels)} {value}')
+    return lines
+
+class StageHistograms:
+    """
+    Cumulative histograms and counters built from stage_metrics rows
+    
+    Rows are read incrementally by id, so every scrape only touches rows
+    added since the last one, and the numbers cover all worker processes
+    sharing the database.
+    """
+    
+    def __init__(self, buckets=BUCKETS):
+        """Initialize empty histograms"""
+        self.buckets = buckets
+        self.last_id = 0
+        self._series = {}  # (stage, detail) -> {'buckets', 'sum', 'count', counters...}
+        self._lock = threading.Lock()
+    
+    def refresh(self, fetch):
+        """
+        Fold in new rows
+        
+        Args:
+            fetch: Called as fetch(after_id), returns rows (dicts) with
+                   id, stage, detail, duration and the COUNTERS
+        """
+        with self._lock:
+            for row in fetch(self.last_id):
+                series = self._series.get((row['stage'], row['detail']))
+                if series is None:
+                    series = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+                    series.update((name, 0) for name in COUNTERS)
+                    self._series[(row['stage'], row['detail'])] = series
+                
+                for i, bound in enumerate(self.buckets):
+                    if row['duration'] <= bound:
+                        series['buckets'][i] += 1
+                series['sum'] += row['duration']
+                series['count'] += 1
+                for name in COUNTERS:
+                    series[name] += row[name] or 0
+                self.last_id = row['id']
+    
+    def render(self):
+        """Format the histograms and counters as exposition lines"""
+        name = 'shorts_stage_duration_seconds'
+        lines = [
+            f'# HELP {name} Time spent in pipeline stages and provider operations',
+            f'# TYPE {name} histogram'
+        ]
+        counters = {
+            counter: [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+            for counter, (metric, help_text) in COUNTERS.items()
+        }
+        
+        with self._lock:
+            series = sorted(self._series.items(), key=lambda item: (item[0][0], item[0][1] or ''))
+            for (stage, detail), values in series:
+                for bound, hits in zip(self.buckets, values['buckets']):
+                    lines.append(f'{name}_bucket{_labels(stage=stage, detail=detail, le=bound)} {hits}')
+                lines.append(f'{name}_bucket{_labels(stage=stage, detail=detail, le="+Inf")} {values["count"]}')
+                lines.append(f'{name}_sum{_labels(stage=stage, detail=detail)} {values["sum"]:.6f}')
+                lines.append(f'{name}_count{_labels(stage=stage, detail=detail)} {values["count"]}')
+                
+                for counter, family in counters.items():
+                    metric = COUNTERS[counter][0]
+                    family.append(f'{metric}{_labels(stage=stage, detail=detail)} {values[counter]}')
+        
+        for family in counters.values():
+            lines.extend(family)
+        return lines
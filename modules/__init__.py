@@ -1,5 +1,6 @@
 """YouTube Shorts modules"""
 
+import cassette
 from .content_generator import ContentGenerator
 from .tts_generator import TTSGenerator
 from .video_generator import VideoGenerator
@@ -15,3 +16,6 @@ __all__ = [
     'VideoAssembler',
     'YouTubeUploader'
 ]
+
+# Record or replay provider traffic when CASSETTE_MODE is set
+cassette.install()
@@ -6,13 +6,23 @@ from openai import OpenAI
 from pathlib import Path
 from config import config
 import json
+import metrics
 
 class CaptionGenerator:
     """Generate captions/subtitles from audio"""
     
-    def __init__(self):
-        """Initialize caption generator"""
-        self.client = OpenAI(api_key=config.OPENAI_API_KEY)
+    def __init__(self, settings=None):
+        """
+        Initialize caption generator
+        
+        Args:
+            settings: Settings snapshot (optional, defaults to global config)
+        """
+        self.settings = settings or config
+        self.client = OpenAI(
+            api_key=self.settings.WHISPER_API_KEY or self.settings.OPENAI_API_KEY,
+            base_url=self.settings.OPENAI_BASE_URL or None
+        )
     
     def generate(self, audio_path: str, output_path: str = None) -> str:
         """
@@ -28,7 +38,7 @@ class CaptionGenerator:
         audio_path = Path(audio_path)
         
         if output_path is None:
-            output_path = config.TEMP_DIR / "captions.srt"
+            output_path = self.settings.TEMP_DIR / "captions.srt"
         else:
             output_path = Path(output_path)
         
@@ -38,7 +48,8 @@ class CaptionGenerator:
         
         try:
             # Transcribe audio with timestamps
-            with open(audio_path, 'rb') as audio_file:
+            with metrics.timed('provider_call', 'whisper'), open(audio_path, 'rb') as audio_file:
+                metrics.count('bytes', Path(audio_path).stat().st_size)
                 transcript = self.client.audio.transcriptions.create(
                     model="whisper-1",
                     file=audio_file,
@@ -74,6 +85,10 @@ class CaptionGenerator:
         }
         
         for i, word in enumerate(words):
+            # Newer SDKs return word objects rather than dicts
+            if not isinstance(word, dict):
+                word = {'word': word.word, 'start': word.start, 'end': word.end}
+            
             if not current_segment['words']:
                 current_segment['start'] = word['start']
             
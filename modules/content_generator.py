@@ -2,22 +2,45 @@
 Content Generator Module
 Generates video titles, descriptions, and tags using AI (Google Gemini or GPT-4)
 """
-import google.generativeai as genai
+from google.ai import generativelanguage as glm
 from openai import OpenAI
 from config import config
+import cassette
+import metrics
 
 class ContentGenerator:
     """Generate YouTube metadata from video script"""
     
-    def __init__(self):
-        """Initialize the content generator based on config"""
-        self.service = config.CONTENT_AI_SERVICE
+    def __init__(self, settings=None):
+        """
+        Initialize the content generator
+        
+        Args:
+            settings: Settings snapshot (optional, defaults to global config)
+        """
+        self.settings = settings or config
+        self.service = self.settings.CONTENT_AI_SERVICE
         
         if self.service == 'gemini':
-            genai.configure(api_key=config.GEMINI_API_KEY)
-            self.model = genai.GenerativeModel('gemini-2.0-flash')
+            self.model = 'models/gemini-2.0-flash'
+            # genai.configure() is process-wide, so this instance calls the
+            # API through its own client, bound to its own key
+            client_options = {'api_key': self.settings.GEMINI_API_KEY}
+            # REST rather than gRPC when the calls go to a custom endpoint
+            # or through a cassette, which only sees HTTP/1.1 traffic
+            transport = 'rest' if cassette.active() else None
+            if self.settings.GEMINI_API_ENDPOINT:
+                client_options['api_endpoint'] = self.settings.GEMINI_API_ENDPOINT
+                transport = 'rest'
+            self.client = glm.GenerativeServiceClient(
+                transport=transport,
+                client_options=client_options
+            )
         elif self.service == 'gpt4':
-            self.client = OpenAI(api_key=config.OPENAI_GPT_API_KEY)
+            self.client = OpenAI(
+                api_key=self.settings.OPENAI_GPT_API_KEY,
+                base_url=self.settings.OPENAI_BASE_URL or None
+            )
     
     def generate(self, script: str) -> dict:
         """
@@ -50,16 +73,20 @@ Return ONLY a JSON object in this exact format:
 }}"""
 
         try:
-            if self.service == 'gemini':
-                response = self.model.generate_content(prompt)
-                result_text = response.text
-            else:  # gpt4
-                response = self.client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.7
-                )
-                result_text = response.choices[0].message.content
+            with metrics.timed('provider_call', self.service):
+                if self.service == 'gemini':
+                    response = self.client.generate_content(glm.GenerateContentRequest(
+                        model=self.model,
+                        contents=[glm.Content(role='user', parts=[glm.Part(text=prompt)])]
+                    ))
+                    result_text = ''.join(part.text for part in response.candidates[0].content.parts)
+                else:  # gpt4
+                    response = self.client.chat.completions.create(
+                        model="gpt-4o",
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=0.7
+                    )
+                    result_text = response.choices[0].message.content
             
             # Parse JSON response
             import json
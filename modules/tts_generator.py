@@ -3,21 +3,31 @@ Text-to-Speech Generator Module
 Converts scripts to audio using OpenAI TTS or ElevenLabs
 """
 from openai import OpenAI
-import requests
 from pathlib import Path
 from config import config
+import metrics
+import retry
 
 class TTSGenerator:
     """Generate voiceover audio from text"""
     
-    def __init__(self):
-        """Initialize TTS generator based on config"""
-        self.service = config.TTS_SERVICE
+    def __init__(self, settings=None):
+        """
+        Initialize TTS generator
+        
+        Args:
+            settings: Settings snapshot (optional, defaults to global config)
+        """
+        self.settings = settings or config
+        self.service = self.settings.TTS_SERVICE
         
         if self.service == 'openai':
-            self.client = OpenAI(api_key=config.OPENAI_API_KEY)
+            self.client = OpenAI(
+                api_key=self.settings.OPENAI_API_KEY,
+                base_url=self.settings.OPENAI_BASE_URL or None
+            )
         elif self.service == 'elevenlabs':
-            self.api_key = config.ELEVENLABS_API_KEY
+            self.api_key = self.settings.ELEVENLABS_API_KEY
     
     def generate(self, text: str, output_path: str = None) -> str:
         """
@@ -31,7 +41,7 @@ class TTSGenerator:
             Path to the generated audio file
         """
         if output_path is None:
-            output_path = config.TEMP_DIR / "voiceover.mp3"
+            output_path = self.settings.TEMP_DIR / "voiceover.mp3"
         else:
             output_path = Path(output_path)
         
@@ -50,14 +60,16 @@ class TTSGenerator:
     
     def _generate_openai(self, text: str, output_path: Path) -> str:
         """Generate using OpenAI TTS"""
-        response = self.client.audio.speech.create(
-            model="tts-1",  # Use "tts-1-hd" for higher quality
-            voice="alloy",  # Options: alloy, echo, fable, onyx, nova, shimmer
-            input=text,
-            speed=1.0
-        )
-        
-        response.stream_to_file(str(output_path))
+        with metrics.timed('provider_call', 'openai'):
+            response = self.client.audio.speech.create(
+                model="tts-1",  # Use "tts-1-hd" for higher quality
+                voice="alloy",  # Options: alloy, echo, fable, onyx, nova, shimmer
+                input=text,
+                speed=1.0
+            )
+            
+            response.stream_to_file(str(output_path))
+            metrics.count('bytes', output_path.stat().st_size)
         
         print(f"✅ Voiceover generated: {output_path}")
         return str(output_path)
@@ -66,7 +78,8 @@ class TTSGenerator:
         """Generate using ElevenLabs"""
         VOICE_ID = "21m00Tcm4TlvDq8ikWAM"  # Default voice (Rachel)
         
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{VOICE_ID}"
+        base_url = self.settings.ELEVENLABS_API_ENDPOINT or "https://api.elevenlabs.io/v1"
+        url = f"{base_url.rstrip('/')}/text-to-speech/{VOICE_ID}"
         
         headers = {
             "Accept": "audio/mpeg",
@@ -83,8 +96,10 @@ class TTSGenerator:
             }
         }
         
-        response = requests.post(url, json=data, headers=headers)
-        response.raise_for_status()
+        with metrics.timed('provider_call', 'elevenlabs'):
+            response = retry.request('POST', url, self.settings, json=data, headers=headers)
+            response.raise_for_status()
+            metrics.count('bytes', len(response.content))
         
         with open(output_path, 'wb') as f:
             f.write(response.content)
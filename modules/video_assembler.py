@@ -5,18 +5,28 @@ Combines video, audio, and captions using FFmpeg
 import subprocess
 from pathlib import Path
 from config import config
+import cancellation
+import metrics
+import tracing
 
 class VideoAssembler:
     """Assemble final video from components"""
     
-    def __init__(self):
-        """Initialize video assembler"""
+    def __init__(self, settings=None):
+        """
+        Initialize video assembler
+        
+        Args:
+            settings: Settings snapshot (optional, defaults to global config)
+        """
+        self.settings = settings or config
         self._check_ffmpeg()
     
     def _check_ffmpeg(self):
         """Check if FFmpeg is installed"""
         try:
-            subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
+            with tracing.span('ffmpeg.version'):
+                subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
         except (subprocess.CalledProcessError, FileNotFoundError):
             raise RuntimeError(
                 "FFmpeg not found! Please install FFmpeg:\n"
@@ -43,7 +53,7 @@ class VideoAssembler:
         audio_path = Path(audio_path)
         
         if output_path is None:
-            output_path = config.OUTPUT_DIR / "final_video.mp4"
+            output_path = self.settings.OUTPUT_DIR / "final_video.mp4"
         else:
             output_path = Path(output_path)
         
@@ -72,8 +82,12 @@ class VideoAssembler:
         # Output settings
         cmd.extend([
             '-c:v', 'libx264',  # Video codec
-            '-preset', 'medium',  # Encoding speed/quality tradeoff
-            '-crf', '23',  # Quality (lower = better, 18-28 typical)
+            '-preset', self.settings.FFMPEG_PRESET,  # Encoding speed/quality tradeoff
+            '-crf', str(self.settings.FFMPEG_CRF),  # Quality (lower = better, 18-28 typical)
+        ])
+        if self.settings.FFMPEG_THREADS:
+            cmd.extend(['-threads', str(self.settings.FFMPEG_THREADS)])
+        cmd.extend([
             '-c:a', 'aac',  # Audio codec
             '-b:a', '192k',  # Audio bitrate
             '-ar', '44100',  # Audio sample rate
@@ -85,7 +99,8 @@ class VideoAssembler:
         
         try:
             print("   🔧 Running FFmpeg...")
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            with metrics.timed('encode', 'ffmpeg'):
+                result = cancellation.run(cmd)
             
             print(f"✅ Final video assembled: {output_path}")
             print(f"   Size: {output_path.stat().st_size / (1024*1024):.2f} MB")
@@ -95,6 +110,10 @@ class VideoAssembler:
         except subprocess.CalledProcessError as e:
             print(f"❌ FFmpeg error: {e.stderr}")
             raise
+        except cancellation.Cancelled:
+            print("   ⏹️ FFmpeg stopped: job cancelled")
+            output_path.unlink(missing_ok=True)
+            raise
 
 if __name__ == "__main__":
     # Test the video assembler
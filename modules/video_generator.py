@@ -6,20 +6,40 @@ import requests
 import time
 from pathlib import Path
 from config import config
+import cancellation
+import metrics
+import retry
+import tracing
+
+# Download chunk size; cancellation is checked between chunks
+DOWNLOAD_CHUNK = 1024 * 1024
+# Seconds to connect to the download host
+DOWNLOAD_CONNECT_TIMEOUT = 10
+# Seconds without data (across reconnects) before a download is abandoned
+DOWNLOAD_STALL_LIMIT = 120
 
 class VideoGenerator:
     """Generate video from text prompts"""
     
-    def __init__(self):
-        """Initialize video generator based on config"""
-        self.service = config.VIDEO_SERVICE
+    def __init__(self, settings=None):
+        """
+        Initialize video generator
+        
+        Args:
+            settings: Settings snapshot (optional, defaults to global config)
+        """
+        self.settings = settings or config
+        self.service = self.settings.VIDEO_SERVICE
         
         if self.service == 'luma':
-            self.api_key = config.LUMA_API_KEY
+            self.api_key = self.settings.LUMA_API_KEY
             self.base_url = "https://api.piapi.ai/api/luma"  # Third-party API endpoint
         elif self.service == 'runway':
-            self.api_key = config.RUNWAY_API_KEY
+            self.api_key = self.settings.RUNWAY_API_KEY
             self.base_url = "https://api.runwayml.com/v1"
+        
+        if self.settings.VIDEO_API_ENDPOINT:
+            self.base_url = self.settings.VIDEO_API_ENDPOINT.rstrip('/')
     
     def generate(self, prompt: str, duration: int = 5, output_path: str = None) -> str:
         """
@@ -34,7 +54,7 @@ class VideoGenerator:
             Path to the generated video file
         """
         if output_path is None:
-            output_path = config.TEMP_DIR / "generated_video.mp4"
+            output_path = self.settings.TEMP_DIR / "generated_video.mp4"
         else:
             output_path = Path(output_path)
         
@@ -68,27 +88,30 @@ class VideoGenerator:
         }
         
         print("   📤 Submitting video generation request...")
-        response = requests.post(
-            f"{self.base_url}/generations",
-            headers=headers,
-            json=data
-        )
-        response.raise_for_status()
+        with metrics.timed('provider_call', 'luma'):
+            response = retry.request(
+                'POST', f"{self.base_url}/generations", self.settings,
+                headers=headers,
+                json=data
+            )
+            response.raise_for_status()
         
         task_id = response.json()['id']
         print(f"   ⏳ Task ID: {task_id}")
         print("   ⏳ Waiting for video generation (this may take 2-5 minutes)...")
         
         # Step 2: Poll for completion
-        max_attempts = 60  # 10 minutes max
+        max_attempts = int(600 / self.settings.VIDEO_POLL_INTERVAL)  # 10 minutes max
+        polling_since = time.monotonic()
         for attempt in range(max_attempts):
-            time.sleep(10)  # Check every 10 seconds
+            cancellation.sleep(self.settings.VIDEO_POLL_INTERVAL)
             
-            status_response = requests.get(
-                f"{self.base_url}/generations/{task_id}",
-                headers=headers
-            )
-            status_response.raise_for_status()
+            with tracing.span('luma.poll', attempt=attempt + 1):
+                status_response = retry.request(
+                    'GET', f"{self.base_url}/generations/{task_id}", self.settings,
+                    headers=headers
+                )
+                status_response.raise_for_status()
             
             result = status_response.json()
             state = result.get('state')
@@ -96,15 +119,11 @@ class VideoGenerator:
             print(f"   ⏳ Status: {state} ({attempt + 1}/{max_attempts})")
             
             if state == 'completed':
+                metrics.observe('poll_wait', time.monotonic() - polling_since, self.service)
                 video_url = result['video']['url']
                 
                 # Step 3: Download video
-                print("   📥 Downloading video...")
-                video_data = requests.get(video_url)
-                video_data.raise_for_status()
-                
-                with open(output_path, 'wb') as f:
-                    f.write(video_data.content)
+                self._download(video_url, output_path)
                 
                 print(f"✅ Video generated: {output_path}")
                 return str(output_path)
@@ -130,27 +149,30 @@ class VideoGenerator:
         }
         
         print("   📤 Submitting video generation request...")
-        response = requests.post(
-            f"{self.base_url}/video/generate",
-            headers=headers,
-            json=data
-        )
-        response.raise_for_status()
+        with metrics.timed('provider_call', 'runway'):
+            response = retry.request(
+                'POST', f"{self.base_url}/video/generate", self.settings,
+                headers=headers,
+                json=data
+            )
+            response.raise_for_status()
         
         task_id = response.json()['id']
         print(f"   ⏳ Task ID: {task_id}")
         print("   ⏳ Waiting for video generation...")
         
         # Poll for completion
-        max_attempts = 60
+        max_attempts = int(600 / self.settings.VIDEO_POLL_INTERVAL)
+        polling_since = time.monotonic()
         for attempt in range(max_attempts):
-            time.sleep(10)
+            cancellation.sleep(self.settings.VIDEO_POLL_INTERVAL)
             
-            status_response = requests.get(
-                f"{self.base_url}/tasks/{task_id}",
-                headers=headers
-            )
-            status_response.raise_for_status()
+            with tracing.span('runway.poll', attempt=attempt + 1):
+                status_response = retry.request(
+                    'GET', f"{self.base_url}/tasks/{task_id}", self.settings,
+                    headers=headers
+                )
+                status_response.raise_for_status()
             
             result = status_response.json()
             status = result.get('status')
@@ -158,15 +180,11 @@ class VideoGenerator:
             print(f"   ⏳ Status: {status} ({attempt + 1}/{max_attempts})")
             
             if status == 'SUCCEEDED':
+                metrics.observe('poll_wait', time.monotonic() - polling_since, self.service)
                 video_url = result['output'][0]
                 
                 # Download video
-                print("   📥 Downloading video...")
-                video_data = requests.get(video_url)
-                video_data.raise_for_status()
-                
-                with open(output_path, 'wb') as f:
-                    f.write(video_data.content)
+                self._download(video_url, output_path)
                 
                 print(f"✅ Video generated: {output_path}")
                 return str(output_path)
@@ -175,6 +193,50 @@ class VideoGenerator:
                 raise Exception(f"Video generation failed: {result.get('failure')}")
         
         raise TimeoutError("Video generation timed out")
+    
+    def _download(self, url: str, output_path: Path):
+        """
+        Stream a finished video to disk; a partial file is removed on failure
+        
+        Reads time out after JOB_CANCEL_POLL_INTERVAL, so a stalled
+        connection still notices a cancellation; the download then
+        resumes with a Range request, up to DOWNLOAD_STALL_LIMIT seconds
+        without data.
+        """
+        print("   📥 Downloading video...")
+        timeout = (DOWNLOAD_CONNECT_TIMEOUT, config.JOB_CANCEL_POLL_INTERVAL or 1)
+        written = 0
+        stalled_since = None
+        try:
+            with metrics.timed('download', self.service), open(output_path, 'wb') as f:
+                while True:
+                    headers = {'Range': f'bytes={written}-'} if written else {}
+                    try:
+                        with requests.get(url, stream=True, headers=headers, timeout=timeout) as response:
+                            response.raise_for_status()
+                            if written and response.status_code != 206:
+                                # Range not supported; start over
+                                f.seek(0)
+                                f.truncate()
+                                written = 0
+                            for chunk in response.iter_content(DOWNLOAD_CHUNK):
+                                cancellation.check()
+                                f.write(chunk)
+                                written += len(chunk)
+                                metrics.count('bytes', len(chunk))
+                                stalled_since = None
+                        return
+                    except (requests.ConnectionError, requests.Timeout) as e:
+                        # Read timeouts mid-body surface as ConnectionError
+                        cancellation.check()
+                        stalled_since = stalled_since or time.monotonic()
+                        if time.monotonic() - stalled_since > DOWNLOAD_STALL_LIMIT:
+                            raise TimeoutError(f"Video download stalled: {e}") from e
+                        print(f"   ⏳ Download interrupted at {written} bytes ({type(e).__name__}); resuming")
+                        cancellation.sleep(0.2)
+        except BaseException:
+            output_path.unlink(missing_ok=True)
+            raise
 
 if __name__ == "__main__":
     # Test the video generator
@@ -2,6 +2,7 @@
 YouTube Uploader Module
 Uploads videos to YouTube using YouTube Data API v3
 """
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
@@ -10,17 +11,27 @@ from googleapiclient.http import MediaFileUpload
 import pickle
 from pathlib import Path
 from config import config
+import cassette
+import metrics
+import tracing
 
 class YouTubeUploader:
     """Upload videos to YouTube"""
     
     SCOPES = ['https://www.googleapis.com/auth/youtube.upload']
     
-    def __init__(self):
-        """Initialize YouTube uploader"""
+    def __init__(self, settings=None):
+        """
+        Initialize YouTube uploader
+        
+        Args:
+            settings: Settings snapshot (optional, defaults to global config)
+        """
+        self.settings = settings or config
         self.credentials = None
         self.youtube = None
-        self._authenticate()
+        with tracing.span('youtube.auth'):
+            self._authenticate()
     
     def _authenticate(self):
         """Authenticate with YouTube API"""
@@ -31,6 +42,9 @@ class YouTubeUploader:
         if token_file.exists():
             with open(token_file, 'rb') as token:
                 self.credentials = pickle.load(token)
+        elif cassette.replaying():
+            # Replayed uploads never reach YouTube, so no account is needed
+            self.credentials = AnonymousCredentials()
         
         # Refresh or get new credentials
         if not self.credentials or not self.credentials.valid:
@@ -64,8 +78,8 @@ class YouTubeUploader:
         
         client_secrets = {
             "installed": {
-                "client_id": config.YOUTUBE_CLIENT_ID,
-                "client_secret": config.YOUTUBE_CLIENT_SECRET,
+                "client_id": self.settings.YOUTUBE_CLIENT_ID,
+                "client_secret": self.settings.YOUTUBE_CLIENT_SECRET,
                 "auth_uri": "https://accounts.google.com/o/oauth2/auth",
                 "token_uri": "https://oauth2.googleapis.com/token",
                 "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
@@ -132,12 +146,14 @@ class YouTubeUploader:
             )
             
             print("   ⏳ Uploading...")
-            response = None
-            while response is None:
-                status, response = request.next_chunk()
-                if status:
-                    progress = int(status.progress() * 100)
-                    print(f"   📊 Upload progress: {progress}%")
+            with metrics.timed('provider_call', 'youtube'):
+                response = None
+                while response is None:
+                    status, response = request.next_chunk()
+                    if status:
+                        progress = int(status.progress() * 100)
+                        print(f"   📊 Upload progress: {progress}%")
+                metrics.count('bytes', video_path.stat().st_size)
             
             video_id = response['id']
             video_url = f"https://www.youtube.com/watch?v={video_id}"
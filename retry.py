@@ -0,0 +1,40 @@
+"""
+Provider request retries
+Retries transient HTTP failures, counting each retry in the job's metrics
+"""
+import requests
+import cancellation
+import metrics
+
+# Responses worth another attempt: rate limited or a passing server fault
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def request(method, url, settings, **kwargs):
+    """
+    requests.request with retries
+    
+    Connection errors, timeouts and RETRY_STATUSES responses are retried
+    up to settings.MAX_RETRIES times, RETRY_DELAY seconds apart (doubled
+    after each retry). Every retry is counted on the current metrics
+    record. The final response is returned as is, so callers still
+    raise_for_status().
+    """
+    for attempt in range(settings.MAX_RETRIES + 1):
+        last = attempt == settings.MAX_RETRIES
+        try:
+            response = requests.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if last:
+                raise
+            reason = type(e).__name__
+        else:
+            if last or response.status_code not in RETRY_STATUSES:
+                return response
+            reason = f"HTTP {response.status_code}"
+            response.close()
+        
+        metrics.count('retries')
+        delay = settings.RETRY_DELAY * 2 ** attempt
+        print(f"   🔁 {reason} from {method} {url}, retrying in {delay}s "
+              f"({attempt + 1}/{settings.MAX_RETRIES})")
+        cancellation.sleep(delay)
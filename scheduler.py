@@ -0,0 +1,394 @@
+"""
+Schedule executor
+Fires rows from the schedules table at their next_run time
+"""
+import heapq
+import threading
+import time as _time
+from datetime import datetime, timedelta
+from pathlib import Path
+import artifacts
+from config import config
+from database import db
+
+# next_run / last_run are stored as local-time strings in this format
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+# Pipeline stages run before a video can be published
+RENDER_STAGES = ('content', 'tts', 'video', 'captions', 'assemble')
+
+# Pre-render outcomes that leave nothing to publish; the slot renders afresh
+UNUSABLE_PRERENDER = ('failed', 'cancelled')
+
+def format_time(dt):
+    """Format a datetime the way schedules store it"""
+    return dt.strftime(TIME_FORMAT)
+
+def parse_time(value):
+    """Parse a stored schedule timestamp (None if empty)"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.strptime(str(value)[:19], TIME_FORMAT)
+
+def _parse_days(days):
+    """Parse 'mon,wed' / '0,2' / ['mon', 'wed'] into weekday numbers"""
+    if not days:
+        return {0}
+    if isinstance(days, str):
+        days = days.split(',')
+    
+    result = set()
+    for day in days:
+        day = str(day).strip().lower()
+        if day.isdigit():
+            result.add(int(day) % 7)
+        elif day[:3] in WEEKDAYS:
+            result.add(WEEKDAYS.index(day[:3]))
+        else:
+            raise ValueError(f"Unknown day: {day}")
+    return result
+
+def compute_next_run(frequency, time=None, days=None, after=None):
+    """
+    Compute the first run strictly after `after`
+    
+    Args:
+        frequency: 'hourly', 'daily' or 'weekly'
+        time: 'HH:MM' (hourly schedules only use the minutes)
+        days: Weekdays for weekly schedules, e.g. 'mon,thu'
+        after: Reference time (default now)
+    
+    Returns:
+        datetime of the next run
+    """
+    after = (after or datetime.now()).replace(microsecond=0)
+    hour, minute = (int(part) for part in (time or '00:00').split(':')[:2])
+    
+    if frequency == 'hourly':
+        candidate = after.replace(minute=minute, second=0)
+        if candidate <= after:
+            candidate += timedelta(hours=1)
+        return candidate
+    
+    if frequency == 'daily':
+        candidate = after.replace(hour=hour, minute=minute, second=0)
+        if candidate <= after:
+            candidate += timedelta(days=1)
+        return candidate
+    
+    if frequency == 'weekly':
+        weekdays = _parse_days(days)
+        for offset in range(8):
+            candidate = (after + timedelta(days=offset)).replace(hour=hour, minute=minute, second=0)
+            if candidate.weekday() in weekdays and candidate > after:
+                return candidate
+    
+    raise ValueError(f"Unknown frequency: {frequency}")
+
+def load_script(script_source):
+    """
+    Read a schedule's script: a text file in SCRIPTS_DIR, or the script itself
+    
+    script_source comes from the API, so only files that resolve (after
+    symlinks) inside SCRIPTS_DIR are read; a path to any other existing
+    file is refused rather than stored and sent to the providers.
+    """
+    if not script_source:
+        raise ValueError("Schedule has no script_source")
+    
+    root = Path(config.SCRIPTS_DIR).resolve()
+    path = Path(script_source)
+    for candidate in ([path] if path.is_absolute() else [root / path, path]):
+        try:
+            resolved = candidate.resolve()
+            if not resolved.is_file():
+                continue
+        except (OSError, RuntimeError):
+            continue
+        if root not in resolved.parents:
+            raise ValueError(f"Script file is outside {config.SCRIPTS_DIR}: {script_source}")
+        return resolved.read_text(encoding='utf-8').strip()
+    return script_source.strip()
+
+class Scheduler:
+    """
+    Runs schedules from a min-heap of due times
+    
+    The thread sleeps until the earliest next_run instead of scanning the
+    table. Edits made through this process call wake(); edits from other
+    processes are noticed through the schedules version stamp, checked
+    every RESYNC_INTERVAL seconds.
+    
+    With PRERENDER_ENABLED, each slot has two heap entries: a 'prerender'
+    one, lead_time() ahead, that queues the render, and a 'publish' one
+    at next_run that only queues the upload of the finished video.
+    """
+    
+    RESYNC_INTERVAL = 30  # seconds
+    ERROR_RETRY_INTERVAL = 5  # seconds
+    
+    def __init__(self, on_fire=None):
+        """
+        Initialize scheduler
+        
+        Args:
+            on_fire: Called as on_fire(schedule, video_id, job_id) after a job is queued
+        """
+        self.on_fire = on_fire
+        self.running = False
+        self.thread = None
+        self._heap = []  # (fire_at, schedule_id, 'prerender' | 'publish', next_run)
+        self._due = {}  # schedule_id -> next_run currently in the heap
+        self._lead = None
+        self._version = None
+        self._cond = threading.Condition()
+        self._dirty = True
+    
+    def start(self):
+        """Start the scheduler thread"""
+        if self.running:
+            return
+        
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        print("[OK] Scheduler started")
+    
+    def stop(self):
+        """Stop the scheduler thread"""
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+        if self.thread:
+            self.thread.join(timeout=5)
+    
+    def wake(self):
+        """Reload timers now (call after creating or editing a schedule)"""
+        with self._cond:
+            self._dirty = True
+            self._cond.notify()
+    
+    def lead_time(self):
+        """
+        Seconds to start rendering ahead of a slot
+        
+        The mean duration of recent runs of each render stage, times
+        PRERENDER_MARGIN; PRERENDER_DEFAULT_LEAD until every stage has
+        been timed at least once.
+        """
+        estimates = db.get_stage_estimates(RENDER_STAGES)
+        if all(stage in estimates for stage in RENDER_STAGES):
+            lead = sum(estimates[stage] for stage in RENDER_STAGES) * config.PRERENDER_MARGIN
+        else:
+            lead = config.PRERENDER_DEFAULT_LEAD
+        return max(lead, config.PRERENDER_MIN_LEAD)
+    
+    def discard_prerenders(self, schedule_id=None):
+        """
+        Delete pre-renders whose slot will never publish them
+        
+        Args:
+            schedule_id: Discard all unpublished pre-renders of this
+                schedule (after an edit) instead of only the stale ones
+        """
+        for video_id in db.get_stale_prerenders(schedule_id):
+            if db.discard_prerender(video_id):
+                artifacts.get_store().delete(artifacts.video_owner(video_id))
+                print(f"[SCHEDULER] Discarded stale pre-render (video {video_id})")
+    
+    def _entries(self, schedule_id, next_run, lead, prerendered=False):
+        """Heap entries for one slot, its pre-render `lead` seconds ahead"""
+        entries = [(next_run, schedule_id, 'publish', next_run)]
+        # An overdue slot just runs the whole pipeline when it fires
+        if config.PRERENDER_ENABLED and not prerendered and parse_time(next_run) > datetime.now():
+            start = parse_time(next_run) - timedelta(seconds=lead)
+            entries.append((format_time(start), schedule_id, 'prerender', next_run))
+        return entries
+    
+    def _reload(self):
+        """Rebuild the heap from active schedules (the lock is only held to swap it in)"""
+        version = db.get_table_versions().get('schedules')
+        now = datetime.now()
+        
+        self.discard_prerenders()
+        lead = self.lead_time()
+        prerendered = db.get_prerendered_slots()
+        
+        heap = []
+        due = {}
+        for schedule_id, next_run in db.get_schedule_timers():
+            if next_run is None:
+                # New schedule without a precomputed time
+                schedule = db.get_schedule(schedule_id)
+                try:
+                    next_run = format_time(compute_next_run(
+                        schedule['frequency'], schedule['time'], schedule['days'], after=now
+                    ))
+                except ValueError as e:
+                    print(f"[SCHEDULER] Schedule {schedule_id} is invalid: {e}")
+                    continue
+                if not db.set_schedule_next_run(schedule_id, next_run, expected=None):
+                    next_run = db.get_schedule(schedule_id)['next_run']
+            next_run = str(next_run)
+            heap.extend(self._entries(schedule_id, next_run, lead, (schedule_id, next_run) in prerendered))
+            due[schedule_id] = next_run
+        
+        heapq.heapify(heap)
+        with self._cond:
+            self._heap = heap
+            self._due = due
+            self._lead = lead
+            self._version = version
+    
+    def _run(self):
+        """
+        Scheduler loop
+        
+        Database work happens outside the lock, so wake() and
+        _reschedule() never wait on SQLite. An error (e.g. a locked
+        database) is logged and the heap rebuilt after ERROR_RETRY_INTERVAL.
+        """
+        last_sync = 0.0
+        
+        while self.running:
+            try:
+                if not self._dirty and _time.monotonic() - last_sync >= self.RESYNC_INTERVAL:
+                    last_sync = _time.monotonic()
+                    if db.get_table_versions().get('schedules') != self._version:
+                        self._dirty = True
+                
+                if self._dirty:
+                    self._dirty = False
+                    last_sync = _time.monotonic()
+                    self._reload()
+                
+                with self._cond:
+                    if not self.running:
+                        break
+                    if self._dirty:
+                        continue  # woken during the reload
+                    
+                    # Drop entries superseded by a later reschedule
+                    while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][3]:
+                        heapq.heappop(self._heap)
+                    
+                    now = datetime.now()
+                    if self._heap and parse_time(self._heap[0][0]) <= now:
+                        _, schedule_id, kind, due = heapq.heappop(self._heap)
+                    else:
+                        wait = self.RESYNC_INTERVAL - (_time.monotonic() - last_sync)
+                        if self._heap:
+                            until_due = (parse_time(self._heap[0][0]) - now).total_seconds()
+                            wait = min(wait, until_due)
+                        self._cond.wait(timeout=max(wait, 0.01))
+                        continue
+                
+                if kind == 'prerender':
+                    self._prerender(schedule_id, due)
+                else:
+                    self._fire(schedule_id, due)
+            except Exception as e:
+                print(f"[SCHEDULER] Error: {e}; retrying in {self.ERROR_RETRY_INTERVAL}s")
+                with self._cond:
+                    self._dirty = True
+                    if self.running:
+                        self._cond.wait(timeout=self.ERROR_RETRY_INTERVAL)
+    
+    def _reschedule(self, schedule_id, old, new):
+        """Replace a schedule's heap entry unless a reload already did"""
+        lead = self.lead_time() if new is not None else None
+        with self._cond:
+            if self._due.get(schedule_id) != old:
+                return
+            if new is None:
+                del self._due[schedule_id]
+                return
+            self._due[schedule_id] = str(new)
+            self._lead = lead
+            for entry in self._entries(schedule_id, str(new), lead):
+                heapq.heappush(self._heap, entry)
+    
+    def _prerender(self, schedule_id, due):
+        """Queue the render for an upcoming slot"""
+        schedule = db.get_schedule(schedule_id)
+        if not schedule or not schedule['active'] or schedule['next_run'] != due:
+            return  # the publish entry resyncs it
+        
+        try:
+            script = load_script(schedule['script_source'])
+        except Exception as e:
+            print(f"[SCHEDULER] Schedule {schedule_id} pre-render skipped: {e}")
+            return
+        
+        claimed = db.claim_prerender(schedule_id, due, script, title=schedule['name'])
+        if claimed:
+            video_id, job_id = claimed
+            print(f"[SCHEDULER] Schedule {schedule_id} pre-rendering for {due} (job {job_id})")
+            if self.on_fire:
+                self.on_fire(schedule, video_id, job_id)
+    
+    def _fire(self, schedule_id, due):
+        """Queue one run of a schedule and push its next due time"""
+        schedule = db.get_schedule(schedule_id)
+        if not schedule or not schedule['active']:
+            with self._cond:
+                self._due.pop(schedule_id, None)
+            return
+        
+        if schedule['next_run'] != due:
+            # Moved since the heap was built; follow the stored time
+            self._reschedule(schedule_id, due, schedule['next_run'])
+            return
+        
+        # After downtime, fire the missed run once and resume from now
+        try:
+            next_run = format_time(compute_next_run(
+                schedule['frequency'], schedule['time'], schedule['days'],
+                after=max(datetime.now(), parse_time(due))
+            ))
+        except ValueError as e:
+            # Left out of the heap until it is edited
+            print(f"[SCHEDULER] Schedule {schedule_id} is invalid: {e}")
+            self._reschedule(schedule_id, due, None)
+            return
+        
+        prerender = db.get_prerender(schedule_id, due)
+        if prerender and (prerender['status'] in UNUSABLE_PRERENDER or
+                          prerender['status'] == 'completed' and not prerender['video_path']):
+            # Nothing to publish (or its file was evicted); render afresh
+            prerender = None
+        if prerender:
+            # Rendered (or rendering) ahead of time; only the upload is left
+            claimed = db.claim_schedule_run(
+                schedule_id, due, next_run,
+                prerendered_video_id=prerender['id']
+            )
+        else:
+            try:
+                script = load_script(schedule['script_source'])
+            except Exception as e:
+                print(f"[SCHEDULER] Schedule {schedule_id} skipped: {e}")
+                script = None
+            
+            claimed = db.claim_schedule_run(
+                schedule_id, due, next_run,
+                script=script,
+                title=schedule['name']
+            )
+        
+        if claimed is None:
+            # Another scheduler fired this run; follow what it stored
+            current = db.get_schedule(schedule_id)
+            next_run = current['next_run'] if current and current['active'] else None
+        
+        self._reschedule(schedule_id, due, next_run)
+        
+        if claimed and claimed[1]:
+            video_id, job_id = claimed
+            print(f"[SCHEDULER] Schedule {schedule_id} queued job {job_id} (video {video_id})")
+            if self.on_fire:
+                self.on_fire(schedule, video_id, job_id)
@@ -0,0 +1,37 @@
+"""
+Shared pytest fixtures
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def pytest_sessionstart(session):
+    """Run from a scratch directory
+
+    database.py creates a global instance (and data/.secret_key) relative
+    to the working directory on import, so keep test runs out of the repo.
+    """
+    os.chdir(tempfile.mkdtemp(prefix='shorts-tests-'))
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Fresh database in a temporary directory"""
+    from database import Database
+    return Database(tmp_path / 'test.db')
+
+
+@pytest.fixture
+def client():
+    """Flask test client backed by the global database"""
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app.test_client()
@@ -0,0 +1,225 @@
+"""
+HTTP API tests
+"""
+from database import db
+
+
+def test_list_etag_round_trip(client):
+    video_id = db.create_video('script')
+    
+    first = client.get('/api/videos?fields=title')
+    etag = first.headers['ETag']
+    assert first.status_code == 200
+    
+    again = client.get('/api/videos?fields=title', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.get_data() == b''
+    
+    db.update_video(video_id, title='Changed')
+    changed = client.get('/api/videos?fields=title', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_jobs_etag_tracks_video_changes(client):
+    video_id = db.create_video('script')
+    db.create_job(video_id)
+    etag = client.get('/api/jobs').headers['ETag']
+    
+    db.update_video(video_id, title='New title')
+    response = client.get('/api/jobs', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+
+
+def test_stats_not_modified(client):
+    etag = client.get('/api/stats').headers['ETag']
+    response = client.get('/api/stats', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+def test_stream_supports_ranges_and_validators(client, tmp_path):
+    video_file = tmp_path / 'final_video.mp4'
+    video_file.write_bytes(bytes(range(256)) * 4)
+    video_id = db.create_video('script', title='Clip')
+    db.update_video(video_id, video_path=str(video_file), status='completed')
+    
+    full = client.get(f'/api/videos/{video_id}/stream')
+    assert full.status_code == 200
+    assert full.headers['Accept-Ranges'] == 'bytes'
+    assert 'inline' in full.headers['Content-Disposition']
+    assert full.headers['Last-Modified']
+    etag = full.headers['ETag']
+    assert not etag.startswith('W/')
+    
+    partial = client.get(f'/api/videos/{video_id}/stream', headers={'Range': 'bytes=10-19'})
+    assert partial.status_code == 206
+    assert partial.headers['Content-Range'] == 'bytes 10-19/1024'
+    assert partial.get_data() == bytes(range(10, 20))
+    
+    cached = client.get(f'/api/videos/{video_id}/stream', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    
+    download = client.get(f'/api/videos/{video_id}/download')
+    assert 'attachment' in download.headers['Content-Disposition']
+
+
+def test_stream_accel_redirect(client, tmp_path, monkeypatch):
+    from config import config
+    output_dir = tmp_path / 'output'
+    video_file = output_dir / 'video_1' / 'final_video.mp4'
+    video_file.parent.mkdir(parents=True)
+    video_file.write_bytes(b'data')
+    video_id = db.create_video('script', title='Clip')
+    db.update_video(video_id, video_path=str(video_file), status='completed')
+    
+    monkeypatch.setattr(config, 'OUTPUT_DIR', output_dir)
+    monkeypatch.setattr(config, 'ACCEL_REDIRECT_PREFIX', '/protected-videos/')
+    
+    response = client.get(f'/api/videos/{video_id}/stream')
+    assert response.headers['X-Accel-Redirect'] == '/protected-videos/video_1/final_video.mp4'
+    assert response.get_data() == b''
+
+
+def test_download_redirects_to_presigned_url(client, monkeypatch):
+    import app
+    
+    class FakeStore:
+        def presigned_url(self, location, disposition=None):
+            return f"https://s3.example.com/{location[5:]}?signed"
+    
+    monkeypatch.setattr(app, 'get_store', lambda: FakeStore())
+    video_id = db.create_video('script', title='Clip')
+    db.update_video(video_id, video_path='s3://shorts/video_1/final_video.mp4', status='completed')
+    
+    response = client.get(f'/api/videos/{video_id}/download')
+    assert response.status_code == 302
+    assert response.headers['Location'] == 'https://s3.example.com/shorts/video_1/final_video.mp4?signed'
+
+
+def test_metrics_endpoint(client):
+    db.create_job(db.create_video('script'))
+    
+    response = client.get('/api/metrics')
+    text = response.get_data(as_text=True)
+    
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert '# TYPE shorts_stage_duration_seconds histogram' in text
+    assert 'shorts_queue_depth{priority="normal"}' in text
+    assert 'shorts_workers_busy ' in text
+
+
+def test_app_factory_starts_no_workers():
+    from app import create_app
+    from job_queue import job_queue
+    
+    create_app()
+    assert not job_queue.running
+    assert not job_queue.scheduler.running
+
+
+def test_health_reports_separate_worker(client):
+    assert client.get('/api/health').get_json()['queue_running'] is False
+    
+    db.beat_worker('worker-1', 2)
+    assert client.get('/api/health').get_json()['queue_running'] is True
+
+
+def test_cancel_job(client):
+    job_id = db.create_job(db.create_video('script'))
+    
+    response = client.post(f'/api/jobs/{job_id}/cancel')
+    assert response.get_json()['status'] == 'cancelled'
+    assert client.post(f'/api/jobs/{job_id}/cancel').status_code == 409
+    assert client.post('/api/jobs/999999/cancel').status_code == 404
+
+
+def test_create_video_is_idempotent(client):
+    body = {'script': 'Honey never spoils', 'title': 'Honey'}
+    headers = {'Idempotency-Key': 'create-honey-1'}
+    
+    first = client.post('/api/videos/create', json=body, headers=headers).get_json()
+    again = client.post('/api/videos/create', json=body, headers=headers).get_json()
+    
+    assert not first['duplicate']
+    assert again['duplicate']
+    assert (again['video_id'], again['job_id']) == (first['video_id'], first['job_id'])
+    
+    changed = client.post('/api/videos/create', json={'script': 'Other'}, headers=headers)
+    assert changed.status_code == 422
+    
+    # A retry after a render setting changed is still the same request
+    db.save_api_key('video_service', 'runway')
+    retried = client.post('/api/videos/create', json=body, headers=headers)
+    assert retried.status_code == 200
+    assert retried.get_json()['video_id'] == first['video_id']
+    assert client.post('/api/videos/create', json={**body, 'priority': 'high'}, headers=headers).status_code == 422
+    
+    # Same content under another key only matches when deduplicating
+    assert not client.post('/api/videos/create', json=body).get_json()['duplicate']
+    deduped = client.post('/api/videos/create', json={**body, 'dedupe': True}).get_json()
+    assert deduped['duplicate']
+
+
+def test_create_video_rejects_unhashable_priority(client):
+    for priority in (['high'], {'level': 'high'}):
+        response = client.post('/api/videos/create', json={'script': 'Honey', 'priority': priority})
+        assert response.status_code == 400
+        assert 'Priority must be one of' in response.get_json()['error']
+
+
+def test_create_videos_batch(client):
+    response = client.post('/api/videos/batch?priority=low', json=[
+        'Fact one',
+        {'script': 'Fact two', 'title': 'Two', 'priority': 'high', 'idempotency_key': 'batch-two'},
+        {'script': 'Fact two', 'title': 'Two', 'priority': 'high', 'idempotency_key': 'batch-two'},
+    ])
+    data = response.get_json()
+    videos = data['videos']
+    
+    assert response.status_code == 200
+    assert data['created'] == 2
+    assert [v['duplicate'] for v in videos] == [False, False, True]
+    assert videos[2]['video_id'] == videos[1]['video_id']
+    assert db.get_video(videos[1]['video_id'])['title'] == 'Two'
+    assert db.get_job(videos[0]['job_id'])['priority'] == 2
+    assert db.get_job(videos[1]['job_id'])['priority'] == 0
+
+
+def test_create_videos_batch_ndjson(client):
+    body = '{"script": "Line one"}\n\n{"script": "Line two", "title": "Second"}\n'
+    response = client.post('/api/videos/batch', data=body, content_type='application/x-ndjson')
+    videos = response.get_json()['videos']
+    
+    assert [db.get_video(v['video_id'])['script'] for v in videos] == ['Line one', 'Line two']
+    assert all(db.get_job(v['job_id'])['video_id'] == v['video_id'] for v in videos)
+
+
+def test_create_videos_batch_is_all_or_nothing(client):
+    before = db.get_status_counts('videos')
+    
+    response = client.post('/api/videos/batch', json=['Fine', {'title': 'No script'}, {'script': 'x', 'priority': 'urgent'},
+                                                       {'script': 'y', 'priority': ['high']}])
+    assert response.status_code == 400
+    assert [item['index'] for item in response.get_json()['items']] == [1, 2, 3]
+    
+    bad_line = client.post('/api/videos/batch', data='{"script": "ok"}\n{oops\n',
+                           content_type='application/x-ndjson')
+    assert bad_line.status_code == 400
+    assert db.get_status_counts('videos') == before
+
+
+def test_schedule_edit_keeps_prerenders_unless_render_changes(client):
+    schedule_id = client.post('/api/schedules/create', json={
+        'name': 'Daily', 'frequency': 'daily', 'time': '09:00', 'script_source': 'Honey never spoils'
+    }).get_json()['schedule_id']
+    slot = db.get_schedule(schedule_id)['next_run']
+    video_id, _ = db.claim_prerender(schedule_id, slot, 'Honey never spoils')
+    
+    for edit in ({'name': 'Morning'}, {'auto_upload': True}):
+        assert client.put(f'/api/schedules/{schedule_id}', json=edit).status_code == 200
+        assert db.get_video(video_id) is not None
+    assert db.get_schedule(schedule_id)['next_run'] == slot
+    
+    client.put(f'/api/schedules/{schedule_id}', json={'time': '10:00'})
+    assert db.get_video(video_id) is None
@@ -0,0 +1,159 @@
+"""
+Artifact store tests
+"""
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+import pytest
+
+import artifacts
+
+MB = 1024 * 1024
+
+
+class _S3Handler(BaseHTTPRequestHandler):
+    """Just enough of the S3 API (path-style) for boto3's transfers"""
+    protocol_version = 'HTTP/1.1'
+    
+    def _target(self):
+        url = urlsplit(self.path)
+        bucket, _, key = url.path.lstrip('/').partition('/')
+        return unquote(key), parse_qs(url.query, keep_blank_values=True)
+    
+    def _body(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.largest_body = max(self.server.largest_body, len(body))
+        return body
+    
+    def _reply(self, status=200, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+    
+    def do_PUT(self):
+        key, query = self._target()
+        body = self._body()
+        if 'uploadId' in query:
+            self.server.uploads[query['uploadId'][0]][int(query['partNumber'][0])] = body
+        else:
+            self.server.objects[key] = body
+        self._reply(headers={'ETag': f'"{uuid.uuid4().hex}"'})
+    
+    def do_POST(self):
+        key, query = self._target()
+        body = self._body()
+        if 'uploads' in query:
+            upload_id = uuid.uuid4().hex
+            self.server.uploads[upload_id] = {}
+            xml = (f"<InitiateMultipartUploadResult><Key>{escape(key)}</Key>"
+                   f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>")
+        elif 'uploadId' in query:
+            parts = self.server.uploads.pop(query['uploadId'][0])
+            self.server.objects[key] = b''.join(parts[n] for n in sorted(parts))
+            self.server.multipart += 1
+            xml = f"<CompleteMultipartUploadResult><Key>{escape(key)}</Key></CompleteMultipartUploadResult>"
+        else:  # ?delete
+            for name in re.findall(r'<Key>(.*?)</Key>', body.decode()):
+                self.server.objects.pop(name, None)
+            xml = "<DeleteResult></DeleteResult>"
+        self._reply(body=xml.encode(), headers={'Content-Type': 'application/xml'})
+    
+    def do_GET(self):
+        key, query = self._target()
+        if 'list-type' in query:
+            prefix = query.get('prefix', [''])[0]
+            keys = sorted(k for k in self.server.objects if k.startswith(prefix))
+            contents = ''.join(f"<Contents><Key>{escape(k)}</Key><Size>{len(self.server.objects[k])}</Size>"
+                               f"</Contents>" for k in keys)
+            xml = (f"<ListBucketResult><IsTruncated>false</IsTruncated><KeyCount>{len(keys)}</KeyCount>"
+                   f"{contents}</ListBucketResult>")
+            return self._reply(body=xml.encode(), headers={'Content-Type': 'application/xml'})
+        self._object(key)
+    
+    def do_HEAD(self):
+        self._object(self._target()[0])
+    
+    def _object(self, key):
+        data = self.server.objects.get(key)
+        if data is None:
+            return self._reply(404, b'<Error><Code>NoSuchKey</Code></Error>')
+        headers = {'ETag': '"object"', 'Last-Modified': 'Mon, 19 Oct 2026 00:00:00 GMT'}
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(data) - 1
+            self.server.ranges += 1
+            headers['Content-Range'] = f"bytes {start}-{end}/{len(data)}"
+            return self._reply(206, data[start:end + 1], headers)
+        self._reply(200, data, headers)
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    pytest.importorskip('boto3')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'test')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'test')
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _S3Handler)
+    httpd.objects, httpd.uploads = {}, {}
+    httpd.largest_body = httpd.multipart = httpd.ranges = 0
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_local_store_round_trip(tmp_path):
+    store = artifacts.LocalStore(tmp_path)
+    key = artifacts.artifact_key(artifacts.video_owner(7), 'captions')
+    
+    store.path(key).write_text('1\n00:00:00,000 --> 00:00:01,000\nHi\n')
+    location = store.save(key)
+    
+    assert location == str(tmp_path / 'video_7' / 'captions.srt')
+    assert store.load(key).read_text().endswith('Hi\n')
+    assert store.fetch(location) == tmp_path / 'video_7' / 'captions.srt'
+    
+    store.delete('video_7')
+    assert not (tmp_path / 'video_7').exists()
+    with pytest.raises(FileNotFoundError):
+        store.load(key)
+
+
+def test_s3_store_streams_multipart(s3, tmp_path):
+    store = artifacts.S3Store('shorts', prefix='renders/', endpoint_url=s3.url, region='us-east-1',
+                              cache_dir=tmp_path / 'node1', part_size=5 * MB)
+    owner = artifacts.video_owner(3)
+    key = artifacts.artifact_key(owner, 'assemble')
+    data = bytes(range(256)) * (12 * MB // 256)
+    store.path(key).write_bytes(data)
+    
+    location = store.save(key)
+    
+    assert location == 's3://shorts/renders/video_3/final_video.mp4'
+    assert s3.objects['renders/video_3/final_video.mp4'] == data
+    # Sent as parts, never as one request holding the whole file
+    assert s3.multipart == 1
+    assert s3.largest_body <= 5 * MB
+    
+    # Another node gets it through ranged GETs into its own cache
+    other = artifacts.S3Store('shorts', prefix='renders/', endpoint_url=s3.url, region='us-east-1',
+                              cache_dir=tmp_path / 'node2', part_size=5 * MB)
+    assert other.fetch(location).read_bytes() == data
+    assert s3.ranges >= 3
+    assert list((tmp_path / 'node2' / owner).iterdir()) == [tmp_path / 'node2' / key]
+    
+    other.delete(owner)
+    assert not s3.objects
+    assert not (tmp_path / 'node2' / owner).exists()
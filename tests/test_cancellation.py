@@ -0,0 +1,48 @@
+"""
+Cancellation tests
+"""
+import sys
+import threading
+import time
+
+import pytest
+
+import cancellation
+
+
+def cancel_after(event, seconds):
+    threading.Timer(seconds, event.set).start()
+
+
+def test_sleep_ends_on_cancel():
+    event = threading.Event()
+    cancel_after(event, 0.1)
+    
+    started = time.monotonic()
+    with cancellation.scope(event), pytest.raises(cancellation.Cancelled):
+        cancellation.sleep(30)
+    assert time.monotonic() - started < 1
+
+
+def test_run_terminates_process_on_cancel():
+    event = threading.Event()
+    cancel_after(event, 0.2)
+    
+    started = time.monotonic()
+    with cancellation.scope(event), pytest.raises(cancellation.Cancelled):
+        cancellation.run([sys.executable, '-c', 'import time; time.sleep(30)'])
+    assert time.monotonic() - started < 1
+
+
+def test_run_matches_subprocess_run():
+    result = cancellation.run([sys.executable, '-c', 'print("out")'])
+    assert result.stdout == 'out\n'
+    
+    with pytest.raises(cancellation.subprocess.CalledProcessError):
+        cancellation.run([sys.executable, '-c', 'raise SystemExit(2)'])
+
+
+def test_outside_scope_never_cancelled():
+    assert not cancellation.requested()
+    cancellation.check()
+    cancellation.sleep(0)
@@ -0,0 +1,115 @@
+"""
+Cassette tests
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httplib2
+import httpx
+import pytest
+import requests
+
+import cassette
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.hits += 1
+        time.sleep(0.05)
+        body = json.dumps({'path': self.path, 'hit': self.server.hits}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.hits = 0
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def tape(tmp_path):
+    yield tmp_path / 'cassette.jsonl'
+    cassette.uninstall()
+
+
+def fetch_all(base):
+    """One request through each patched library"""
+    return [
+        requests.get(f"{base}/status?key=secret").json(),
+        httpx.get(f"{base}/openai").json(),
+        json.loads(httplib2.Http().request(f"{base}/youtube")[1])
+    ]
+
+
+def test_replay_matches_recording(server, tape):
+    cassette.install(tape, 'record')
+    recorded = fetch_all(server.url)
+    cassette.uninstall()
+    
+    cassette.install(tape, 'replay', latency=0)
+    assert fetch_all(server.url) == recorded
+    assert server.hits == 3
+    
+    urls = [json.loads(line)['url'] for line in tape.read_text().splitlines()]
+    assert not any('secret' in url for url in urls)
+
+
+def test_replay_keeps_recorded_latency(server, tape):
+    cassette.install(tape, 'record')
+    requests.get(f"{server.url}/slow")
+    cassette.uninstall()
+    
+    cassette.install(tape, 'replay', latency=1)
+    started = time.perf_counter()
+    requests.get(f"{server.url}/slow")
+    assert time.perf_counter() - started >= 0.05
+
+
+def test_repeated_requests_replay_in_order(server, tape):
+    cassette.install(tape, 'record')
+    hits = [requests.get(f"{server.url}/poll").json()['hit'] for _ in range(3)]
+    cassette.uninstall()
+    
+    replayed = cassette.install(tape, 'replay', latency=0)
+    assert [requests.get(f"{server.url}/poll").json()['hit'] for _ in range(4)] == hits + hits[:1]
+    
+    # Another thread starts from the beginning
+    other = []
+    thread = threading.Thread(target=lambda: other.append(requests.get(f"{server.url}/poll").json()['hit']))
+    thread.start()
+    thread.join()
+    assert other == hits[:1]
+    
+    replayed.rewind()
+    assert requests.get(f"{server.url}/poll").json()['hit'] == hits[0]
+
+
+def test_unrecorded_request_fails(server, tape):
+    tape.write_text('')
+    cassette.install(tape, 'replay', latency=0)
+    
+    with pytest.raises(ConnectionError, match='No recorded exchange'):
+        requests.get(f"{server.url}/missing")
+
+
+def test_no_mode_installs_nothing(monkeypatch):
+    monkeypatch.setattr(cassette.config, 'CASSETTE_MODE', '')
+    original = requests.adapters.HTTPAdapter.send
+    
+    assert cassette.install() is None
+    assert cassette.active() is None
+    assert requests.adapters.HTTPAdapter.send is original
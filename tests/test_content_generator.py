@@ -0,0 +1,56 @@
+"""
+Content generator tests
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from modules.content_generator import ContentGenerator
+
+
+class _GeminiHandler(BaseHTTPRequestHandler):
+    """Answers generateContent, echoing the API key it was called with"""
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        key = self.headers.get('x-goog-api-key')
+        self.server.keys.append(key)
+        metadata = {'title': f"Title for {key}", 'description': 'd', 'tags': ['t'], 'hashtags': ['#h']}
+        body = json.dumps({
+            'candidates': [{'content': {'role': 'model', 'parts': [{'text': json.dumps(metadata)}]}}]
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def gemini():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _GeminiHandler)
+    httpd.keys = []
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def settings(endpoint, key):
+    return SimpleNamespace(CONTENT_AI_SERVICE='gemini', GEMINI_API_KEY=key, GEMINI_API_ENDPOINT=endpoint)
+
+
+def test_instances_use_their_own_gemini_key(gemini):
+    first = ContentGenerator(settings(gemini.url, 'key-one'))
+    second = ContentGenerator(settings(gemini.url, 'key-two'))
+    
+    assert second.generate('Octopuses have three hearts.')['title'] == 'Title for key-two'
+    assert first.generate('Honey never spoils.')['title'] == 'Title for key-one'
+    assert gemini.keys == ['key-two', 'key-one']
@@ -0,0 +1,257 @@
+"""
+Database schema and query plan tests
+"""
+import sqlite3
+
+import pytest
+
+from database import IdempotencyConflict, MIGRATIONS
+
+
+def query_plans(db, call):
+    """
+    Run `call` and return the EXPLAIN QUERY PLAN details of each SELECT it
+    made, taken from the SQL SQLite actually ran (parameters bound)
+    """
+    statements = []
+    connect = sqlite3.connect
+    
+    def traced_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+    
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(sqlite3, 'connect', traced_connect)
+        call()
+    
+    conn = sqlite3.connect(db.db_path)
+    plans = []
+    for sql in statements:
+        if sql.lstrip().startswith('SELECT'):
+            rows = conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+            plans.append(' | '.join(r[-1] for r in rows))
+    conn.close()
+    assert plans, 'no SELECT ran'
+    return plans
+
+
+def test_migrations_applied(db):
+    assert db.get_schema_version() == MIGRATIONS[-1][0]
+
+
+def test_migrations_idempotent(db):
+    from database import Database
+    again = Database(db.db_path)
+    assert again.get_schema_version() == MIGRATIONS[-1][0]
+
+
+def test_jobs_by_status_uses_index(db):
+    [plan] = query_plans(db, lambda: db.get_all_jobs(status='pending', limit=1))
+    assert 'idx_jobs_status_created' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_jobs_unfiltered_uses_index(db):
+    [plan] = query_plans(db, lambda: db.get_all_jobs(limit=50))
+    assert 'idx_jobs_created' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_videos_by_status_uses_index(db):
+    [plan] = query_plans(db, lambda: db.get_all_videos(status='completed', limit=50))
+    assert 'idx_videos_status_created' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_videos_unfiltered_uses_index(db):
+    [plan] = query_plans(db, lambda: db.get_all_videos(limit=50))
+    assert 'idx_videos_created' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+@pytest.mark.parametrize('sources, stages', [
+    ((), None),
+    (('api', 'schedule'), None),
+    (('schedule', 'api'), ('content', 'upload')),
+])
+def test_claim_next_job_uses_priority_index(db, sources, stages):
+    db.create_job(db.create_video('s'))
+    
+    [plan] = query_plans(db, lambda: db.claim_next_job(sources, stages=stages, owner='test'))
+    assert 'idx_jobs_status_priority' in plan
+    # At most the source order within one priority level is sorted
+    assert 'USE TEMP B-TREE FOR ORDER BY' not in plan
+    if not sources:
+        assert 'TEMP B-TREE' not in plan
+
+
+def test_status_counts_follow_transitions(db):
+    video_id = db.create_video('script')
+    job_a = db.create_job(video_id)
+    job_b = db.create_job(video_id)
+    assert db.get_status_counts('jobs') == {'pending': 2}
+    
+    db.update_job(job_a, status='processing', progress=10)
+    db.update_job(job_a, progress=20)
+    db.update_job(job_b, status='completed')
+    db.update_video(video_id, status='completed')
+    
+    assert db.get_status_counts('jobs') == {'pending': 0, 'processing': 1, 'completed': 1}
+    assert db.get_status_counts('videos') == {'pending': 0, 'completed': 1}
+
+
+def test_keyset_pagination_handles_timestamp_ties(db):
+    # Rows created within the same second share created_at
+    ids = [db.create_video(f'script {i}') for i in range(7)]
+    
+    seen = []
+    before = None
+    while True:
+        page = db.get_all_videos(limit=3, before=before, fields=['status'])
+        if not page:
+            break
+        seen.extend(v['id'] for v in page)
+        before = (page[-1]['created_at'], page[-1]['id'])
+    
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_fields_projection(db):
+    video_id = db.create_video('a long script')
+    db.create_job(video_id)
+    
+    video = db.get_all_videos(fields=['title'])[0]
+    assert set(video) == {'id', 'created_at', 'title'}
+    
+    job = db.get_all_jobs(fields=['title', 'progress'])[0]
+    assert set(job) == {'id', 'created_at', 'title', 'progress'}
+    
+    with pytest.raises(ValueError):
+        db.get_all_videos(fields=['nope'])
+
+
+def test_api_key_cache_invalidated_on_save(db):
+    db.save_api_key('gemini', 'key-1')
+    assert db.get_api_key('gemini') == 'key-1'
+    
+    db.save_api_key('gemini', 'key-2')
+    assert db.get_api_key('gemini') == 'key-2'
+
+
+def test_api_key_cache_invalidated_across_processes(db):
+    from database import Database
+    other = Database(db.db_path)  # stands in for another process
+    
+    db.save_api_key('openai', 'old')
+    assert other.get_api_keys() == {'openai': 'old'}
+    
+    db.save_api_key('openai', 'new')
+    assert other.get_api_keys() == {'openai': 'new'}
+
+
+def test_api_key_cache_skips_decrypt_when_unchanged(db, monkeypatch):
+    db.save_api_key('luma', 'secret')
+    db.get_api_keys()
+    
+    def fail(*args):
+        raise AssertionError('decrypted again')
+    monkeypatch.setattr(db.cipher, 'decrypt', fail)
+    
+    assert db.get_api_key('luma') == 'secret'
+
+
+def test_expired_lease_is_reaped(db):
+    job_id = db.create_job(db.create_video('s'))
+    assert db.claim_next_job(owner='node-a', lease=60)['id'] == job_id
+    assert db.reap_jobs() == ([], [])
+    assert db.renew_lease(job_id, 'node-a', stage='tts')
+    
+    # node-a stops heartbeating
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("UPDATE jobs SET lease_expires = datetime('now', '-1 seconds')")
+    
+    assert db.reap_jobs() == ([job_id], [])
+    assert db.get_status_counts('jobs')['pending'] == 1
+    job = db.claim_next_job(owner='node-b', lease=60)
+    assert job['stage'] == 'tts'
+    assert job['reclaim_count'] == 1
+    assert not db.renew_lease(job_id, 'node-a')
+    assert not db.release_job(job_id, 'node-a', 'assemble', 'Waiting')
+
+
+def test_job_failed_after_max_reclaims(db):
+    video_id = db.create_video('s')
+    job_id = db.create_job(video_id)
+    
+    # node-a restarts twice while holding the job
+    db.claim_next_job(owner='node-a/worker-0')
+    assert db.reap_jobs(owner_prefix='node-a/', max_reclaims=1) == ([job_id], [])
+    db.claim_next_job(owner='node-a/worker-0')
+    assert db.reap_jobs(owner_prefix='node-a/', max_reclaims=1) == ([], [job_id])
+    
+    assert db.get_job(job_id)['status'] == 'failed'
+    assert db.get_video(video_id)['status'] == 'failed'
+    assert db.get_reclaim_total() == 1
+
+
+def test_claim_only_runnable_stages(db):
+    job_id = db.create_job(db.create_video('s'))
+    assert db.claim_next_job(stages=('assemble',), owner='ffmpeg') is None
+    
+    db.claim_next_job(stages=('content', 'tts'), owner='io')
+    assert db.release_job(job_id, 'io', 'assemble', 'Queued for assemble')
+    assert db.claim_next_job(stages=('content', 'tts'), owner='io') is None
+    
+    job = db.claim_next_job(stages=('assemble',), owner='ffmpeg')
+    assert job['id'] == job_id
+    assert job['lease_owner'] == 'ffmpeg'
+
+
+def test_stage_estimates_use_last_runs_only(db):
+    db.record_stages(1, [{'stage': 'tts', 'duration': d} for d in (100.0, 10.0, 20.0)])
+    db.record_stage(1, 'video', 5.0)
+    
+    assert db.get_stage_estimates(('tts', 'video', 'upload'), window=2) == {'tts': 15.0, 'video': 5.0}
+
+
+def test_cancel_job(db):
+    video_id = db.create_video('s')
+    queued = db.create_job(video_id)
+    running = db.create_job(video_id)
+    db.update_job(running, status='processing', lease_expires='2000-01-01 00:00:00')
+    
+    assert db.cancel_job(queued) == 'cancelled'
+    assert db.get_video(video_id)['status'] == 'cancelled'
+    assert db.cancel_job(queued) is None
+    
+    assert db.cancel_job(running) == 'cancelling'
+    assert db.get_cancel_requests([queued, running]) == {running}
+    
+    # Its worker died before stopping it
+    assert db.reap_jobs() == ([], [])
+    assert db.get_job(running)['status'] == 'cancelled'
+
+
+def test_create_video_job_deduplicates(db):
+    video_id, job_id, created = db.create_video_job('s', idempotency_key='k1', content_hash='h1',
+                                                    request_hash='r1')
+    assert created
+    assert db.create_video_job('s', idempotency_key='k1', content_hash='h1',
+                               request_hash='r1') == (video_id, job_id, False)
+    # Other render settings, same request
+    assert db.create_video_job('s', idempotency_key='k1', content_hash='h3',
+                               request_hash='r1') == (video_id, job_id, False)
+    
+    with pytest.raises(IdempotencyConflict):
+        db.create_video_job('other', idempotency_key='k1', content_hash='h2', request_hash='r2')
+    
+    # Content hashes only match when asked to
+    assert db.create_video_job('s', content_hash='h1')[2]
+    assert db.create_video_job('s', content_hash='h1', dedupe=True)[2] is False
+    
+    # A failed video hands its key to the retry
+    db.update_video(video_id, status='failed')
+    retry_id, _, created = db.create_video_job('s', idempotency_key='k1', content_hash='h1')
+    assert created and retry_id != video_id
+    assert db.get_video(video_id)['idempotency_key'] is None
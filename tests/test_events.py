@@ -0,0 +1,79 @@
+"""
+Event bus fan-out tests
+"""
+import json
+
+from events import EventBus, JobWatcher
+
+
+def test_publish_fans_out_to_all_subscribers():
+    bus = EventBus()
+    a = bus.subscribe()
+    b = bus.subscribe()
+    
+    bus.publish('job', {'id': 1, 'progress': 10})
+    
+    frame = 'event: job\ndata: {"id": 1, "progress": 10}\n\n'
+    assert a.get_nowait() == frame
+    assert b.get_nowait() == frame
+
+
+def test_slow_subscriber_is_dropped_without_blocking():
+    bus = EventBus(max_pending=2)
+    slow = bus.subscribe()
+    
+    for i in range(5):
+        bus.publish('job', {'id': i})
+    
+    assert bus.subscriber_count() == 0
+    frames = [slow.get_nowait() for _ in range(slow.qsize())]
+    assert frames[-1] is EventBus.OVERFLOW
+
+
+def test_stream_yields_frames_until_overflow():
+    bus = EventBus(max_pending=1)
+    stream = bus.stream(keepalive=0.01)
+    assert next(stream).startswith('retry:')
+    
+    bus.publish('job', {'id': 1})
+    assert next(stream).startswith('event: job')
+    
+    bus.publish('job', {'id': 2})
+    bus.publish('job', {'id': 3})
+    assert list(stream) == []
+    assert bus.subscriber_count() == 0
+
+
+def test_watcher_publishes_job_changes_from_the_database(db):
+    bus = EventBus()
+    watcher = JobWatcher(bus, db)
+    q = bus.subscribe()
+    
+    first = db.create_job(db.create_video('script', title='First'))
+    assert watcher.poll() == 0  # baseline when someone connects
+    
+    # Written by a worker process: a new job, progress, completion
+    second = db.create_job(db.create_video('script', title='Second'))
+    db.update_job(first, status='processing', progress=40, current_step='Generating voiceover')
+    assert watcher.poll() == 2
+    assert watcher.poll() == 0  # nothing changed since
+    
+    db.update_job(first, status='completed', progress=100)
+    assert watcher.poll() == 1
+    
+    events = [json.loads(q.get_nowait().split('data: ', 1)[1]) for _ in range(q.qsize())]
+    assert [(e['id'], e['status'], e['progress']) for e in events] == [
+        (first, 'processing', 40), (second, 'pending', 0), (first, 'completed', 100)
+    ]
+    assert events[1]['title'] == 'Second'
+
+
+def test_watcher_idle_without_subscribers(db):
+    bus = EventBus()
+    watcher = JobWatcher(bus, db)
+    
+    db.create_job(db.create_video('script'))
+    assert watcher.poll() == 0
+    
+    bus.subscribe()
+    assert watcher.poll() == 0  # fresh baseline, not a replay of history
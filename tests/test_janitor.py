@@ -0,0 +1,116 @@
+"""
+Artifact janitor tests
+"""
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import janitor
+
+HOUR = 3600
+
+
+@pytest.fixture
+def output(db, tmp_path, monkeypatch):
+    """OUTPUT_DIR (with TEMP_DIR and the S3 cache inside) bound to the per-test database"""
+    output_dir = tmp_path / 'output'
+    monkeypatch.setattr(janitor, 'db', db)
+    monkeypatch.setattr(janitor.config, 'OUTPUT_DIR', output_dir)
+    monkeypatch.setattr(janitor.config, 'TEMP_DIR', output_dir / 'temp')
+    monkeypatch.setattr(janitor.config, 'ARTIFACT_CACHE_DIR', output_dir / 'temp' / 'artifacts')
+    monkeypatch.setattr(janitor.config, 'ARTIFACT_RETAIN_INTERMEDIATE_HOURS', 24)
+    monkeypatch.setattr(janitor.config, 'ARTIFACT_RETAIN_TEMP_HOURS', 6)
+    monkeypatch.setattr(janitor.config, 'ARTIFACT_RETAIN_FINAL_DAYS', 7)
+    monkeypatch.setattr(janitor.config, 'ARTIFACT_DISK_BUDGET_MB', 0)
+    return output_dir
+
+
+def artifact(path, size=1000, age=0):
+    """Write a file last used `age` seconds ago"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'x' * size)
+    used = time.time() - age
+    os.utime(path, (used, used))
+    return path
+
+
+def rendered(db, output, age=0, uploaded_days=None, size=1000):
+    """Completed video with its final in OUTPUT_DIR"""
+    video_id = db.create_video('script')
+    final = artifact(output / f"video_{video_id}" / 'final_video.mp4', size=size, age=age)
+    db.update_video(video_id, status='completed', video_path=str(final))
+    if uploaded_days is not None:
+        db.update_video(video_id, youtube_id='yt', uploaded_at=datetime.now() - timedelta(days=uploaded_days))
+    return video_id, final
+
+
+def test_retention_per_class(db, output):
+    uploaded_id, uploaded = rendered(db, output, age=10 * 24 * HOUR, uploaded_days=8)
+    recent_id, recent = rendered(db, output, age=10 * 24 * HOUR, uploaded_days=2)
+    unpublished_id, unpublished = rendered(db, output, age=30 * 24 * HOUR)
+    stale = artifact(output / f"video_{recent_id}" / 'audio.mp3', age=25 * HOUR)
+    fresh = artifact(output / f"video_{recent_id}" / 'captions.srt', age=HOUR)
+    old_temp = artifact(output / 'temp' / 'artifacts' / 'video_99' / 'video_raw.mp4', age=7 * HOUR)
+    new_temp = artifact(output / 'temp' / 'scratch.wav', age=HOUR)
+    unknown = artifact(output / 'youtube_short_20250101_000000.mp4', age=60 * 24 * HOUR)
+    
+    # A running job keeps even expired artifacts
+    busy_id = db.create_video('script')
+    busy = artifact(output / f"video_{busy_id}" / 'video_raw.mp4', age=48 * HOUR)
+    db.create_job(busy_id)
+    
+    report = janitor.Janitor(interval=0).run_once()
+    
+    assert not uploaded.exists() and not uploaded.parent.exists()
+    assert not stale.exists() and not old_temp.exists()
+    assert all(path.exists() for path in (recent, unpublished, fresh, new_temp, unknown, busy))
+    assert (output / 'temp').is_dir()
+    
+    assert db.get_video(uploaded_id)['video_path'] is None
+    assert db.get_video(unpublished_id)['video_path'] == str(unpublished)
+    assert report['evicted'] == [uploaded_id]
+    assert report['files'] == 3
+    assert report['bytes'] == 3000
+    assert report['classes'] == {'final': 1000, 'intermediate': 1000, 'temp': 1000}
+    assert db.get_cleanup_totals() == (3, 3000)
+
+
+def test_budget_evicts_least_recently_used(db, output, monkeypatch):
+    monkeypatch.setattr(janitor.config, 'ARTIFACT_DISK_BUDGET_MB', 1)
+    oldest_id, oldest = rendered(db, output, age=3 * HOUR, size=400 * 1024)
+    middle_id, middle = rendered(db, output, age=2 * HOUR, size=400 * 1024)
+    newest_id, newest = rendered(db, output, age=1 * HOUR, size=400 * 1024)
+    
+    report = janitor.Janitor(interval=0).run_once()
+    
+    assert not oldest.exists()
+    assert middle.exists() and newest.exists()
+    assert report['evicted'] == [oldest_id]
+    assert report['in_use'] == 800 * 1024
+    assert db.get_video(oldest_id)['video_path'] is None
+    assert db.get_video(newest_id)['video_path'] == str(newest)
+
+
+def test_budget_keeps_finals_still_to_publish(db, output, monkeypatch):
+    monkeypatch.setattr(janitor.config, 'ARTIFACT_DISK_BUDGET_MB', 1)
+    slot = (datetime.now() + timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S')
+    schedule_id = db.create_schedule('Daily', 'daily', time='09:00', script_source='x', next_run=slot)
+    prerender_id, _ = db.claim_prerender(schedule_id, slot, 'x')
+    final = artifact(output / f"video_{prerender_id}" / 'final_video.mp4', size=300 * 1024, age=4 * HOUR)
+    db.update_video(prerender_id, status='completed', video_path=str(final))
+    db.update_job(db.get_all_jobs()[0]['id'], status='completed')
+    
+    waiting_id, waiting = rendered(db, output, age=3 * HOUR, size=300 * 1024)
+    db.update_video(waiting_id, auto_upload=1)
+    oldest_id, oldest = rendered(db, output, age=2 * HOUR, size=300 * 1024)
+    newest_id, newest = rendered(db, output, age=1 * HOUR, size=300 * 1024)
+    
+    report = janitor.Janitor(interval=0).run_once()
+    
+    assert final.exists() and waiting.exists()
+    assert report['evicted'] == [oldest_id]
+    assert db.get_video(prerender_id)['video_path'] == str(final)
+    assert not db.evict_video_file(prerender_id, str(final))
+    assert not db.evict_video_file(waiting_id, str(waiting))
@@ -0,0 +1,331 @@
+"""
+Job queue tests
+"""
+import dataclasses
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import artifacts
+import cancellation
+import job_queue as jq
+
+
+@pytest.fixture
+def queue(db, monkeypatch):
+    """JobQueue bound to the per-test database"""
+    monkeypatch.setattr(jq, 'db', db)
+    return jq.JobQueue()
+
+
+def test_settings_snapshot_uses_saved_keys(queue, db):
+    db.save_api_key('gemini', 'g-key')
+    db.save_api_key('video_service', 'runway')
+    db.save_api_key('video_api', 'r-key')
+    
+    settings = queue._load_settings()
+    
+    assert settings.GEMINI_API_KEY == 'g-key'
+    assert settings.VIDEO_SERVICE == 'runway'
+    assert settings.RUNWAY_API_KEY == 'r-key'
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        settings.GEMINI_API_KEY = 'other'
+
+
+def test_ui_openai_key_keeps_separate_gpt_key(queue, db, monkeypatch):
+    db.save_api_key('openai', 'ui-key')
+    
+    monkeypatch.setattr(type(jq.config), 'OPENAI_GPT_API_KEY', '')
+    assert queue._load_settings().OPENAI_GPT_API_KEY == 'ui-key'
+    
+    monkeypatch.setattr(type(jq.config), 'OPENAI_GPT_API_KEY', 'env-gpt-key')
+    settings = queue._load_settings()
+    assert settings.OPENAI_API_KEY == 'ui-key'
+    assert settings.OPENAI_GPT_API_KEY == 'env-gpt-key'
+
+
+def test_settings_snapshot_leaves_environment_alone(queue, db, monkeypatch):
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    db.save_api_key('openai', 'o-key')
+    
+    assert queue._load_settings().OPENAI_API_KEY == 'o-key'
+    assert 'OPENAI_API_KEY' not in os.environ
+
+
+def take_next(queue, db):
+    job = queue._claim_next()
+    db.update_job(job['id'], status='completed')
+    return job
+
+
+def test_priority_then_fifo(queue, db):
+    video_id = db.create_video('s')
+    old = queue.submit_job(video_id, priority='low')
+    first = queue.submit_job(video_id)
+    second = queue.submit_job(video_id)
+    urgent = queue.submit_job(video_id, priority='high')
+    
+    assert [take_next(queue, db)['id'] for _ in range(4)] == [urgent, first, second, old]
+
+
+def test_sources_share_capacity(queue, db):
+    video_id = db.create_video('s')
+    for _ in range(4):
+        queue.submit_job(video_id, source='api')
+        queue.submit_job(video_id, source='schedule')
+    
+    sources = [take_next(queue, db)['source'] for _ in range(8)]
+    assert sources[:4].count('api') == 2
+    assert sources[:4].count('schedule') == 2
+
+
+def test_fair_share_weights():
+    share = jq.FairShare(jq.parse_weights('api:3,schedule:1'))
+    picks = []
+    for _ in range(8):
+        source = share.order()[0]
+        share.charge(source)
+        picks.append(source)
+    assert picks.count('api') == 6
+
+
+def test_queue_wait_reported_per_priority(queue, db):
+    video_id = db.create_video('s')
+    queue.submit_job(video_id, priority='high')
+    job_id = db.create_job(video_id)
+    db.record_stage(job_id, 'queue_wait', 4.0, detail='high')
+    db.record_stage(job_id, 'queue_wait', 2.0, detail='high')
+    
+    # Read by another process's queue, e.g. the web app's
+    waits = jq.JobQueue().get_queue_waits()
+    assert waits['high']['started'] == 2
+    assert waits['high']['avg_wait'] == 3.0
+    assert waits['high']['max_wait'] == 4.0
+    assert waits['high']['pending'] == 1
+    assert waits['low']['avg_wait'] is None
+
+
+def test_status_sees_workers_of_other_processes(queue, db):
+    web = jq.JobQueue()
+    assert web.get_status()['running'] is False
+    
+    db.beat_worker('render-1', 3)
+    status = web.get_status()
+    assert status['running'] is True
+    assert status['workers'] == 3
+    assert [node['node'] for node in status['nodes']] == ['render-1']
+    
+    db.remove_worker('render-1')
+    assert not web.get_nodes()
+
+
+def test_claimed_job_not_handed_out_twice(queue, db):
+    queue.submit_job(db.create_video('s'))
+    
+    job = queue._claim_next()
+    assert job['status'] == 'processing'
+    assert queue._claim_next() is None
+
+
+# Name of the simulated node running in this process
+NODE = None
+
+
+def write_artifact(path, stage):
+    Path(path).write_text(f"{stage}@{NODE}\n")
+    return str(path)
+
+
+class FakeModule:
+    """Stand-in for a provider or FFmpeg module: records which node ran it"""
+    def __init__(self, settings):
+        self.settings = settings
+
+
+class FakeContent(FakeModule):
+    def generate(self, script):
+        return {'title': script.upper(), 'description': '', 'tags': []}
+
+
+class FakeTTS(FakeModule):
+    def generate(self, text, output_path):
+        return write_artifact(output_path, 'tts')
+
+
+class FakeVideo(FakeModule):
+    def generate(self, prompt, output_path):
+        if NODE == 'crashy':
+            os._exit(3)
+        return write_artifact(output_path, 'video')
+
+
+class FakeCaptions(FakeModule):
+    def generate(self, audio_path, output_path):
+        assert Path(audio_path).exists()
+        return write_artifact(output_path, 'captions')
+
+
+class FakeAssembler(FakeModule):
+    def assemble(self, video_path, audio_path, captions_path, output_path):
+        inputs = ''.join(Path(p).read_text() for p in (audio_path, video_path, captions_path))
+        Path(output_path).write_text(inputs + f"assemble@{NODE}\n")
+        return str(output_path)
+
+
+def run_node(db_path, output_dir, node, stages, jobs, **settings):
+    """One worker node: its own process and JobQueue on the shared database"""
+    global NODE
+    NODE = node
+    from database import Database
+    jq.db = Database(db_path)
+    artifacts._store = artifacts.LocalStore(output_dir)
+    for name, value in settings.items():
+        setattr(jq.config, name, value)
+    jq.ContentGenerator, jq.TTSGenerator, jq.VideoGenerator = FakeContent, FakeTTS, FakeVideo
+    jq.CaptionGenerator, jq.VideoAssembler = FakeCaptions, FakeAssembler
+    
+    queue = jq.JobQueue(workers=2, stages=stages, node=node)
+    queue.start()
+    deadline = time.time() + 60
+    while time.time() < deadline and jq.db.get_status_counts('jobs').get('completed', 0) < jobs:
+        time.sleep(0.2)
+    queue.stop()
+
+
+def start_node(*args, **settings):
+    process = multiprocessing.get_context('spawn').Process(target=run_node, args=args, kwargs=settings)
+    process.start()
+    return process
+
+
+def test_nodes_split_stages_across_processes(db, tmp_path):
+    video_ids = [db.create_video(f"script {n}") for n in range(3)]
+    job_ids = [db.create_job(video_id) for video_id in video_ids]
+    output_dir = tmp_path / 'shared-output'
+    
+    # Two provider-only nodes and one FFmpeg node
+    nodes = {
+        'io-1': 'content,tts,video,captions',
+        'io-2': 'content,tts,video,captions',
+        'ffmpeg': 'assemble',
+    }
+    processes = [
+        start_node(db.db_path, output_dir, node, stages, len(job_ids))
+        for node, stages in nodes.items()
+    ]
+    for process in processes:
+        process.join(timeout=90)
+        assert process.exitcode == 0
+    
+    for n, (job_id, video_id) in enumerate(zip(job_ids, video_ids)):
+        job = db.get_job(job_id)
+        assert job['status'] == 'completed', job['error_message']
+        assert job['stage'] == 'assemble'
+        
+        video = db.get_video(video_id)
+        assert video['title'] == f"SCRIPT {n}"
+        lines = Path(video['video_path']).read_text().splitlines()
+        assert lines[-1] == 'assemble@ffmpeg'
+        assert {line.split('@')[1] for line in lines[:-1]} <= {'io-1', 'io-2'}
+
+
+def test_crashed_node_work_is_reclaimed(db, tmp_path):
+    video_id = db.create_video('script')
+    job_id = db.create_job(video_id)
+    output_dir = tmp_path / 'shared-output'
+    fast = {'JOB_LEASE_SECONDS': 1, 'JOB_HEARTBEAT_INTERVAL': 0.2}
+    
+    # Dies during the video stage, leaving the job processing
+    crashed = start_node(db.db_path, output_dir, 'crashy', 'all', 1, **fast)
+    crashed.join(timeout=60)
+    assert crashed.exitcode == 3
+    assert db.get_job(job_id)['status'] == 'processing'
+    
+    survivor = start_node(db.db_path, output_dir, 'survivor', 'all', 1, **fast)
+    survivor.join(timeout=90)
+    assert survivor.exitcode == 0
+    
+    job = db.get_job(job_id)
+    assert job['status'] == 'completed', job['error_message']
+    assert job['reclaim_count'] == 1
+    
+    # The voiceover made before the crash was kept
+    lines = Path(db.get_video(video_id)['video_path']).read_text().splitlines()
+    assert lines == ['tts@crashy', 'video@survivor', 'captions@survivor', 'assemble@survivor']
+
+
+class SlowVideo(FakeModule):
+    def generate(self, prompt, output_path):
+        write_artifact(output_path, 'video')
+        cancellation.sleep(30)  # waiting on the provider
+
+
+def test_cancel_frees_worker(queue, db, tmp_path, monkeypatch):
+    monkeypatch.setattr(artifacts, '_store', artifacts.LocalStore(tmp_path / 'output'))
+    monkeypatch.setattr(jq.config, 'JOB_CANCEL_POLL_INTERVAL', 0.1)
+    monkeypatch.setattr(jq, 'ContentGenerator', FakeContent)
+    monkeypatch.setattr(jq, 'TTSGenerator', FakeTTS)
+    monkeypatch.setattr(jq, 'VideoGenerator', SlowVideo)
+    monkeypatch.setattr(queue.scheduler, 'start', lambda: None)
+    monkeypatch.setattr(queue.scheduler, 'stop', lambda: None)
+    
+    video_id = db.create_video('script')
+    job_id = queue.submit_job(video_id)
+    queue.start()
+    try:
+        while db.get_job(job_id)['current_step'] != jq.STAGE_STEPS['video'][0]:
+            time.sleep(0.05)
+        
+        assert db.cancel_job(job_id) == 'cancelling'
+        cancelled_at = time.monotonic()
+        while db.get_job(job_id)['status'] != 'cancelled':
+            assert time.monotonic() - cancelled_at < 2
+            time.sleep(0.05)
+    finally:
+        queue.stop()
+    
+    assert db.get_video(video_id)['status'] == 'cancelled'
+    assert not (tmp_path / 'output' / f"video_{video_id}").exists()
+    assert not queue.current_jobs
+
+
+class BrokenContent(FakeModule):
+    def generate(self, script):
+        raise RuntimeError('provider down')
+
+
+def test_failed_job_left_to_reaper_when_db_write_fails(queue, db, monkeypatch):
+    monkeypatch.setattr(jq.config, 'JOB_LEASE_SECONDS', 1)
+    monkeypatch.setattr(jq, 'ContentGenerator', BrokenContent)
+    update_job = db.update_job
+    
+    def locked_on_failure(job_id, **changes):
+        if changes.get('status') == 'failed':
+            raise sqlite3.OperationalError('database is locked')
+        update_job(job_id, **changes)
+    
+    monkeypatch.setattr(db, 'update_job', locked_on_failure)
+    job_id = queue.submit_job(db.create_video('script'))
+    
+    queue.running = True
+    worker = threading.Thread(target=queue._worker, name='worker-0', daemon=True)
+    worker.start()
+    try:
+        deadline = time.monotonic() + 5
+        while db.get_job(job_id)['current_step'] == 'Queued' or queue.current_jobs:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        assert worker.is_alive()
+    finally:
+        queue.running = False
+        worker.join(timeout=5)
+    
+    # No longer renewed, so the lease runs out and the job is requeued
+    assert db.get_job(job_id)['status'] == 'processing'
+    time.sleep(1.5)
+    assert db.reap_jobs() == ([job_id], [])
@@ -0,0 +1,73 @@
+"""
+Pipeline metrics tests
+"""
+import io
+from types import SimpleNamespace
+
+import requests
+
+import metrics
+import retry
+from metrics import StageHistograms
+
+
+def test_operations_recorded_inside_stage():
+    with metrics.collect() as records:
+        with metrics.timed('video'):
+            with metrics.timed('download', 'luma'):
+                metrics.count('bytes', 1024)
+            metrics.count('retries')
+            metrics.observe('poll_wait', 42.0, 'luma')
+    
+    by_stage = {r['stage']: r for r in records}
+    assert set(by_stage) == {'video', 'download', 'poll_wait'}
+    assert by_stage['download']['bytes'] == 1024
+    assert by_stage['download']['detail'] == 'luma'
+    assert by_stage['video']['retries'] == 1
+    assert by_stage['video']['bytes'] == 0
+    assert by_stage['poll_wait']['duration'] == 42.0
+
+
+def test_transient_provider_errors_retried_and_counted(monkeypatch):
+    statuses = iter([503, 429, 200])
+    
+    def fake_request(method, url, **kwargs):
+        response = requests.Response()
+        response.status_code = next(statuses)
+        response.raw = io.BytesIO()
+        return response
+    
+    monkeypatch.setattr(retry.requests, 'request', fake_request)
+    settings = SimpleNamespace(MAX_RETRIES=3, RETRY_DELAY=0)
+    with metrics.collect() as records:
+        with metrics.timed('provider_call', 'luma'):
+            response = retry.request('POST', 'https://luma.test/generations', settings)
+    
+    assert response.status_code == 200
+    assert records[0]['retries'] == 2
+    
+    statuses = iter([503, 503])
+    settings.MAX_RETRIES = 1
+    assert retry.request('GET', 'https://luma.test/generations/1', settings).status_code == 503
+
+
+def test_timed_outside_job_is_noop():
+    with metrics.timed('provider_call', 'gemini'):
+        metrics.count('cache_hits')
+    metrics.observe('poll_wait', 1.0)
+
+
+def test_histograms_fold_in_new_rows_only(db):
+    db.record_stages(1, [
+        {'stage': 'tts', 'duration': 0.3, 'bytes': 10},
+        {'stage': 'tts', 'duration': 7.0, 'bytes': 5},
+    ])
+    histograms = StageHistograms(buckets=(1, 10))
+    histograms.refresh(db.get_stage_metrics)
+    histograms.refresh(db.get_stage_metrics)
+    
+    text = '\n'.join(histograms.render())
+    assert 'shorts_stage_duration_seconds_bucket{stage="tts",le="1"} 1' in text
+    assert 'shorts_stage_duration_seconds_bucket{stage="tts",le="10"} 2' in text
+    assert 'shorts_stage_duration_seconds_count{stage="tts"} 2' in text
+    assert 'shorts_transfer_bytes_total{stage="tts"} 15' in text
@@ -0,0 +1,216 @@
+"""
+Schedule executor tests
+"""
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import scheduler as sched
+from scheduler import Scheduler, compute_next_run, format_time, parse_time
+
+
+@pytest.fixture
+def sched_db(db, monkeypatch, tmp_path):
+    """Point the scheduler module at the per-test database (and SCRIPTS_DIR at tmp_path)"""
+    monkeypatch.setattr(sched, 'db', db)
+    monkeypatch.setattr(sched.config, 'SCRIPTS_DIR', tmp_path)
+    return db
+
+
+def test_compute_next_run():
+    after = datetime(2026, 3, 4, 10, 30)  # a Wednesday
+    assert compute_next_run('hourly', '00:15', after=after) == datetime(2026, 3, 4, 11, 15)
+    assert compute_next_run('daily', '09:00', after=after) == datetime(2026, 3, 5, 9, 0)
+    assert compute_next_run('daily', '11:00', after=after) == datetime(2026, 3, 4, 11, 0)
+    assert compute_next_run('weekly', '09:00', 'mon,fri', after=after) == datetime(2026, 3, 6, 9, 0)
+    assert compute_next_run('weekly', '10:30', 'wed', after=after) == datetime(2026, 3, 11, 10, 30)
+    with pytest.raises(ValueError):
+        compute_next_run('monthly', after=after)
+
+
+def test_load_script_only_reads_scripts_dir(sched_db, tmp_path):
+    (tmp_path / 'honey.txt').write_text('Honey never spoils.\n')
+    secret = tmp_path.parent / 'secret_key'
+    secret.write_text('not a script')
+    (tmp_path / 'link.txt').symlink_to(secret)
+    
+    assert sched.load_script('honey.txt') == 'Honey never spoils.'
+    assert sched.load_script(str(tmp_path / 'honey.txt')) == 'Honey never spoils.'
+    assert sched.load_script('Octopuses have three hearts. ') == 'Octopuses have three hearts.'
+    for source in (str(secret), '../secret_key', 'link.txt'):
+        with pytest.raises(ValueError):
+            sched.load_script(source)
+
+
+def test_claim_schedule_run_fires_once(sched_db):
+    due = '2026-01-01 09:00:00'
+    schedule_id = sched_db.create_schedule('Daily', 'daily', time='09:00',
+                                           script_source='Honey never spoils', next_run=due)
+    
+    first = sched_db.claim_schedule_run(schedule_id, due, '2026-01-02 09:00:00', script='s')
+    second = sched_db.claim_schedule_run(schedule_id, due, '2026-01-02 09:00:00', script='s')
+    
+    assert first is not None and first[1] is not None
+    assert second is None
+    assert sched_db.get_status_counts('jobs') == {'pending': 1}
+
+
+def run_until_fired(scheduler, count, timeout=5):
+    fired = []
+    done = threading.Event()
+    
+    def on_fire(schedule, video_id, job_id):
+        fired.append(job_id)
+        if len(fired) >= count:
+            done.set()
+    
+    scheduler.on_fire = on_fire
+    scheduler.start()
+    done.wait(timeout)
+    scheduler.stop()
+    return fired
+
+
+def test_overdue_schedule_fires_once_after_restart(sched_db, tmp_path):
+    script = tmp_path / 'script.txt'
+    script.write_text('Octopuses have three hearts.')
+    missed = format_time(datetime.now() - timedelta(hours=3))
+    schedule_id = sched_db.create_schedule('Daily', 'daily', time='09:00',
+                                           script_source=str(script),
+                                           auto_upload=True, next_run=missed)
+    
+    fired = run_until_fired(Scheduler(), 1)
+    assert len(fired) == 1
+    
+    schedule = sched_db.get_schedule(schedule_id)
+    assert schedule['last_run'] == missed
+    assert parse_time(schedule['next_run']) > datetime.now()
+    
+    video = sched_db.get_all_videos(limit=1)[0]
+    assert video['script'] == 'Octopuses have three hearts.'
+    assert video['schedule_id'] == schedule_id
+    assert video['auto_upload'] == 1
+    
+    # A restarted scheduler must not fire the same run again
+    assert run_until_fired(Scheduler(), 1, timeout=0.5) == []
+
+
+def test_scheduler_survives_errors(sched_db, monkeypatch):
+    missed = format_time(datetime.now() - timedelta(hours=3))
+    sched_db.create_schedule('Broken', 'fortnightly', time='09:00', script_source='x', next_run=missed)
+    sched_db.create_schedule('Daily', 'daily', time='09:00', script_source='Honey never spoils',
+                             next_run=missed)
+    
+    versions = sched_db.get_table_versions
+    failures = iter([sqlite3.OperationalError('database is locked')])
+    
+    def locked_once():
+        error = next(failures, None)
+        if error:
+            raise error
+        return versions()
+    
+    monkeypatch.setattr(sched_db, 'get_table_versions', locked_once)
+    monkeypatch.setattr(Scheduler, 'ERROR_RETRY_INTERVAL', 0.05)
+    
+    assert len(run_until_fired(Scheduler(), 1)) == 1
+    assert sched_db.get_all_videos(limit=1)[0]['script'] == 'Honey never spoils'
+
+
+def test_new_schedule_gets_next_run(sched_db):
+    schedule_id = sched_db.create_schedule('Hourly', 'hourly', time='00:05', script_source='x')
+    scheduler = Scheduler()
+    scheduler._reload()
+    
+    assert sched_db.get_schedule(schedule_id)['next_run'] == scheduler._due[schedule_id]
+
+
+def test_lead_time_from_stage_history(sched_db, monkeypatch):
+    monkeypatch.setattr(sched.config, 'PRERENDER_MARGIN', 2.0)
+    scheduler = Scheduler()
+    assert scheduler.lead_time() == sched.config.PRERENDER_DEFAULT_LEAD
+    
+    for stage in sched.RENDER_STAGES:
+        sched_db.record_stage(1, stage, 100.0)
+        sched_db.record_stage(1, stage, 50.0)
+    assert scheduler.lead_time() == 5 * 75.0 * 2.0
+
+
+def test_prerender_claimed_once(sched_db):
+    slot = '2026-01-01 09:00:00'
+    schedule_id = sched_db.create_schedule('Daily', 'daily', time='09:00',
+                                           script_source='x', next_run=slot)
+    
+    assert sched_db.claim_prerender(schedule_id, slot, 'x') is not None
+    assert sched_db.claim_prerender(schedule_id, slot, 'x') is None
+    assert sched_db.get_status_counts('jobs') == {'pending': 1}
+
+
+def upload_jobs(db):
+    return [j for j in db.get_all_jobs() if j['task'] == 'upload']
+
+
+@pytest.mark.parametrize('render_first', [True, False])
+def test_prerender_upload_queued_once(sched_db, render_first):
+    slot = '2026-01-01 09:00:00'
+    schedule_id = sched_db.create_schedule('Daily', 'daily', time='09:00', script_source='x',
+                                           auto_upload=True, next_run=slot)
+    video_id, _ = sched_db.claim_prerender(schedule_id, slot, 'x')
+    
+    def publish():
+        return sched_db.claim_schedule_run(schedule_id, slot, '2026-01-02 09:00:00',
+                                           prerendered_video_id=video_id)
+    
+    if render_first:
+        assert sched_db.complete_video(video_id) is None  # not published yet
+        assert publish()[1] is not None
+    else:
+        assert publish()[1] is None  # still rendering
+        assert sched_db.complete_video(video_id) is not None
+    
+    assert len(upload_jobs(sched_db)) == 1
+    assert sched_db.complete_video(video_id) is None
+
+
+@pytest.mark.parametrize('outcome', ['cancelled', 'failed', 'evicted'])
+def test_unusable_prerender_renders_at_slot(sched_db, tmp_path, outcome):
+    script = tmp_path / 'script.txt'
+    script.write_text('Octopuses have three hearts.')
+    slot = format_time(datetime.now() - timedelta(minutes=1))
+    schedule_id = sched_db.create_schedule('Daily', 'daily', time='09:00', script_source=str(script),
+                                           auto_upload=True, next_run=slot)
+    video_id, job_id = sched_db.claim_prerender(schedule_id, slot, 'x')
+    if outcome == 'cancelled':
+        assert sched_db.cancel_job(job_id) == 'cancelled'
+    elif outcome == 'failed':
+        sched_db.update_job(job_id, status='failed')
+        sched_db.update_video(video_id, status='failed')
+    else:
+        # Rendered, but its final is gone
+        sched_db.update_job(job_id, status='completed')
+        sched_db.update_video(video_id, status='completed', video_path=None)
+    
+    Scheduler()._fire(schedule_id, slot)
+    
+    assert upload_jobs(sched_db) == []
+    fresh = [v for v in sched_db.get_all_videos() if v['id'] != video_id]
+    assert [v['script'] for v in fresh] == ['Octopuses have three hearts.']
+    assert sched_db.get_status_counts('jobs')['pending'] == 1
+
+
+def test_stale_prerender_discarded_on_disable(sched_db):
+    slot = format_time(datetime.now() + timedelta(hours=1))
+    schedule_id = sched_db.create_schedule('Daily', 'daily', time='09:00',
+                                           script_source='x', next_run=slot)
+    video_id, _ = sched_db.claim_prerender(schedule_id, slot, 'x')
+    
+    scheduler = Scheduler()
+    scheduler.discard_prerenders()
+    assert sched_db.get_video(video_id) is not None
+    
+    sched_db.update_schedule(schedule_id, active=0)
+    scheduler.discard_prerenders()
+    assert sched_db.get_video(video_id) is None
+    assert sched_db.get_all_jobs() == []
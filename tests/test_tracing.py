@@ -0,0 +1,50 @@
+"""
+Tracing tests
+"""
+import json
+
+import pytest
+
+import tracing
+
+
+@pytest.fixture
+def traces(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing.config, 'TRACE_ENABLED', True)
+    monkeypatch.setattr(tracing.config, 'TRACE_DIR', tmp_path)
+    return tmp_path
+
+
+def test_spans_nested_under_job(traces, db):
+    with tracing.trace(7):
+        with tracing.span('video.poll', attempt=1):
+            db.get_video(1)
+    
+    data = json.loads((traces / 'job_7.json').read_text())
+    events = {e['name']: e for e in data['traceEvents']}
+    
+    assert set(events) == {'job', 'video.poll', 'db.get_video'}
+    assert all(e['ph'] == 'X' for e in events.values())
+    assert events['video.poll']['args']['parent_id'] == events['job']['args']['span_id']
+    assert events['db.get_video']['args']['parent_id'] == events['video.poll']['args']['span_id']
+    assert events['job']['args']['trace_id'] == data['otherData']['trace_id']
+
+
+def test_failed_span_written(traces):
+    with pytest.raises(RuntimeError):
+        with tracing.trace(8):
+            with tracing.span('ffmpeg'):
+                raise RuntimeError('boom')
+    
+    events = json.loads((traces / 'job_8.json').read_text())['traceEvents']
+    assert 'boom' in next(e for e in events if e['name'] == 'ffmpeg')['args']['error']
+
+
+def test_disabled_tracing_is_noop(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing.config, 'TRACE_ENABLED', False)
+    monkeypatch.setattr(tracing.config, 'TRACE_DIR', tmp_path)
+    
+    with tracing.trace(9) as current:
+        assert current is None
+        assert tracing.span('anything') is tracing.span('other')
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,86 @@
+"""
+Video generator download tests
+"""
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+import cancellation
+from modules import video_generator
+from modules.video_generator import VideoGenerator
+
+VIDEO = bytes(range(256)) * 4096 * 3  # 3 MB, whole download chunks
+
+
+class _StallingHandler(BaseHTTPRequestHandler):
+    """Sends 2 MB of the video, then stalls (only the first time with stall_once)"""
+    protocol_version = 'HTTP/1.1'
+    
+    def do_GET(self):
+        match = re.match(r'bytes=(\d+)-', self.headers.get('Range', ''))
+        self.server.requests += 1
+        if self.server.stall_once and self.server.requests > 1:
+            start = self.server.resumed_from = int(match.group(1)) if match else 0
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{len(VIDEO) - 1}/{len(VIDEO)}")
+            self.send_header('Content-Length', str(len(VIDEO) - start))
+            self.end_headers()
+            self.wfile.write(VIDEO[start:])
+            return
+        
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(VIDEO)))
+        self.end_headers()
+        self.wfile.write(VIDEO[:2 * video_generator.DOWNLOAD_CHUNK])
+        self.wfile.flush()
+        self.server.released.wait(10)
+        self.close_connection = True
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setattr(video_generator.config, 'JOB_CANCEL_POLL_INTERVAL', 0.2)
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _StallingHandler)
+    httpd.stall_once = False
+    httpd.requests = 0
+    httpd.released = threading.Event()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/video.mp4"
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.released.set()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def generator():
+    return VideoGenerator(SimpleNamespace(VIDEO_SERVICE='luma', LUMA_API_KEY='k', VIDEO_API_ENDPOINT=None))
+
+
+def test_stalled_download_resumes(provider, tmp_path):
+    provider.stall_once = True
+    output = tmp_path / 'video_raw.mp4'
+    
+    generator()._download(provider.url, output)
+    
+    assert output.read_bytes() == VIDEO
+    assert provider.requests == 2
+    assert provider.resumed_from == 2 * video_generator.DOWNLOAD_CHUNK
+
+
+def test_stalled_download_stops_on_cancel(provider, tmp_path):
+    output = tmp_path / 'video_raw.mp4'
+    event = threading.Event()
+    threading.Timer(0.3, event.set).start()
+    
+    started = time.monotonic()
+    with cancellation.scope(event), pytest.raises(cancellation.Cancelled):
+        generator()._download(provider.url, output)
+    assert time.monotonic() - started < 1
+    assert not output.exists()
@@ -0,0 +1,143 @@
+"""
+Lightweight tracing
+Nested spans per job, exported in the Chrome trace event format
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from config import config
+
+# Trace of the job being processed in this context (None = not tracing)
+_trace = contextvars.ContextVar('trace', default=None)
+
+# Returned by span() when nothing is being traced
+_NOOP = nullcontext()
+
+class Trace:
+    """Spans collected for one job"""
+    
+    def __init__(self, job_id):
+        """Initialize trace"""
+        self.job_id = job_id
+        self.trace_id = uuid.uuid4().hex
+        self.events = []
+        self.stack = []  # span ids of the open spans, innermost last
+        self.origin = time.perf_counter_ns()
+        self._next_id = 0
+    
+    def new_id(self):
+        """Allocate a span id"""
+        self._next_id += 1
+        return self._next_id
+    
+    def to_json(self):
+        """Trace event format, loadable in chrome://tracing or ui.perfetto.dev"""
+        return {
+            'traceEvents': self.events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'trace_id': self.trace_id, 'job_id': self.job_id}
+        }
+
+def trace_path(job_id):
+    """Where a job's trace is written"""
+    return Path(config.TRACE_DIR) / f"job_{job_id}.json"
+
+@contextmanager
+def trace(job_id):
+    """
+    Trace everything run in this context as one job
+    
+    Does nothing unless TRACE_ENABLED is set. The trace is written to
+    trace_path(job_id) when the block exits, whether or not it failed.
+    """
+    if not config.TRACE_ENABLED:
+        yield None
+        return
+    
+    current = Trace(job_id)
+    token = _trace.set(current)
+    try:
+        with span('job', job_id=job_id, trace_id=current.trace_id):
+            yield current
+    finally:
+        _trace.reset(token)
+        path = trace_path(job_id)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(current.to_json()), encoding='utf-8')
+        except OSError as e:
+            print(f"[TRACE] Could not write {path}: {e}")
+
+def span(name, **args):
+    """
+    Time a block as a span nested under the enclosing one
+    
+    Costs one context-variable lookup when no trace is active.
+    
+    Args:
+        name: Span name, e.g. 'luma.poll' or 'db.get_video'
+        **args: Attributes shown with the span in the viewer
+    """
+    current = _trace.get()
+    if current is None:
+        return _NOOP
+    return _span(current, name, args)
+
+@contextmanager
+def _span(current, name, args):
+    """Record one complete ('X') event"""
+    span_id = current.new_id()
+    parent = current.stack[-1] if current.stack else None
+    current.stack.append(span_id)
+    started = time.perf_counter_ns()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = repr(e)
+        raise
+    finally:
+        ended = time.perf_counter_ns()
+        current.stack.pop()
+        args = dict(args, span_id=span_id, parent_id=parent)
+        if error:
+            args['error'] = error
+        current.events.append({
+            'name': name,
+            'cat': name.split('.', 1)[0],
+            'ph': 'X',
+            'ts': (started - current.origin) / 1000,
+            'dur': (ended - started) / 1000,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': args
+        })
+
+def instrument(cls, prefix):
+    """
+    Wrap every public method of a class in a span named prefix.method
+    
+    Used for the Database class, so each query shows up in job traces.
+    """
+    for name, method in list(vars(cls).items()):
+        if name.startswith('_') or not callable(method):
+            continue
+        setattr(cls, name, _traced(f"{prefix}.{name}", method))
+    return cls
+
+def _traced(name, method):
+    """Span-wrapping version of a function"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        current = _trace.get()
+        if current is None:
+            return method(*args, **kwargs)
+        with _span(current, name, {}):
+            return method(*args, **kwargs)
+    return wrapper
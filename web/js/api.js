@@ -33,6 +33,35 @@ class APIClient {
         }
     }
 
+    /**
+     * Make paginated list request
+     * Returns { items, nextCursor, total } from the X-Next-Cursor and
+     * X-Total-Count response headers
+     */
+    async requestPage(endpoint) {
+        const response = await fetch(`${API_BASE}${endpoint}`);
+        const data = await response.json();
+
+        if (!response.ok) {
+            throw new Error(data.error || 'Request failed');
+        }
+
+        return {
+            items: data,
+            nextCursor: response.headers.get('X-Next-Cursor'),
+            total: parseInt(response.headers.get('X-Total-Count') || '0', 10),
+        };
+    }
+
+    listParams(status, limit, fields, cursor) {
+        const params = new URLSearchParams();
+        if (status) params.append('status', status);
+        params.append('limit', limit);
+        if (fields) params.append('fields', fields);
+        if (cursor) params.append('cursor', cursor);
+        return params;
+    }
+
     // Schedules
     async getSchedules() {
         return this.request('/api/schedules');
@@ -64,29 +93,35 @@ class APIClient {
     }
 
     // Videos
-    async getVideos(status = null, limit = 50) {
-        const params = new URLSearchParams();
-        if (status) params.append('status', status);
-        params.append('limit', limit);
+    async getVideos(status = null, limit = 50, fields = null) {
+        const params = this.listParams(status, limit, fields);
         return this.request(`/api/videos?${params}`);
     }
 
+    async getVideosPage(status = null, limit = 50, fields = null, cursor = null) {
+        const params = this.listParams(status, limit, fields, cursor);
+        return this.requestPage(`/api/videos?${params}`);
+    }
+
     async getVideo(videoId) {
         return this.request(`/api/videos/${videoId}`);
     }
 
-    async createVideo(data) {
+    /**
+     * Create a video. Sending the same idempotencyKey again (a double
+     * click, a retry after a network error) returns the first video.
+     */
+    async createVideo(data, idempotencyKey = null) {
         return this.request('/api/videos/create', {
             method: 'POST',
+            headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {},
             body: JSON.stringify(data),
         });
     }
 
     // Jobs
-    async getJobs(status = null, limit = 50) {
-        const params = new URLSearchParams();
-        if (status) params.append('status', status);
-        params.append('limit', limit);
+    async getJobs(status = null, limit = 50, fields = null) {
+        const params = this.listParams(status, limit, fields);
         return this.request(`/api/jobs?${params}`);
     }
 
@@ -94,6 +129,12 @@ class APIClient {
         return this.request(`/api/jobs/${jobId}`);
     }
 
+    async cancelJob(jobId) {
+        return this.request(`/api/jobs/${jobId}/cancel`, {
+            method: 'POST'
+        });
+    }
+
     async getQueueStatus() {
         return this.request('/api/jobs/queue/status');
     }
@@ -103,6 +144,11 @@ class APIClient {
         return this.request('/api/stats');
     }
 
+    // Live events (Server-Sent Events)
+    subscribeEvents() {
+        return new EventSource(`${API_BASE}/api/events`);
+    }
+
     // Health
     async healthCheck() {
         return this.request('/api/health');
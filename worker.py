@@ -0,0 +1,42 @@
+"""
+Job worker process
+Runs the job queue and the scheduler, which the web app never does
+"""
+import argparse
+import signal
+import threading
+from job_queue import job_queue, parse_stages
+
+def main():
+    """Process jobs until interrupted"""
+    parser = argparse.ArgumentParser(
+        description='Process queued videos and run schedules. Web and worker '
+                    'processes share only the database, so run as many of '
+                    'each as needed.'
+    )
+    parser.add_argument('--workers', type=int, help='Jobs processed in parallel (default JOB_WORKERS)')
+    parser.add_argument('--stages', help="Stages to run, e.g. 'assemble,upload' (default WORKER_STAGES)")
+    parser.add_argument('--node', help='Name on this worker\'s job leases (default WORKER_NODE)')
+    args = parser.parse_args()
+    
+    if args.workers:
+        job_queue.workers = args.workers
+    if args.stages:
+        try:
+            job_queue.stages = parse_stages(args.stages)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.node:
+        job_queue.node = args.node
+    
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    
+    job_queue.start()
+    while not stop.wait(1):
+        pass
+    job_queue.stop()
+
+if __name__ == "__main__":
+    main()